@@ -0,0 +1,199 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class _CachedAnswer:
+    """One answered question: its unit embedding and the response it produced"""
+
+    __slots__ = ("question", "vector", "answer", "world_version", "model_version", "expires_at")
+
+    def __init__(self, question: str, vector: np.ndarray, answer: Dict[str, Any],
+                 world_version: int, model_version: str, expires_at: float):
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.world_version = world_version
+        self.model_version = model_version
+        self.expires_at = expires_at
+
+
+class _WorldAnswers:
+    """A world's cached answers, in LRU order, with their vectors stacked for one matrix product"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, _CachedAnswer]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[int] = []
+
+    def changed(self):
+        self._matrix = None
+
+    def matrix(self) -> Tuple[List[int], np.ndarray]:
+        if self._matrix is None:
+            self._keys = list(self.entries)
+            self._matrix = np.stack([self.entries[key].vector for key in self._keys]) if self._keys else \
+                np.zeros((0, 0), dtype=np.float32)
+        return self._keys, self._matrix
+
+
+class AnswerCache:
+    """
+    AnswerCache - semantic cache of World Explorer answers
+
+    Answers are stored per world under the question's embedding (the same
+    MiniLM vector used for retrieval) together with the world's lore version.
+    A question is a hit when a cached question of the same world, version
+    and embedding model has cosine similarity >= threshold. Entries expire
+    after ttl_seconds; beyond max_entries the least recently used are
+    evicted. When a world's lore changes its version moves on, so its
+    answers stop matching and are dropped on the next lookup.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0, threshold: float = 0.92):
+        """
+        Args:
+            max_entries: Answers kept across all worlds
+            ttl_seconds: Lifetime of a cached answer
+            threshold: Minimum cosine similarity between questions for a hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._worlds: Dict[str, _WorldAnswers] = {}
+        # Global LRU order of (world_id, key) for eviction across worlds
+        self._lru: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
+        self._next_key = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, world_id: str, key: int, reason: str):
+        """Drop one entry (caller holds the lock)"""
+        world = self._worlds.get(world_id)
+        if world is None or world.entries.pop(key, None) is None:
+            return
+        world.changed()
+        self._lru.pop((world_id, key), None)
+        self._stats[reason] += 1
+        if not world.entries:
+            del self._worlds[world_id]
+
+    def _prune(self, world_id: str, world_version: int, model_version: str):
+        """Drop a world's expired entries and those from older lore or another model (caller holds the lock)"""
+        world = self._worlds.get(world_id)
+        if world is None:
+            return
+        now = time.monotonic()
+        for key, entry in list(world.entries.items()):
+            if entry.expires_at <= now:
+                self._remove(world_id, key, "expirations")
+            elif entry.world_version != world_version or entry.model_version != model_version:
+                self._remove(world_id, key, "invalidations")
+
+    def get(self, world_id: str, world_version: int, model_version: str, question_embedding) -> Optional[Dict[str, Any]]:
+        """
+        Look up an answer to a semantically equivalent question
+
+        Args:
+            world_id: World the question is about
+            world_version: Current lore version of the world
+            model_version: Embedding model that produced question_embedding
+            question_embedding: Embedding of the question
+
+        Returns:
+            The cached response (with "cached_question" and "similarity"), or None
+        """
+        query = self._unit(question_embedding)
+        with self._lock:
+            self._prune(world_id, world_version, model_version)
+            world = self._worlds.get(world_id)
+            if world is not None:
+                keys, matrix = world.matrix()
+                if matrix.shape[1] == query.shape[0]:
+                    similarities = matrix @ query
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        key = keys[best]
+                        world.entries.move_to_end(key)
+                        self._lru.move_to_end((world_id, key))
+                        self._stats["hits"] += 1
+                        entry = world.entries[key]
+                        return {**entry.answer, "cached_question": entry.question,
+                                "similarity": float(similarities[best])}
+            self._stats["misses"] += 1
+        return None
+
+    def put(self,
+            world_id: str,
+            world_version: int,
+            model_version: str,
+            question: str,
+            question_embedding,
+            answer: Dict[str, Any]):
+        """Store the response to a question"""
+        entry = _CachedAnswer(question, self._unit(question_embedding), dict(answer), world_version,
+                              model_version, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._prune(world_id, world_version, model_version)
+            world = self._worlds.setdefault(world_id, _WorldAnswers())
+            key = self._next_key
+            self._next_key += 1
+            world.entries[key] = entry
+            world.changed()
+            self._lru[(world_id, key)] = None
+            self._stats["stores"] += 1
+
+            while len(self._lru) > self.max_entries:
+                (old_world, old_key), _ = next(iter(self._lru.items()))
+                self._remove(old_world, old_key, "evictions")
+
+    def invalidate(self, world_id: str = None):
+        """Drop the cached answers of a world (or of all worlds)"""
+        with self._lock:
+            worlds = [world_id] if world_id else list(self._worlds)
+            for world in worlds:
+                for key in list(self._worlds.get(world, _WorldAnswers()).entries):
+                    self._remove(world, key, "invalidations")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._lru)
+            stats["worlds"] = len(self._worlds)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / float(lookups) if lookups else 0.0
+        stats.update(max_entries=self.max_entries, ttl_seconds=self.ttl_seconds, threshold=self.threshold)
+        return stats
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache configured from ANSWER_CACHE_* (None if ANSWER_CACHE_SIZE is 0)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_entries = int(os.getenv('ANSWER_CACHE_SIZE', 2048))
+            if max_entries <= 0:
+                return None
+            _cache = AnswerCache(
+                max_entries=max_entries,
+                ttl_seconds=float(os.getenv('ANSWER_CACHE_TTL', 3600)),
+                threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.92))
+            )
+        return _cache
@@ -1,23 +1,21 @@
 import os
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
-import numpy as np
-import cv2
 import io
 import json
 import uuid
 import logging
-import requests
 from datetime import datetime
 from functools import wraps
 from database import get_db, Database
-from web3_config import get_network_info, get_web3, get_nft_contract, get_token_contract
-from worldcharacter import WorldCharacterGenerator
 
-# Configure API keys
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+# Heavy subsystems (numpy, requests, web3, the character generator and CanonVDB)
+# are imported inside the routes that use them, so workers boot quickly; see
+# startup.py for import-time profiling and gunicorn preloading
+
+# The LLM client (llm_client.py) reads OPENAI_API_KEY and the LLM_* settings
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
@@ -81,6 +79,8 @@ def add_text_to_image(image, text, position, font_size=40, color=(255, 255, 255)
 
 def apply_meme_filter(image, filter_type):
     """Apply various filters to the image"""
+    import numpy as np
+    
     if filter_type == 'deep_fry':
         # Increase contrast and saturation, reduce quality
         enhancer = ImageEnhance.Color(image)
@@ -192,6 +192,7 @@ def index():
 @app.route('/api/web3/network', methods=['GET'])
 def network_info():
     """Get current Web3 network configuration"""
+    from web3_config import get_network_info
     return jsonify(get_network_info())
 
 @app.route('/api/meme/templates', methods=['GET'])
@@ -254,45 +255,55 @@ def generate_meme():
     template_path = os.path.join(app.config['TEMPLATES_FOLDER'], template_file)
     
     try:
-        # Open the template image
-        with Image.open(template_path) as img:
-            # Create a copy to work with
-            meme = img.copy()
-            width, height = meme.size
-            
-            # Add top text if provided
-            if top_text:
-                font_size = int(height * 0.08)  # Scale font based on image height
-                add_text_to_image(meme, top_text.upper(), (width // 2, height * 0.1), 
-                                 font_size=font_size, color=(255, 255, 255))
-            
-            # Add bottom text if provided
-            if bottom_text:
-                font_size = int(height * 0.08)  # Scale font based on image height
-                add_text_to_image(meme, bottom_text.upper(), (width // 2, height * 0.85), 
-                                 font_size=font_size, color=(255, 255, 255))
-            
-            # Apply filter if specified
-            if filter_type:
-                meme = apply_meme_filter(meme, filter_type)
-            
-            # Save the generated meme
-            output_filename = generate_filename()
-            output_path = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
-            meme.save(output_path, format='PNG')
-            
-            # Return the URL to the generated meme
-            return jsonify({
-                "status": "success",
-                "meme_id": output_filename.split('.')[0],
-                "url": f"/api/meme/view/{output_filename}",
-                "filename": output_filename
-            })
+        # Identical renders requested at the same time share one render and output file
+        from single_flight import get_single_flight, request_key
+        key = request_key("generate_meme", template=template_file, top_text=top_text,
+                          bottom_text=bottom_text, filter=filter_type)
+        return jsonify(get_single_flight().do(
+            key, lambda: _render_meme(template_path, top_text, bottom_text, filter_type)
+        ))
     
     except Exception as e:
         logger.error(f"Error generating meme: {str(e)}")
         return jsonify({"error": "Failed to generate meme", "details": str(e)}), 500
 
+def _render_meme(template_path, top_text, bottom_text, filter_type):
+    """Render a meme from a template and save it, returning the response payload"""
+    # Open the template image
+    with Image.open(template_path) as img:
+        # Create a copy to work with
+        meme = img.copy()
+        width, height = meme.size
+        
+        # Add top text if provided
+        if top_text:
+            font_size = int(height * 0.08)  # Scale font based on image height
+            add_text_to_image(meme, top_text.upper(), (width // 2, height * 0.1), 
+                             font_size=font_size, color=(255, 255, 255))
+        
+        # Add bottom text if provided
+        if bottom_text:
+            font_size = int(height * 0.08)  # Scale font based on image height
+            add_text_to_image(meme, bottom_text.upper(), (width // 2, height * 0.85), 
+                             font_size=font_size, color=(255, 255, 255))
+        
+        # Apply filter if specified
+        if filter_type:
+            meme = apply_meme_filter(meme, filter_type)
+        
+        # Save the generated meme
+        output_filename = generate_filename()
+        output_path = os.path.join(app.config['PROCESSED_FOLDER'], output_filename)
+        meme.save(output_path, format='PNG')
+        
+        # Return the URL to the generated meme
+        return {
+            "status": "success",
+            "meme_id": output_filename.split('.')[0],
+            "url": f"/api/meme/view/{output_filename}",
+            "filename": output_filename
+        }
+
 @app.route('/api/meme/upload', methods=['POST'])
 def upload_image():
     """Upload a custom image to use as a template"""
@@ -385,12 +396,17 @@ def list_filters():
 @app.route('/api/meme/metadata/<meme_id>', methods=['GET'])
 def get_meme_metadata(meme_id):
     """Get metadata for a specific meme, suitable for NFT metadata"""
+    payload, status = _meme_metadata(meme_id)
+    return jsonify(payload), status
+
+def _meme_metadata(meme_id):
+    """NFT metadata for a generated meme, as (payload, status)"""
     # Find the meme file
     meme_filename = f"{meme_id}.png"
     filepath = os.path.join(app.config['PROCESSED_FOLDER'], meme_filename)
     
     if not os.path.exists(filepath):
-        return jsonify({"error": "Meme not found"}), 404
+        return {"error": "Meme not found"}, 404
     
     try:
         # Get basic image properties
@@ -423,77 +439,14 @@ def get_meme_metadata(meme_id):
             ]
         }
         
-        return jsonify(metadata)
+        return metadata, 200
     
     except Exception as e:
         logger.error(f"Error retrieving metadata: {str(e)}")
-        return jsonify({"error": "Failed to retrieve metadata", "details": str(e)}), 500
+        return {"error": "Failed to retrieve metadata", "details": str(e)}, 500
 
 # AI World Exploration Routes
-# Handle OPTIONS preflight requests
-@app.route('/api/world/question', methods=['OPTIONS'])
-def handle_question_options():
-    return '', 204
-
-@app.route('/api/world/question', methods=['POST'])
-def answer_world_question():
-    """Answer questions about the fictional world using AI with vector DB context"""
-    try:
-        data = request.get_json(force=True)
-        if not data:
-            return jsonify({"error": "No JSON data received"}), 400
-        
-        # Check required fields
-        if 'question' not in data:
-            return jsonify({"error": "Question is required"}), 400
-            
-        question = data['question']
-        world_id = data.get('world_id')
-        
-        # If world_description is provided directly, use it (legacy support)
-        # Otherwise, get context from CanonVDB if world_id is provided
-        if 'world_description' in data:
-            # Legacy mode
-            world_description = data['world_description']
-            context = world_description
-            sources = []
-        elif world_id:
-            # New mode with vector DB
-            from canon_vdb import CanonVDB
-            vdb = CanonVDB()
-            context, sources = vdb.search_for_world_explorer(question, world_id, n_results=3)
-            
-            # If no context found, return error
-            if not context:
-                return jsonify({
-                    "error": f"No context found for world {world_id}. Please create the world first."
-                }), 404
-        else:
-            return jsonify({
-                "error": "Either world_description or world_id must be provided"
-            }), 400
-        
-        # If no OpenAI API key, provide mock responses
-        if not OPENAI_API_KEY or OPENAI_API_KEY == 'your_openai_api_key_here':
-            logger.info("No OpenAI API key configured, returning mock response")
-            
-            # For steampunk world communication question, provide a more specific mock answer
-            if "steampunk" in context.lower() and "communicat" in question.lower():
-                return jsonify({
-                    "answer": "In this steampunk world without electricity, long-distance communication relies on advanced steam technology. People use elaborate networks of pneumatic tubes to send physical messages between buildings and across cities. For greater distances, they employ a system of steam-powered semaphore towers with mechanical signaling arms visible from miles away. The wealthiest citizens might use personal mechanical carrier pigeons - intricate brass and copper automatons that can deliver small messages between pre-programmed locations. Submarine telegraph cables also exist, using steam-powered pressure differentials rather than electricity to transmit coded messages across oceans. Voice communication happens through sophisticated acoustic horns and tubes that can amplify and direct sound over moderate distances.",
-                    "question": question,
-                    "sources": [s["metadata"].get("title") for s in sources] if sources else []
-                })
-            
-            # Generic mock response for other questions
-            return jsonify({
-                "answer": f"I would answer your question about '{question}' related to the world you described, but the AI service is not configured with a valid API key. This is a placeholder response for development.",
-                "question": question,
-                "sources": [s["metadata"].get("title") for s in sources] if sources else []
-            })
-        
-        # Set up the prompt for the AI
-        system_prompt = """
+WORLD_QUESTION_SYSTEM_PROMPT = """
         You are a helpful lore expert for fictional worlds. Given a description of a fictional world 
         and relevant information, answer the user's question about that world. Your answers should be:
         1. Consistent with the provided world context and information
@@ -507,69 +460,305 @@ def answer_world_question():
         
         If information seems contradictory, prioritize specific lore entries over the general world context.
         """
+
+def _prepare_world_question(data):
+    """
+    Validate a world question and gather what answering it needs
+    
+    Returns:
+        Tuple of (prepared question dict, None) or (None, (error payload, status));
+        prepared["cached"] holds the response when the answer cache hit
+    """
+    if not data:
+        return None, ({"error": "No JSON data received"}, 400)
+    
+    # Check required fields
+    if 'question' not in data:
+        return None, ({"error": "Question is required"}, 400)
+    
+    prepared = {
+        "question": data['question'],
+        "world_id": data.get('world_id'),
+        "sources": [],
+        "cached": None,
+        "answer_cache": None
+    }
+    question, world_id = prepared["question"], prepared["world_id"]
+    
+    # If world_description is provided directly, use it (legacy support)
+    # Otherwise, get context from CanonVDB if world_id is provided
+    if 'world_description' in data:
+        # Legacy mode
+        prepared["context"] = data['world_description']
+    elif world_id:
+        # New mode with vector DB
+        from canon_vdb import get_canon_vdb
+        from answer_cache import get_answer_cache
+        vdb = get_canon_vdb()
+        prepared["vdb"] = vdb
         
-        user_prompt = f"""
+        # Paraphrases of an already answered question are served from the answer cache;
+        # the question embedding is reused for retrieval on a miss
+        question_embedding = vdb.embed_query(question)
+        prepared["question_embedding"] = question_embedding
+        answer_cache = get_answer_cache()
+        prepared["answer_cache"] = answer_cache
+        if answer_cache is not None:
+            cached = answer_cache.get(world_id, vdb.get_world_version(world_id),
+                                      vdb.embedder.model_version, question_embedding)
+            if cached is not None:
+                logger.info(f"Answer cache hit for {world_id} (similarity {cached['similarity']:.3f})")
+                prepared["cached"] = {**cached, "question": question, "cached": True}
+                return prepared, None
+        
+        explorer_context = vdb.build_world_explorer_context(question, world_id, n_results=3,
+                                                            query_embedding=question_embedding)
+        prepared["context"], prepared["sources"] = explorer_context["context"], explorer_context["sources"]
+        logger.info(f"World Explorer context for {world_id}: ~{explorer_context['token_count']} tokens")
+        
+        # If no context found, return error
+        if not prepared["context"]:
+            return None, ({
+                "error": f"No context found for world {world_id}. Please create the world first."
+            }, 404)
+    else:
+        return None, ({
+            "error": "Either world_description or world_id must be provided"
+        }, 400)
+    
+    return prepared, None
+
+def _world_question_messages(question, context):
+    """Chat messages asking the LLM to answer a question from world context"""
+    user_prompt = f"""
         # User Question
         {question}
         
         # World Information
         {context}
         """
+    return [
+        {"role": "system", "content": WORLD_QUESTION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def _mock_world_answer(question, context):
+    """Placeholder answer used when no LLM is configured"""
+    # For steampunk world communication question, provide a more specific mock answer
+    if "steampunk" in context.lower() and "communicat" in question.lower():
+        return "In this steampunk world without electricity, long-distance communication relies on advanced steam technology. People use elaborate networks of pneumatic tubes to send physical messages between buildings and across cities. For greater distances, they employ a system of steam-powered semaphore towers with mechanical signaling arms visible from miles away. The wealthiest citizens might use personal mechanical carrier pigeons - intricate brass and copper automatons that can deliver small messages between pre-programmed locations. Submarine telegraph cables also exist, using steam-powered pressure differentials rather than electricity to transmit coded messages across oceans. Voice communication happens through sophisticated acoustic horns and tubes that can amplify and direct sound over moderate distances."
+    
+    # Generic mock response for other questions
+    return f"I would answer your question about '{question}' related to the world you described, but the AI service is not configured with a valid API key. This is a placeholder response for development."
+
+def _format_sources(sources):
+    """Title and category of each lore source used for an answer"""
+    return [
+        {
+            "title": s["metadata"].get("title", "Unnamed Source"),
+            "category": s["metadata"].get("category", "general")
+        }
+        for s in sources
+    ]
+
+def _cache_world_answer(prepared, response_data):
+    """Store a generated answer in the answer cache (World Explorer questions only)"""
+    if prepared["answer_cache"] is None:
+        return
+    vdb, world_id = prepared["vdb"], prepared["world_id"]
+    # Keyed by the version after retrieval, which may have created the world context
+    prepared["answer_cache"].put(world_id, vdb.get_world_version(world_id), vdb.embedder.model_version,
+                                 prepared["question"], prepared["question_embedding"], response_data)
+
+# Handle OPTIONS preflight requests
+@app.route('/api/world/question', methods=['OPTIONS'])
+def handle_question_options():
+    return '', 204
+
+def _world_question_key(data):
+    """Request key under which identical concurrent questions are coalesced"""
+    from single_flight import request_key, canonical_text
+    params = data if isinstance(data, dict) else {}
+    return request_key("world_question",
+                       question=canonical_text(params.get('question')),
+                       world_id=params.get('world_id'),
+                       world_description=params.get('world_description'))
+
+def _answer_world_question(data):
+    """
+    Answer a world question
+    
+    Returns:
+        Tuple of (response payload, status code, extra headers)
+    """
+    prepared, error = _prepare_world_question(data)
+    if error:
+        return error + ({},)
+    if prepared["cached"]:
+        return prepared["cached"], 200, {}
+    question, context = prepared["question"], prepared["context"]
+    
+    # If no OpenAI API key (or stand-in server) is configured, provide mock responses
+    from llm_client import get_llm_client, LLMError
+    llm = get_llm_client()
+    if not llm.configured:
+        return _mock_world_response(prepared)
+    
+    # Call the LLM through the pooled, timeout-bounded client
+    try:
+        answer = llm.chat(_world_question_messages(question, context), temperature=0.7, max_tokens=500)
+    except LLMError as e:
+        return _llm_error_response(e)
+    
+    return _world_answer_response(prepared, answer)
+
+def _mock_world_response(prepared):
+    """Mock (payload, status, headers) for when no LLM is configured"""
+    logger.info("No OpenAI API key configured, returning mock response")
+    sources = prepared["sources"]
+    return {
+        "answer": _mock_world_answer(prepared["question"], prepared["context"]),
+        "question": prepared["question"],
+        "sources": [s["metadata"].get("title") for s in sources] if sources else []
+    }, 200, {}
+
+def _llm_error_response(e):
+    """(payload, status, headers) for a failed LLM call"""
+    from llm_client import LLMUnavailableError
+    if isinstance(e, LLMUnavailableError):
+        logger.warning(f"AI API unavailable: {str(e)}")
+        return {"error": "The answer service is busy, please try again shortly"}, 503, \
+            {"Retry-After": str(int(e.retry_after or 1))}
+    logger.error(f"AI API error: {str(e)}")
+    return {"error": "Failed to generate answer"}, 500, {}
+
+def _world_answer_response(prepared, answer):
+    """(payload, status, headers) for a generated answer, which is also stored in the answer cache"""
+    # Return answer with sources if available
+    response_data = {
+        "answer": answer,
+        "question": prepared["question"]
+    }
+    
+    if prepared["sources"]:
+        response_data["sources"] = _format_sources(prepared["sources"])
+    
+    _cache_world_answer(prepared, response_data)
+    return response_data, 200, {}
+
+@app.route('/api/world/question', methods=['POST'])
+def answer_world_question():
+    """Answer questions about the fictional world using AI with vector DB context"""
+    try:
+        data = request.get_json(force=True)
         
-        # Call OpenAI API
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-4",  # or another appropriate model
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
-        )
+        # Identical questions asked at the same time share one retrieval and LLM call
+        from single_flight import get_single_flight
+        payload, status, headers = get_single_flight().do(_world_question_key(data),
+                                                          lambda: _answer_world_question(data))
         
-        if response.status_code == 200:
-            result = response.json()
-            answer = result["choices"][0]["message"]["content"]
-            
-            # Return answer with sources if available
-            response_data = {
-                "answer": answer,
-                "question": question
-            }
-            
-            if sources:
-                response_data["sources"] = [
-                    {
-                        "title": s["metadata"].get("title", "Unnamed Source"),
-                        "category": s["metadata"].get("category", "general")
-                    }
-                    for s in sources
-                ]
-            
-            return jsonify(response_data)
-        else:
-            logger.error(f"AI API error: {response.status_code}, {response.text}")
-            return jsonify({"error": "Failed to generate answer"}), 500
+        if "question" in payload:
+            payload["question"] = data['question']
+        response = jsonify(payload)
+        response.headers.update(headers)
+        return response, status
             
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
         return jsonify({"error": f"Failed to answer question: {str(e)}"}), 500
 
+def _sse(event, data):
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/world/question/stream', methods=['OPTIONS'])
+def handle_question_stream_options():
+    return '', 204
+
+@app.route('/api/world/question/stream', methods=['POST'])
+def stream_world_question():
+    """
+    Answer a world question as server-sent events
+    
+    Emits `sources` as soon as retrieval is done, then a `token` event per
+    piece of the answer as the LLM generates it, then `done` with the full
+    answer; failures after the stream has started are sent as `error`.
+    """
+    try:
+        prepared, error = _prepare_world_question(request.get_json(force=True))
+        if error:
+            payload, status = error
+            return jsonify(payload), status
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        return jsonify({"error": f"Failed to answer question: {str(e)}"}), 500
+    
+    from llm_client import get_llm_client, LLMError, LLMUnavailableError
+    llm = get_llm_client()
+    question = prepared["question"]
+    
+    def events():
+        cached = prepared["cached"]
+        if cached:
+            yield _sse("sources", {"question": question, "sources": cached.get("sources", []), "cached": True})
+            yield _sse("token", {"content": cached["answer"]})
+            yield _sse("done", {"answer": cached["answer"]})
+            return
+        
+        sources = _format_sources(prepared["sources"])
+        yield _sse("sources", {"question": question, "sources": sources, "cached": False})
+        
+        if not llm.configured:
+            logger.info("No OpenAI API key configured, streaming mock response")
+            answer = _mock_world_answer(question, prepared["context"])
+            yield _sse("token", {"content": answer})
+            yield _sse("done", {"answer": answer})
+            return
+        
+        parts = []
+        try:
+            for delta in llm.chat_stream(_world_question_messages(question, prepared["context"]),
+                                         temperature=0.7, max_tokens=500):
+                parts.append(delta)
+                yield _sse("token", {"content": delta})
+        except LLMUnavailableError as e:
+            logger.warning(f"AI API unavailable: {str(e)}")
+            yield _sse("error", {"error": "The answer service is busy, please try again shortly",
+                                 "retry_after": int(e.retry_after or 1)})
+            return
+        except LLMError as e:
+            logger.error(f"AI API error: {str(e)}")
+            yield _sse("error", {"error": "Failed to generate answer"})
+            return
+        
+        answer = "".join(parts)
+        response_data = {"answer": answer, "question": question}
+        if sources:
+            response_data["sources"] = sources
+        _cache_world_answer(prepared, response_data)
+        yield _sse("done", {"answer": answer})
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop reverse proxies from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 # World Character API Routes
 @app.route('/api/world/generate', methods=['POST'])
 def generate_world_character():
     """Generate character(s) from world description"""
-    data = request.json
-    
+    payload, status = _generate_characters(request.json)
+    return jsonify(payload), status
+
+def _generate_characters(data):
+    """Generate characters for a world description, as (payload, status)"""
     if not data or 'world_description' not in data:
-        return jsonify({"error": "World description is required"}), 400
+        return {"error": "World description is required"}, 400
     
     world_description = data['world_description']
     character_count = int(data.get('character_count', 1))
@@ -580,19 +769,21 @@ def generate_world_character():
         character_count = 5
     
     # Initialize character generator
+    from worldcharacter import WorldCharacterGenerator
     generator = WorldCharacterGenerator()
     
     # Generate characters
     characters = generator.generate_character(world_description, character_count, style)
     
     if not characters:
-        return jsonify({"error": "Failed to generate characters"}), 500
+        return {"error": "Failed to generate characters"}, 500
     
-    return jsonify({"characters": characters})
+    return {"characters": characters}, 200
 
 @app.route('/api/world/character/<character_id>', methods=['GET'])
 def get_world_character(character_id):
     """Get a generated character by ID"""
+    from worldcharacter import WorldCharacterGenerator
     generator = WorldCharacterGenerator()
     character = generator.get_character_by_id(character_id)
     
@@ -616,6 +807,7 @@ def get_character_image(filename):
 @app.route('/api/world/character/mint/<character_id>', methods=['POST'])
 def mint_character_nft(character_id):
     """Create NFT metadata and prepare for minting"""
+    from worldcharacter import WorldCharacterGenerator
     generator = WorldCharacterGenerator()
     character = generator.get_character_by_id(character_id)
     
@@ -639,6 +831,7 @@ def mint_character_nft(character_id):
 @app.route('/api/world/character/claim/<character_id>', methods=['POST'])
 def generate_character_claim(character_id):
     """Generate a claim secret for a character NFT"""
+    from worldcharacter import WorldCharacterGenerator
     generator = WorldCharacterGenerator()
     character = generator.get_character_by_id(character_id)
     
@@ -664,27 +857,69 @@ def list_lore_entries():
     category = request.args.get('category')
     limit = int(request.args.get('limit', 100))
     offset = int(request.args.get('offset', 0))
+    after = request.args.get('after')
     
     try:
-        from canon_vdb import CanonVDB
-        vdb = CanonVDB()
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
         entries = vdb.list_lore_entries(
             world_id=world_id,
             category=category,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=after
         )
-        return jsonify({"entries": entries})
+        return jsonify({
+            "entries": entries,
+            "total": vdb.count_entries(world_id=world_id, category=category),
+            "next_cursor": vdb.next_cursor(entries, limit)
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing lore entries: {str(e)}")
         return jsonify({"error": f"Failed to list lore entries: {str(e)}"}), 500
 
+@app.route('/api/world/lore/search/batch', methods=['POST'])
+def search_lore_batch():
+    """Search lore for several questions against one world in a single call"""
+    data = request.get_json(silent=True)
+    
+    if not data or not isinstance(data.get('queries'), list) or not data['queries']:
+        return jsonify({"error": "A non-empty list of queries is required"}), 400
+    
+    queries = [str(q) for q in data['queries']]
+    if len(queries) > 100:
+        return jsonify({"error": "At most 100 queries per batch"}), 400
+    
+    try:
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
+        results = vdb.search_lore_batch(
+            queries,
+            world_id=data.get('world_id'),
+            category=data.get('category'),
+            n_results=int(data.get('n_results', 5)),
+            mode=data.get('mode')
+        )
+        return jsonify({
+            "results": [
+                {"query": query, "results": query_results}
+                for query, query_results in zip(queries, results)
+            ]
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in batch lore search: {str(e)}")
+        return jsonify({"error": f"Failed to search lore: {str(e)}"}), 500
+
 @app.route('/api/world/lore/<entry_id>', methods=['GET'])
 def get_lore_entry(entry_id):
     """Get a specific lore entry by ID"""
     try:
-        from canon_vdb import CanonVDB
-        vdb = CanonVDB()
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
         entry = vdb.get_lore_by_id(entry_id)
         
         if not entry:
@@ -704,10 +939,10 @@ def create_lore_entry():
         return jsonify({"error": "Title and content are required"}), 400
     
     try:
-        from canon_vdb import CanonVDB
+        from canon_vdb import get_canon_vdb
         from datetime import datetime
         
-        vdb = CanonVDB()
+        vdb = get_canon_vdb()
         entry_id = vdb.add_lore_entry(
             title=data['title'],
             content=data['content'],
@@ -734,8 +969,8 @@ def update_lore_entry(entry_id):
         return jsonify({"error": "No data provided"}), 400
     
     try:
-        from canon_vdb import CanonVDB
-        vdb = CanonVDB()
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
         
         # Check if entry exists
         entry = vdb.get_lore_by_id(entry_id)
@@ -769,8 +1004,8 @@ def update_lore_entry(entry_id):
 def delete_lore_entry(entry_id):
     """Delete a lore entry"""
     try:
-        from canon_vdb import CanonVDB
-        vdb = CanonVDB()
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
         
         # Check if entry exists
         entry = vdb.get_lore_by_id(entry_id)
@@ -801,20 +1036,20 @@ def import_lore_entries():
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
     
-    if not file.filename.endswith('.json'):
-        return jsonify({"error": "Only JSON files are supported"}), 400
+    if not file.filename.endswith(('.json', '.ndjson', '.jsonl')):
+        return jsonify({"error": "Only JSON and NDJSON files are supported"}), 400
     
     try:
         import tempfile
-        from canon_vdb import CanonVDB
+        from canon_vdb import get_canon_vdb
         
         # Save uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as temp:
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(file.filename)[1], delete=False) as temp:
             file.save(temp.name)
             temp_path = temp.name
             
         # Import entries
-        vdb = CanonVDB()
+        vdb = get_canon_vdb()
         count = vdb.import_from_json(temp_path)
         
         # Clean up
@@ -830,65 +1065,256 @@ def import_lore_entries():
 
 @app.route('/api/world/lore/export', methods=['GET'])
 def export_lore_entries():
-    """Export lore entries to a JSON file"""
+    """Stream lore entries as a JSON or NDJSON download"""
     world_id = request.args.get('world_id')
+    fmt = request.args.get('format', 'json')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    
+    if fmt not in ('json', 'ndjson'):
+        return jsonify({"error": "Format must be 'json' or 'ndjson'"}), 400
     
     try:
-        import tempfile
-        from canon_vdb import CanonVDB
+        from canon_vdb import get_canon_vdb
         
-        # Export entries to a temporary file
-        temp_dir = tempfile.mkdtemp()
-        output_file = os.path.join(temp_dir, 'lore_export.json')
-        
-        vdb = CanonVDB()
-        count = vdb.export_to_json(output_file, world_id=world_id)
-        
-        if count == 0:
+        vdb = get_canon_vdb()
+        if vdb.count_entries(world_id=world_id) == 0:
             return jsonify({"error": "No entries found to export"}), 404
         
-        return send_file(
-            output_file,
-            as_attachment=True,
-            download_name=f"lore_export_{world_id or 'all'}.json",
-            mimetype='application/json'
+        filename = f"lore_export_{world_id or 'all'}.{fmt}"
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        if compress:
+            filename += '.gz'
+            mimetype = 'application/gzip'
+        
+        return Response(
+            stream_with_context(vdb.iter_export(world_id=world_id, fmt=fmt, compress=compress)),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
     except Exception as e:
         logger.error(f"Error exporting lore entries: {str(e)}")
         return jsonify({"error": f"Failed to export lore entries: {str(e)}"}), 500
 
+@app.route('/api/admin/lore/shards', methods=['GET'])
+@admin_required
+def get_lore_shards():
+    """List lore shards with their chunk and entry counts"""
+    try:
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
+        return jsonify({
+            "sharding": vdb.sharding,
+            "shards": vdb.shard_stats()
+        })
+    except Exception as e:
+        logger.error(f"Error listing lore shards: {str(e)}")
+        return jsonify({"error": f"Failed to list lore shards: {str(e)}"}), 500
+
+@app.route('/api/admin/lore/shards/migrate', methods=['POST'])
+@admin_required
+def migrate_lore_shards():
+    """Move lore from the shared collection into per-world shards"""
+    try:
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
+        if vdb.sharding == 'world':
+            return jsonify({"status": "success", "message": "Lore is already sharded per world", "migrated": 0})
+        
+        count = vdb.migrate_to_shards()
+        return jsonify({
+            "status": "success",
+            "message": f"Migrated {count} lore chunks to per-world shards",
+            "migrated": count
+        })
+    except Exception as e:
+        logger.error(f"Error migrating lore shards: {str(e)}")
+        return jsonify({"error": f"Failed to migrate lore shards: {str(e)}"}), 500
+
+@app.route('/api/admin/lore/snapshot', methods=['GET'])
+@admin_required
+def download_lore_snapshot():
+    """Download a binary snapshot of lore, including its vectors"""
+    world_id = request.args.get('world_id')
+    try:
+        import tempfile
+        from canon_vdb import get_canon_vdb
+        
+        vdb = get_canon_vdb()
+        if vdb.count_entries(world_id=world_id) == 0:
+            return jsonify({"error": "No entries found to snapshot"}), 404
+        
+        fd, snapshot_path = tempfile.mkstemp(suffix='.lsnap')
+        os.close(fd)
+        try:
+            vdb.snapshot(snapshot_path, world_id=world_id)
+        except Exception:
+            os.unlink(snapshot_path)
+            raise
+        
+        def stream():
+            try:
+                with open(snapshot_path, 'rb') as f:
+                    while True:
+                        block = f.read(1 << 20)
+                        if not block:
+                            break
+                        yield block
+            finally:
+                os.unlink(snapshot_path)
+        
+        return Response(
+            stream(),
+            mimetype='application/octet-stream',
+            headers={
+                "Content-Disposition": f"attachment; filename=lore_snapshot_{world_id or 'all'}.lsnap",
+                "Content-Length": str(os.path.getsize(snapshot_path))
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error creating lore snapshot: {str(e)}")
+        return jsonify({"error": f"Failed to create lore snapshot: {str(e)}"}), 500
+
+@app.route('/api/admin/lore/snapshot/restore', methods=['POST'])
+@admin_required
+def restore_lore_snapshot():
+    """Restore lore from a binary snapshot without re-embedding"""
+    if 'file' not in request.files:
+        return jsonify({"error": "No file provided"}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No file selected"}), 400
+    
+    temp_path = None
+    try:
+        import tempfile
+        from canon_vdb import get_canon_vdb
+        from lore_snapshot import SnapshotError
+        
+        with tempfile.NamedTemporaryFile(suffix='.lsnap', delete=False) as temp:
+            file.save(temp.name)
+            temp_path = temp.name
+        
+        vdb = get_canon_vdb()
+        try:
+            count = vdb.restore_snapshot(temp_path, verify=request.args.get('verify', 'true').lower() != 'false')
+        except SnapshotError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({
+            "status": "success",
+            "message": f"Restored {count} lore chunks from snapshot",
+            "restored": count
+        })
+    except Exception as e:
+        logger.error(f"Error restoring lore snapshot: {str(e)}")
+        return jsonify({"error": f"Failed to restore lore snapshot: {str(e)}"}), 500
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+@app.route('/api/admin/lore/reindex', methods=['GET'])
+@admin_required
+def get_lore_reindex_status():
+    """Embedding model in use and progress of the latest re-index job"""
+    try:
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
+        return jsonify(vdb.reindex_status())
+    except Exception as e:
+        logger.error(f"Error getting re-index status: {str(e)}")
+        return jsonify({"error": f"Failed to get re-index status: {str(e)}"}), 500
+
+@app.route('/api/admin/lore/reindex', methods=['POST'])
+@admin_required
+def start_lore_reindex():
+    """Start or resume re-embedding all lore with another model in the background"""
+    data = request.json or {}
+    try:
+        batch_size = int(data.get('batch_size', 100))
+        max_rate = float(data.get('max_rate', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "batch_size and max_rate must be numbers"}), 400
+    
+    try:
+        from canon_vdb import get_canon_vdb
+        vdb = get_canon_vdb()
+        job = vdb.start_reindex(data.get('model'), batch_size=max(1, batch_size), max_rate=max(0.0, max_rate))
+        return jsonify({"status": "started", "job": job}), 202
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error starting re-index: {str(e)}")
+        return jsonify({"error": f"Failed to start re-index: {str(e)}"}), 500
+
+@app.route('/api/admin/answer-cache', methods=['GET'])
+@admin_required
+def get_answer_cache_stats():
+    """Hit rate and size of this worker's World Explorer answer cache"""
+    from answer_cache import get_answer_cache
+    answer_cache = get_answer_cache()
+    if answer_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **answer_cache.stats()})
+
+@app.route('/api/admin/answer-cache', methods=['DELETE'])
+@admin_required
+def clear_answer_cache():
+    """Drop this worker's cached answers for a world (or all worlds)"""
+    from answer_cache import get_answer_cache
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.invalidate(request.args.get('world_id'))
+    return jsonify({"status": "success"})
+
+@app.route('/api/admin/single-flight', methods=['GET'])
+@admin_required
+def get_single_flight_stats():
+    """How often this worker shared an in-flight execution instead of repeating it"""
+    from single_flight import get_single_flight
+    return jsonify(get_single_flight().stats())
+
 # Web3 NFT integration endpoints
 @app.route('/api/web3/metadata/<token_id>', methods=['GET'])
 def get_nft_metadata(token_id):
     """Get metadata for an NFT token in standard format"""
+    payload, status = _nft_metadata(token_id)
+    return jsonify(payload), status
+
+def _nft_metadata(token_id):
+    """Metadata of a character or meme NFT, as (payload, status)"""
     # Check if this is a character NFT (prefixed with 'char_')
     if token_id.startswith('char_'):
         character_id = token_id[5:]  # Remove 'char_' prefix
+        from worldcharacter import WorldCharacterGenerator
         generator = WorldCharacterGenerator()
         metadata = generator.create_nft_metadata(character_id)
         
         if metadata:
-            return jsonify(metadata)
+            return metadata, 200
     
     # If not a character or character not found, assume it's a meme NFT
     meme_id = token_id
-    return get_meme_metadata(meme_id)
+    return _meme_metadata(meme_id)
 
 # Prompt Management API Routes
 
 # Public API to get prompts (no authentication required)
 @app.route('/api/prompts', methods=['GET'])
 def get_public_prompts():
-    """Get all prompts for public use"""
-    prompts = Database().get_all_prompts()
-    
-    # Convert MongoDB objects to JSON-serializable format
-    prompts_list = []
-    for prompt in prompts:
-        prompt['id'] = prompt.pop('_id')  # Convert _id to id for frontend
-        prompts_list.append(prompt)
-    
-    return jsonify({"prompts": prompts_list})
+    """Get all prompts for public use, from this worker's prompt cache"""
+    from prompt_cache import get_prompt_cache
+    try:
+        body, etag = get_prompt_cache().public_response()
+    except Exception as e:
+        logger.error(f"Error loading prompts: {str(e)}")
+        return jsonify({"error": "Failed to load prompts"}), 500
+    
+    # Clients revalidate with If-None-Match and get a 304 while prompts are unchanged
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/api/admin/prompts', methods=['OPTIONS'])
 def admin_prompts_options():
@@ -899,8 +1325,8 @@ def admin_prompts_options():
 @admin_required
 def get_all_prompts():
     """Get all prompts"""
-    # Use the Database class directly instead of get_db()
-    prompts = Database().get_all_prompts()
+    from prompt_cache import get_prompt_cache
+    prompts = get_prompt_cache().get_all()
     
     # Convert MongoDB objects to JSON-serializable format
     prompts_list = []
@@ -919,7 +1345,8 @@ def admin_prompt_id_options(prompt_id):
 @admin_required
 def get_prompt(prompt_id):
     """Get a specific prompt by ID"""
-    prompt = Database().get_prompt_by_id(prompt_id)
+    from prompt_cache import get_prompt_cache
+    prompt = get_prompt_cache().get_by_id(prompt_id)
     
     if not prompt:
         return jsonify({"error": "Prompt not found"}), 404
@@ -954,7 +1381,9 @@ def create_prompt():
     }
     
     # Insert into database
+    from prompt_cache import get_prompt_cache
     result = Database().create_prompt(prompt_data)
+    get_prompt_cache().invalidate()
     
     return jsonify({
         "status": "success",
@@ -998,7 +1427,9 @@ def update_prompt(prompt_id):
             update_data[field] = data[field]
     
     # Update in database
+    from prompt_cache import get_prompt_cache
     Database().update_prompt(prompt_id, update_data)
+    get_prompt_cache().invalidate()
     
     return jsonify({
         "status": "success",
@@ -1020,7 +1451,9 @@ def delete_prompt(prompt_id):
         return jsonify({"error": "Prompt not found"}), 404
     
     # Delete from database
+    from prompt_cache import get_prompt_cache
     Database().delete_prompt(prompt_id)
+    get_prompt_cache().invalidate()
     
     return jsonify({
         "status": "success",
@@ -0,0 +1,216 @@
+import os
+import re
+import copy
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from a2wsgi import WSGIMiddleware
+from app import (
+    app as flask_app,
+    _prepare_world_question,
+    _world_question_key,
+    _world_question_messages,
+    _mock_world_response,
+    _llm_error_response,
+    _world_answer_response,
+    _generate_characters,
+    _nft_metadata
+)
+
+# ASGI entry point:
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+#
+# The I/O-bound world question, character generation and Web3 routes are
+# served on the event loop: the LLM is called with async HTTP, and blocking
+# work (embedding, Chroma, MongoDB, the character generator) runs in a thread
+# pool, so one worker can wait on hundreds of slow upstream calls. Every
+# other route is passed through to the Flask app on WSGI threads.
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Requests the async routes handle at once; beyond that they wait up to
+# ASYNC_ACQUIRE_TIMEOUT seconds and are then answered with a 503
+ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', 512))
+ASYNC_ACQUIRE_TIMEOUT = float(os.getenv('ASYNC_ACQUIRE_TIMEOUT', 5))
+
+# Threads for blocking work of the async routes, and for the Flask routes
+ASYNC_EXECUTOR_WORKERS = int(os.getenv('ASYNC_EXECUTOR_WORKERS', 32))
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', 16))
+
+# Same CORS policy as app.after_request
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"http://localhost:3000"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization,Accept,Origin"),
+    (b"access-control-allow-methods", b"GET,PUT,POST,DELETE,OPTIONS"),
+    (b"access-control-allow-credentials", b"true")
+]
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix="async-route")
+_slots: Optional[asyncio.Semaphore] = None
+_in_flight: Dict[str, "asyncio.Future"] = {}
+
+Handler = Callable[..., Awaitable[Tuple[Any, int, Dict[str, str]]]]
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """Run blocking (CPU or sync I/O) work in the route thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+async def coalesce(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Share one execution between identical concurrent requests on the event loop
+    (the async counterpart of single_flight.SingleFlight)
+    """
+    future = _in_flight.get(key)
+    if future is None:
+        future = _in_flight[key] = asyncio.ensure_future(fn())
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # Shield so a disconnecting client doesn't cancel the call for everyone else
+    return copy.deepcopy(await asyncio.shield(future))
+
+# Route handlers
+
+async def world_question(data: Any) -> Tuple[Any, int, Dict[str, str]]:
+    """POST /api/world/question, with the LLM call on the event loop"""
+    async def answer():
+        prepared, error = await run_blocking(_prepare_world_question, data)
+        if error:
+            return error + ({},)
+        if prepared["cached"]:
+            return prepared["cached"], 200, {}
+
+        from llm_client import get_async_llm_client, LLMError
+        llm = get_async_llm_client()
+        if not llm.configured:
+            return _mock_world_response(prepared)
+        try:
+            answer = await llm.chat(_world_question_messages(prepared["question"], prepared["context"]),
+                                    temperature=0.7, max_tokens=500)
+        except LLMError as e:
+            return _llm_error_response(e)
+        return await run_blocking(_world_answer_response, prepared, answer)
+
+    payload, status, headers = await coalesce(_world_question_key(data), answer)
+    if "question" in payload:
+        payload["question"] = data['question']
+    return payload, status, headers
+
+async def world_generate(data: Any) -> Tuple[Any, int, Dict[str, str]]:
+    """POST /api/world/generate"""
+    payload, status = await run_blocking(_generate_characters, data)
+    return payload, status, {}
+
+def _network_info():
+    from web3_config import get_network_info
+    return get_network_info()
+
+async def web3_network(data: Any) -> Tuple[Any, int, Dict[str, str]]:
+    """GET /api/web3/network"""
+    # web3_config pulls in web3 on first import; keep that off the event loop
+    return await run_blocking(_network_info), 200, {}
+
+async def web3_metadata(data: Any, token_id: str) -> Tuple[Any, int, Dict[str, str]]:
+    """GET /api/web3/metadata/<token_id>"""
+    payload, status = await run_blocking(_nft_metadata, token_id)
+    return payload, status, {}
+
+ROUTES: List[Tuple[str, "re.Pattern", Handler]] = [
+    ("POST", re.compile(r"^/api/world/question$"), world_question),
+    ("POST", re.compile(r"^/api/world/generate$"), world_generate),
+    ("GET", re.compile(r"^/api/web3/network$"), web3_network),
+    ("GET", re.compile(r"^/api/web3/metadata/(?P<token_id>[^/]+)$"), web3_metadata)
+]
+
+# ASGI plumbing
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+async def _send_json(send, status: int, payload: Any, headers: Dict[str, str] = None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    response_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    response_headers += [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": response_headers + CORS_HEADERS})
+    await send({"type": "http.response.body", "body": body})
+
+def _match(method: str, path: str):
+    """Handler and path parameters of an async route, or None if Flask serves the request"""
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.match(path)
+        if match and method in (route_method, "OPTIONS"):
+            return handler, match.groupdict()
+    return None
+
+async def _acquire_slot() -> bool:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=ASYNC_ACQUIRE_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+async def _handle(scope, receive, send, handler: Handler, params: Dict[str, str]):
+    if scope["method"] == "OPTIONS":
+        await _send_json(send, 204, None)
+        return
+
+    if not await _acquire_slot():
+        logger.warning(f"Async route concurrency limit ({ASYNC_MAX_CONCURRENCY}) reached")
+        await _send_json(send, 503, {"error": "The server is busy, please try again shortly"}, {"Retry-After": "1"})
+        return
+    try:
+        body = await _read_body(receive)
+        data = None
+        if scope["method"] == "POST":
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                await _send_json(send, 400, {"error": "Invalid JSON"})
+                return
+        payload, status, headers = await handler(data, **params)
+        await _send_json(send, status, payload, headers)
+    except Exception as e:
+        logger.error(f"Error serving {scope['path']}: {str(e)}")
+        await _send_json(send, 500, {"error": f"Request failed: {str(e)}"})
+    finally:
+        _slots.release()
+
+
+class AsyncApp:
+    """ASGI app: async routes on the event loop, everything else through Flask"""
+
+    def __init__(self, wsgi_app, wsgi_threads: int = WSGI_THREADS):
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=wsgi_threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    _executor.shutdown(wait=False)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        route = _match(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if route is None:
+            await self.wsgi(scope, receive, send)
+            return
+        handler, params = route
+        await _handle(scope, receive, send, handler, params)
+
+
+app = AsyncApp(flask_app)
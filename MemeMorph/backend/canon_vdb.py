@@ -1,19 +1,147 @@
 import os
+import re
 import uuid
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import json
+import time
+import zlib
 from datetime import datetime
 import chromadb
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
+from chromadb.api.types import EmbeddingFunction
+from lore_index import LoreIndex, encode_cursor
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from embedding_cache import EmbeddingCache
+from vector_backends import ChromaBackend, NumpyBackend
+from context_builder import ContextBuilder
+from text_chunker import TextChunker, Chunk
+from embedding_backends import get_embedder, embedder_version
+from embedding_service import EmbeddingClient, RemoteEmbedder
+from single_flight import get_single_flight, request_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Model lore was embedded with before model versions were recorded
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Sentence-transformer model configured for lore embeddings; a store that has
+# been re-indexed keeps serving the model recorded at its last cutover
+EMBEDDING_MODEL_NAME = os.getenv('CANON_VDB_EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+
+# Name of the single shared collection (and the legacy, pre-sharding layout)
+LEGACY_COLLECTION_NAME = "canon_lore"
+
+# Prefix of per-world shard collections
+SHARD_COLLECTION_PREFIX = "lore_"
+
+# search_lore modes: embeddings only, BM25 only, or both merged by reciprocal rank fusion
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Metadata keys that describe a single chunk rather than the entry as a whole
+CHUNK_METADATA_KEYS = ("chunk_number", "total_chunks", "chunk_start", "chunk_end", "chunk_gap", "content_hash")
+
+def content_hash(text: str) -> str:
+    """Stable content hash for a chunk of lore text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_parent_id(chunk_id: str, metadata: Dict[str, Any]) -> str:
+    """ID of the entry a stored chunk row belongs to"""
+    chunk_number = metadata.get("chunk_number")
+    parent_id = metadata.get("parent_id")
+    # Entries written before parent_id existed: strip the "_<n>" suffix
+    if parent_id is None and chunk_number is not None and chunk_id.endswith(f"_{chunk_number}"):
+        parent_id = chunk_id[:-len(f"_{chunk_number}")]
+    return parent_id or chunk_id
+
+def shard_collection_name(world_id: str) -> str:
+    """
+    Collection name for a world's shard
+    
+    ChromaDB names are limited to 3-63 characters of [a-zA-Z0-9._-], so the
+    world ID is slugged and suffixed with a short hash to stay unique.
+    """
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '-', world_id).strip('-_')[:32] or "world"
+    digest = hashlib.sha1(world_id.encode("utf-8")).hexdigest()[:10]
+    return f"{SHARD_COLLECTION_PREFIX}{slug}_{digest}"
+
+# Embedders are loaded once per process and shared by every CanonVDB instance
+_embedders: Dict[str, Any] = {}
+_embedders_lock = threading.Lock()
+
+# Process-wide CanonVDB served by get_canon_vdb(), with the PID that created it
+_instance = None
+_instance_pid = None
+_instance_lock = threading.Lock()
+
+def get_shared_embedder(model_name: str = EMBEDDING_MODEL_NAME):
+    """
+    Return this process's embedder for a model, loading it on first use
+    
+    When loaded in a gunicorn master before forking (see preload()), the model
+    weights are shared with every worker through copy-on-write. With
+    CANON_VDB_EMBEDDING_SOCKET set, texts are embedded by the shared embedding
+    service instead, and the model is only loaded here if the service is down.
+    """
+    backend = os.getenv('CANON_VDB_EMBEDDING_BACKEND', 'sentence-transformers')
+    socket_path = os.getenv('CANON_VDB_EMBEDDING_SOCKET')
+    key = f"{backend}:{model_name}:{socket_path or ''}"
+    with _embedders_lock:
+        if key not in _embedders:
+            if socket_path:
+                _embedders[key] = RemoteEmbedder(
+                    EmbeddingClient(socket_path),
+                    embedder_version(model_name, backend=backend),
+                    lambda: get_embedder(model_name, backend=backend)
+                )
+            else:
+                _embedders[key] = get_embedder(model_name, backend=backend)
+        return _embedders[key]
+
+def get_canon_vdb():
+    """
+    Return the process-wide CanonVDB, creating it on first use
+    
+    The instance holds a ChromaDB client and SQLite connections, which must
+    not cross a fork, so a forked worker gets its own instance.
+    """
+    global _instance, _instance_pid
+    with _instance_lock:
+        if _instance is None or _instance_pid != os.getpid():
+            _instance = CanonVDB()
+            _instance_pid = os.getpid()
+        return _instance
+
+def preload():
+    """
+    Load CanonVDB's read-only state ahead of forking workers
+    
+    Only the embedding model is loaded; clients and connections are opened
+    per worker by get_canon_vdb(). The ONNX backend is left to the workers,
+    since ONNX Runtime's thread pools do not survive a fork. With the
+    embedding service configured there is no model to preload.
+    """
+    if os.getenv('CANON_VDB_EMBEDDING_SOCKET'):
+        return get_shared_embedder(EMBEDDING_MODEL_NAME)
+    if os.getenv('CANON_VDB_EMBEDDING_BACKEND', 'sentence-transformers') == "onnx":
+        import onnxruntime  # noqa: F401
+        return None
+    return get_shared_embedder(EMBEDDING_MODEL_NAME)
+
+class EmbedderFunction(EmbeddingFunction):
+    """Exposes a CanonVDB embedder to ChromaDB, so collections never load a second model"""
+    
+    def __init__(self, embedder):
+        self.embedder = embedder
+    
+    def __call__(self, input):
+        return self.embedder.encode(list(input)).tolist()
+
 class CanonVDB:
     """
     CanonVDB - Vector Database for storing and retrieving world lore
@@ -24,8 +152,28 @@ class CanonVDB:
     - Integration with the World Explorer feature
     """
     
-    def __init__(self, persist_directory: str = None):
-        """Initialize the CanonVDB with a ChromaDB backend"""
+    def __init__(self, 
+                 persist_directory: str = None, 
+                 embedding_cache_dir: str = None,
+                 vector_backend: str = None,
+                 small_world_threshold: int = None,
+                 sharding: str = None,
+                 search_mode: str = None):
+        """
+        Initialize the CanonVDB with a ChromaDB backend
+        
+        Args:
+            persist_directory: Where ChromaDB and the lore index are stored
+            embedding_cache_dir: Where the on-disk embedding cache is stored
+                                 (defaults to CANON_VDB_EMBEDDING_CACHE or <persist_directory>/embedding_cache)
+            vector_backend: "auto", "chroma" or "numpy" (defaults to CANON_VDB_VECTOR_BACKEND or "auto")
+            small_world_threshold: In "auto" mode, worlds with at most this many chunks
+                                   are searched with the in-process NumPy index
+            sharding: "world" to keep each world in its own collection, or "single" for
+                      one shared collection (defaults to CANON_VDB_SHARDING or "world")
+            search_mode: Default search_lore mode, "vector", "lexical" or "hybrid"
+                         (defaults to CANON_VDB_SEARCH_MODE or "hybrid")
+        """
         self.persist_directory = persist_directory or os.path.join(
             os.path.dirname(os.path.abspath(__file__)), 
             'data', 
@@ -35,8 +183,26 @@ class CanonVDB:
         # Create directory if it doesn't exist
         os.makedirs(self.persist_directory, exist_ok=True)
         
-        # Initialize the embedding function (sentence-transformer model)
-        self.embedding_function = SentenceTransformer('all-MiniLM-L6-v2')
+        # Sidecar index mapping entries to their chunk ids, plus the lore catalog
+        # and the active embedding model / collection mapping
+        self.index = LoreIndex(os.path.join(self.persist_directory, 'lore_index.sqlite3'))
+        self._epoch = self.index.get_collection_epoch()
+        self._epoch_checked_at = time.monotonic()
+        
+        # Per-world BM25 index of chunk text, maintained alongside the collections
+        self.lexical_index = LexicalIndex(os.path.join(self.persist_directory, 'lexical_index.sqlite3'))
+        self.search_mode = search_mode or os.getenv('CANON_VDB_SEARCH_MODE', 'hybrid')
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{self.search_mode}' (expected one of {', '.join(SEARCH_MODES)})")
+        
+        # Serve the model recorded at the last re-index cutover, if any
+        self.embedding_cache_dir = embedding_cache_dir or os.getenv('CANON_VDB_EMBEDDING_CACHE') or \
+            os.path.join(self.persist_directory, 'embedding_cache')
+        self._load_embedder(self.index.get_meta("embedding_model") or EMBEDDING_MODEL_NAME)
+        if self.model_name != EMBEDDING_MODEL_NAME:
+            logger.warning(
+                f"Serving lore embedded with {self.model_name}; run a re-index to switch to {EMBEDDING_MODEL_NAME}"
+            )
         
         # Initialize ChromaDB client with persistence
         self.client = chromadb.PersistentClient(
@@ -47,40 +213,432 @@ class CanonVDB:
         )
         
         # Text splitter for chunking long entries
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = TextChunker(
             chunk_size=500,
             chunk_overlap=100,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
         
-        # Get or create the collection for lore
+        # Collections whose vectors came from a different model version
+        self.stale_collections = set()
+        
+        # Get or create the shared collection for lore
         self.collection = self._get_or_create_collection()
         
+        # Per-world shard collections, opened lazily and cached
+        self.sharding = sharding or os.getenv('CANON_VDB_SHARDING', 'world')
+        self._collections: Dict[str, Any] = {}
+        self._collections_lock = threading.Lock()
+        if self.sharding == "world" and self.collection.count() > 0:
+            logger.warning(
+                f"Collection '{LEGACY_COLLECTION_NAME}' still holds lore; serving it unsharded "
+                "until migrate_to_shards() has been run"
+            )
+            self.sharding = "single"
+        
+        # Backfill the sidecar index for lore written before it existed
+        if self.index.is_empty() and any(c.count() > 0 for _, c in self._all_collections()):
+            self._backfill_index()
+        if self.lexical_index.is_empty() and any(c.count() > 0 for _, c in self._all_collections()):
+            self._backfill_lexical_index()
+        
+        # Search backends: exact NumPy index for small worlds, Chroma HNSW for the rest
+        self.vector_backend = vector_backend or os.getenv('CANON_VDB_VECTOR_BACKEND', 'auto')
+        self.small_world_threshold = small_world_threshold if small_world_threshold is not None else \
+            int(os.getenv('CANON_VDB_SMALL_WORLD_THRESHOLD', 2000))
+        self.chroma_backend = ChromaBackend(
+            self._collection_for,
+            shards=self._all_collections if self.sharding == "world" else None
+        )
+        self.numpy_backend = NumpyBackend(
+            self._collection_for, 
+            self.index,
+            space=(self.collection.metadata or {}).get("hnsw:space", "l2"),
+            # Resident-memory option for the exact backend; Chroma keeps float32 vectors
+            quantization=os.getenv('CANON_VDB_QUANTIZATION', 'none'),
+            rerank_factor=int(os.getenv('CANON_VDB_RERANK_FACTOR', 4)),
+            embedding_cache=self.embedding_cache
+        )
+        
+        # Token-budgeted context assembly for the World Explorer
+        self.context_builder = ContextBuilder(
+            token_budget=int(os.getenv('CANON_VDB_CONTEXT_TOKENS', 1500))
+        )
+        
         logger.info(f"CanonVDB initialized with persist directory: {self.persist_directory}")
     
-    def _get_or_create_collection(self):
-        """Get the existing collection or create a new one if it doesn't exist"""
+    def _load_embedder(self, model_name: str):
+        """Switch to an embedding model (sentence-transformers, ONNX Runtime or int8 torch,
+        see CANON_VDB_EMBEDDING_BACKEND) together with its embedding cache namespace"""
+        self.model_name = model_name
+        self.embedder = get_shared_embedder(model_name)
+        
+        # Content-addressed cache so identical chunk text is only embedded once
+        self.embedding_cache = EmbeddingCache(self.embedding_cache_dir, model_name=self.embedder.model_version)
+        
+        # One embedding function instance shared by every collection handle
+        self.chroma_embedding_function = EmbedderFunction(self.embedder)
+        
+        if getattr(self, "numpy_backend", None) is not None:
+            self.numpy_backend.embedding_cache = self.embedding_cache
+    
+    def _refresh_after_cutover(self):
+        """
+        Pick up a re-index cutover made by this or another process
+        
+        Checked at most once a second; on a new epoch the active model is
+        reloaded and collection handles are reopened through the new mapping.
+        """
+        now = time.monotonic()
+        if now - self._epoch_checked_at < 1.0:
+            return
+        self._epoch_checked_at = now
+        
+        epoch = self.index.get_collection_epoch()
+        if epoch == self._epoch:
+            return
+        
+        with self._collections_lock:
+            self._epoch = epoch
+            model_name = self.index.get_meta("embedding_model") or EMBEDDING_MODEL_NAME
+            if model_name != self.model_name:
+                self._load_embedder(model_name)
+            self._collections.clear()
+            self.stale_collections.clear()
+            self.collection = self._get_or_create_collection()
+        if getattr(self, "numpy_backend", None) is not None:
+            self.numpy_backend.invalidate()
+        logger.info(f"Switched to re-indexed collections embedded with {self.embedder.model_version}")
+    
+    def _open_collection(self, name: str, metadata: Dict[str, Any]):
+        """
+        Get a collection or create it, recording the embedding model version
+        
+        `name` is the logical collection name; after a re-index cutover it is
+        served by the physical collection recorded in the lore index. Existing
+        collections embedded with another model version are tracked in
+        stale_collections so they can be re-indexed.
+        """
+        name = self.index.get_physical_collection(name) or name
         try:
-            # Try to get the existing collection
             collection = self.client.get_collection(
-                name="canon_lore",
-                embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(
-                    model_name="all-MiniLM-L6-v2"
-                )
+                name=name,
+                embedding_function=self.chroma_embedding_function
+            )
+        except Exception:
+            # Missing (the exception type differs between ChromaDB versions)
+            collection = self.client.get_or_create_collection(
+                name=name,
+                embedding_function=self.chroma_embedding_function,
+                metadata={**metadata, "embedding_model": self.embedder.model_version}
             )
-            logger.info(f"Found existing collection with {collection.count()} entries")
-            return collection
-        except ValueError:
-            # Create new collection if it doesn't exist
-            collection = self.client.create_collection(
-                name="canon_lore",
-                embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(
-                    model_name="all-MiniLM-L6-v2"
-                ),
-                metadata={"description": "World lore entries for MemeMorph"}
+        
+        stored_version = (collection.metadata or {}).get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+        if stored_version != self.embedder.model_version and collection.count() > 0:
+            logger.warning(
+                f"Collection '{name}' was embedded with {stored_version}, "
+                f"but the configured model is {self.embedder.model_version}; it needs a re-index"
             )
-            logger.info("Created new collection for world lore")
-            return collection
+            self.stale_collections.add(name)
+        return collection
+    
+    @property
+    def reindex_required(self) -> bool:
+        """True if any opened collection was embedded with a different model version"""
+        return bool(self.stale_collections)
+    
+    def _get_or_create_collection(self):
+        """Get the shared collection or create it if it doesn't exist"""
+        collection = self._open_collection(
+            LEGACY_COLLECTION_NAME,
+            {"description": "World lore entries for MemeMorph"}
+        )
+        logger.info(f"Using collection '{LEGACY_COLLECTION_NAME}' with {collection.count()} entries")
+        return collection
+    
+    def _collection_for(self, world_id: str = None):
+        """Return the collection holding a world's lore, creating its shard on first use"""
+        self._refresh_after_cutover()
+        if self.sharding != "world":
+            return self.collection
+        
+        world_id = world_id or "default"
+        with self._collections_lock:
+            collection = self._collections.get(world_id)
+            if collection is None:
+                collection = self._open_collection(
+                    shard_collection_name(world_id),
+                    {"description": f"World lore entries for {world_id}", "world_id": world_id}
+                )
+                self._collections[world_id] = collection
+        return collection
+    
+    def _collection_for_entry(self, parent_id: str):
+        """Return the collection holding an entry, or None if the entry is unknown"""
+        if self.sharding != "world":
+            return self.collection
+        
+        entry = self.index.get_entry(parent_id)
+        if not entry:
+            return None
+        return self._collection_for(entry["world_id"])
+    
+    def _all_collections(self) -> List[Tuple[Optional[str], Any]]:
+        """Return (world_id, collection) for every collection that may hold lore"""
+        self._refresh_after_cutover()
+        if self.sharding != "world":
+            return [(None, self.collection)]
+        
+        shards = []
+        seen = set()
+        for item in self.client.list_collections():
+            # Older ChromaDB versions return Collection objects, newer ones names
+            name = item if isinstance(item, str) else item.name
+            if not name.startswith(SHARD_COLLECTION_PREFIX):
+                continue
+            metadata = (item.metadata if not isinstance(item, str) else None) or \
+                (self.client.get_collection(name=name).metadata or {})
+            world_id = metadata.get("world_id")
+            # Re-indexed worlds have several physical collections; list each world once
+            if world_id and world_id not in seen:
+                seen.add(world_id)
+                shards.append((world_id, self._collection_for(world_id)))
+        return shards
+    
+    def _fan_out(self, fn, collections: List[Tuple[Optional[str], Any]], max_workers: int = 8) -> List[Any]:
+        """Run fn(world_id, collection) over collections in parallel, preserving order"""
+        if len(collections) <= 1:
+            return [fn(world_id, collection) for world_id, collection in collections]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(collections))) as pool:
+            return list(pool.map(lambda item: fn(*item), collections))
+    
+    def migrate_to_shards(self, batch_size: int = 500) -> int:
+        """
+        Move lore from the single shared collection into per-world shards
+        
+        Vectors are copied as stored, so nothing is re-embedded. The copy uses
+        upserts and can safely be re-run if interrupted; the shared collection
+        is only emptied once every row has been copied. Other workers keep
+        serving the shared collection until they are restarted.
+        
+        Returns:
+            The number of migrated chunks
+        """
+        migrated = 0
+        offset = 0
+        previous_mode, self.sharding = self.sharding, "world"
+        try:
+            while True:
+                batch = self.collection.get(
+                    limit=batch_size, 
+                    offset=offset, 
+                    include=["documents", "metadatas", "embeddings"]
+                )
+                if not batch["ids"]:
+                    break
+                
+                # Group the batch by world and bulk-load each shard
+                by_world: Dict[str, List[int]] = {}
+                for i, meta in enumerate(batch["metadatas"]):
+                    by_world.setdefault((meta or {}).get("world_id", "default"), []).append(i)
+                
+                for world_id, rows in by_world.items():
+                    self._collection_for(world_id).upsert(
+                        ids=[batch["ids"][i] for i in rows],
+                        documents=[batch["documents"][i] for i in rows],
+                        embeddings=[list(batch["embeddings"][i]) for i in rows],
+                        metadatas=[batch["metadatas"][i] for i in rows]
+                    )
+                
+                migrated += len(batch["ids"])
+                offset += len(batch["ids"])
+                logger.info(f"Migrated {migrated} chunks to per-world shards")
+        except Exception:
+            self.sharding = previous_mode
+            raise
+        
+        # Everything is copied; drop the shared rows and start serving from shards
+        self.client.delete_collection(name=self.collection.name)
+        self.collection = self._get_or_create_collection()
+        self.chroma_backend.shards = self._all_collections
+        self.numpy_backend.invalidate()
+        
+        logger.info(f"Migration to per-world shards complete ({migrated} chunks)")
+        return migrated
+    
+    def shard_stats(self) -> List[Dict[str, Any]]:
+        """Chunk and entry counts for every shard, gathered in parallel"""
+        def stats(world_id, collection):
+            return {
+                "world_id": world_id,
+                "collection": collection.name,
+                "chunks": collection.count(),
+                "embedding_model": (collection.metadata or {}).get("embedding_model", DEFAULT_EMBEDDING_MODEL),
+                "entries": self.index.count_entries(world_id=world_id) if world_id else self.index.count_entries()
+            }
+        return self._fan_out(stats, self._all_collections())
+    
+    def start_reindex(self, model_name: str = None, batch_size: int = 100, max_rate: float = 0.0) -> Dict[str, Any]:
+        """
+        Start (or resume) re-embedding all lore with another model in the background
+        
+        Reads keep being served from the current collections until the job's
+        atomic cutover; see reindex.ReindexJob.
+        
+        Args:
+            model_name: Model to switch to (defaults to CANON_VDB_EMBEDDING_MODEL)
+            batch_size: Chunks embedded and written per batch
+            max_rate: Maximum chunks per second (0 for no throttling)
+            
+        Returns:
+            The job's state
+        """
+        from reindex import ReindexJob
+        
+        job = ReindexJob(self, model_name or EMBEDDING_MODEL_NAME, batch_size=batch_size, max_rate=max_rate)
+        if self.embedder.model_version == job.embedder.model_version:
+            raise ValueError(f"Lore is already embedded with {job.embedder.model_version}")
+        return job.start().state
+    
+    def reindex_status(self) -> Dict[str, Any]:
+        """Active and configured embedding model, plus the state of the latest re-index job"""
+        job = self.index.get_reindex_job()
+        return {
+            "active_model": self.embedder.model_version,
+            "configured_model": EMBEDDING_MODEL_NAME,
+            "stale_collections": sorted(self.stale_collections),
+            "job": job,
+            "progress": self.index.get_reindex_progress(job["job_id"]) if job else {}
+        }
+    
+    def _backfill_index(self, batch_size: int = 1000):
+        """Populate the chunk index and catalog from metadata of existing entries"""
+        indexed = 0
+        for _, collection in self._all_collections():
+            indexed += self._backfill_collection(collection, batch_size)
+        
+        logger.info(f"Backfilled lore index with {indexed} chunks")
+    
+    def _backfill_lexical_index(self, batch_size: int = 1000):
+        """Build the BM25 index from the documents of existing entries"""
+        indexed = 0
+        for _, collection in self._all_collections():
+            offset = 0
+            while True:
+                batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+                if not batch["ids"]:
+                    break
+                self.lexical_index.add_rows(batch["ids"], batch["documents"], batch["metadatas"])
+                offset += len(batch["ids"])
+                indexed += len(batch["ids"])
+        
+        logger.info(f"Backfilled lexical index with {indexed} chunks")
+    
+    def _backfill_collection(self, collection, batch_size: int) -> int:
+        """Index the chunks of one collection"""
+        offset = 0
+        indexed = 0
+        while True:
+            batch = collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            if not batch["ids"]:
+                break
+            
+            indexed += self._index_rows(batch["ids"], batch["metadatas"])
+            offset += len(batch["ids"])
+        
+        return indexed
+    
+    def _index_rows(self, chunk_ids: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """Register stored chunk rows in the chunk index and catalog from their metadata"""
+        for chunk_id, meta in zip(chunk_ids, metadatas):
+            meta = meta or {}
+            chunk_number = meta.get("chunk_number")
+            parent_id = chunk_parent_id(chunk_id, meta)
+            
+            self.index.add_chunk(parent_id, chunk_id, chunk_number or 0)
+            if not chunk_number:
+                self.index.update_entry(parent_id, meta)
+        return len(chunk_ids)
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts, checking the embedding cache before calling the model"""
+        if not texts:
+            return []
+        return self.embedding_cache.embed(
+            texts,
+            [content_hash(text) for text in texts],
+            self._embed_uncached
+        )
+    
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed document texts with the configured embedder"""
+        self._refresh_after_cutover()
+        return self.embedder.encode(texts).tolist()
+    
+    def _chunk_content(self, content: str) -> List[Chunk]:
+        """Split content into chunks (with their offsets in content) if it's long"""
+        if len(content) > 500:
+            return self.text_splitter.split_with_offsets(content)
+        return [Chunk(content, 0, len(content))]
+    
+    def _chunk_rows(self, 
+                    entry_id: str, 
+                    chunks: List[Chunk], 
+                    entry_metadata: Dict[str, Any],
+                    content: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Build the collection IDs and per-chunk metadata for an entry's chunks of content"""
+        if len(chunks) == 1:
+            # Stored as a single entry under the entry ID
+            chunk_metadata = entry_metadata.copy()
+            chunk_metadata["content_hash"] = content_hash(chunks[0].text)
+            return [entry_id], [chunk_metadata]
+        
+        # Each chunk shares the parent ID but has its own chunk number
+        chunk_ids = [f"{entry_id}_{i}" for i in range(len(chunks))]
+        chunk_metadatas = []
+        for i, chunk in enumerate(chunks):
+            chunk_metadata = entry_metadata.copy()
+            chunk_metadata["chunk_number"] = i
+            chunk_metadata["total_chunks"] = len(chunks)
+            chunk_metadata["chunk_start"] = chunk.start
+            chunk_metadata["chunk_end"] = chunk.end
+            # Whitespace the splitter dropped between this chunk and the previous one
+            if i and chunk.start > chunks[i - 1].end:
+                chunk_metadata["chunk_gap"] = content[chunks[i - 1].end:chunk.start]
+            chunk_metadata["content_hash"] = content_hash(chunk.text)
+            chunk_metadatas.append(chunk_metadata)
+        return chunk_ids, chunk_metadatas
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed search queries in one batched forward pass with the same model as the documents"""
+        return self._embed_uncached(queries)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query; pass the result to search_lore to avoid embedding it twice"""
+        return self._embed_queries([query])[0]
+    
+    def get_world_version(self, world_id: str) -> int:
+        """Counter that changes whenever a world's lore is written"""
+        return self.index.get_world_version(world_id)
+    
+    def _backend_for(self, world_id: str = None):
+        """Pick the search backend for a query"""
+        if self.vector_backend == "chroma" or not world_id:
+            return self.chroma_backend
+        if self.vector_backend == "numpy":
+            return self.numpy_backend
+        
+        # auto: small worlds are faster to search exactly in-process
+        chunk_count = self.index.count_world_chunks(world_id, cap=self.small_world_threshold)
+        if chunk_count <= self.small_world_threshold:
+            return self.numpy_backend
+        return self.chroma_backend
+    
+    def _resolve_entry(self, entry_id: str) -> Tuple[str, List[str]]:
+        """Resolve an entry or chunk ID to (parent_id, ordered chunk ids)"""
+        parent_id = self.index.get_parent_id(entry_id) or entry_id
+        chunk_ids = self.index.get_chunk_ids(parent_id) or [entry_id]
+        return parent_id, chunk_ids
     
     def add_lore_entry(self, 
                       title: str, 
@@ -116,30 +674,25 @@ class CanonVDB:
         if metadata:
             entry_metadata.update(metadata)
         
+        # Every row records the entry it belongs to
+        entry_metadata["parent_id"] = entry_id
+        
         # Split content into chunks if it's long
-        if len(content) > 500:
-            chunks = self.text_splitter.split_text(content)
+        chunks = self._chunk_content(content)
+        if len(chunks) > 1:
             logger.info(f"Split lore entry '{title}' into {len(chunks)} chunks")
-            
-            # Add each chunk with same ID but different chunk number
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{entry_id}_{i}"
-                chunk_metadata = entry_metadata.copy()
-                chunk_metadata["chunk_number"] = i
-                chunk_metadata["total_chunks"] = len(chunks)
-                
-                self.collection.add(
-                    ids=[chunk_id],
-                    documents=[chunk],
-                    metadatas=[chunk_metadata]
-                )
-        else:
-            # Add as a single entry
-            self.collection.add(
-                ids=[entry_id],
-                documents=[content],
-                metadatas=[entry_metadata]
-            )
+        
+        chunk_ids, chunk_metadatas = self._chunk_rows(entry_id, chunks, entry_metadata, content)
+        texts = [chunk.text for chunk in chunks]
+        self._collection_for(entry_metadata["world_id"]).add(
+            ids=chunk_ids,
+            documents=texts,
+            embeddings=self._embed(texts),
+            metadatas=chunk_metadatas
+        )
+        
+        self.index.add_entry(entry_id, chunk_ids, entry_metadata)
+        self.lexical_index.add_rows(chunk_ids, texts, chunk_metadatas)
         
         logger.info(f"Added lore entry '{title}' with ID {entry_id}")
         return entry_id
@@ -148,91 +701,275 @@ class CanonVDB:
                    query: str, 
                    world_id: str = None,
                    category: str = None,
-                   n_results: int = 5) -> List[Dict[str, Any]]:
+                   n_results: int = 5,
+                   mode: str = None,
+                   query_embedding: List[float] = None) -> List[Dict[str, Any]]:
         """
         Search for relevant lore entries based on a query
         
+        In "hybrid" mode the vector ranking and the BM25 ranking are merged
+        with reciprocal rank fusion. In "hybrid" and "lexical" mode a query
+        that is exactly one entry's title (ignoring case, punctuation and
+        stopwords) is answered from the lexical index without embedding.
+        Identical searches running at the same time share one execution.
+        
         Args:
             query: The search query
             world_id: Filter by world ID
             category: Filter by category
             n_results: Number of results to return
+            mode: "vector", "lexical" or "hybrid" (defaults to the configured search mode)
+            query_embedding: The query's embedding, if the caller already computed it
             
         Returns:
             List of relevant lore entries with their metadata
         """
-        # Prepare filter conditions if needed
-        where_clause = {}
-        if world_id:
-            where_clause["world_id"] = world_id
-        if category:
-            where_clause["category"] = category
+        key = request_key("search_lore", store=self.persist_directory, query=query, world_id=world_id,
+                          category=category, n_results=n_results, mode=mode or self.search_mode)
+        formatted_results = get_single_flight().do(key, lambda: self._search(
+            [query], world_id, category, n_results, mode,
+            [query_embedding] if query_embedding is not None else None
+        )[0])
+        logger.info(f"Search for '{query}' returned {len(formatted_results)} results ({mode or self.search_mode})")
+        return formatted_results
+    
+    def search_lore_batch(self, 
+                          queries: List[str], 
+                          world_id: str = None,
+                          category: str = None,
+                          n_results: int = 5,
+                          mode: str = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for relevant lore for several queries at once
         
-        # Perform the search
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            where=where_clause if where_clause else None
-        )
+        All queries that need embedding are embedded in one batched forward
+        pass and sent to the backend as a single multi-query request.
+        
+        Args:
+            queries: The search queries
+            world_id: Filter by world ID
+            category: Filter by category
+            n_results: Number of results to return per query
+            mode: "vector", "lexical" or "hybrid" (defaults to the configured search mode)
+            
+        Returns:
+            One list of results per query, in the same format as search_lore
+        """
+        if not queries:
+            return []
+        
+        batch_results = self._search(queries, world_id, category, n_results, mode)
+        logger.info(f"Batch search for {len(queries)} queries ({mode or self.search_mode})")
+        return batch_results
+    
+    def _search(self, 
+                queries: List[str], 
+                world_id: str, 
+                category: str, 
+                n_results: int, 
+                mode: str = None,
+                query_embeddings: List[List[float]] = None) -> List[List[Dict[str, Any]]]:
+        """Run queries in the given mode; see search_lore"""
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}' (expected one of {', '.join(SEARCH_MODES)})")
         
-        # Format the response
+        # Exact title matches never reach the model
+        all_results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        if mode != "vector":
+            for i, query in enumerate(queries):
+                all_results[i] = self._title_match_results(query, world_id, category, n_results)
+        pending = [i for i, results in enumerate(all_results) if results is None]
+        
+        if mode == "lexical":
+            for i in pending:
+                all_results[i] = self._lexical_results(queries[i], world_id, category, n_results)
+        elif pending:
+            # Fused rankings draw on a deeper candidate list from each retriever
+            depth = n_results if mode == "vector" else n_results * 2
+            backend = self._backend_for(world_id)
+            if query_embeddings is not None:
+                embeddings = [query_embeddings[i] for i in pending]
+            else:
+                embeddings = self._embed_queries([queries[i] for i in pending])
+            results = backend.query(
+                embeddings,
+                world_id=world_id,
+                category=category,
+                n_results=depth
+            )
+            for query_index, i in enumerate(pending):
+                vector_results = self._format_results(results, query_index)
+                if mode == "hybrid":
+                    vector_results = self._fuse(queries[i], vector_results, world_id, category, n_results)
+                all_results[i] = vector_results
+        return all_results
+    
+    def _fetch_chunks(self, chunk_ids: List[str], world_id: str = None) -> Dict[str, Dict[str, Any]]:
+        """Load stored chunks by ID from the collections holding them"""
+        if not chunk_ids:
+            return {}
+        if world_id or self.sharding != "world":
+            groups = {world_id: list(chunk_ids)}
+        else:
+            groups = {}
+            for chunk_id, chunk_world in self.lexical_index.get_worlds(chunk_ids).items():
+                groups.setdefault(chunk_world, []).append(chunk_id)
+        
+        chunks = {}
+        for group_world, ids in groups.items():
+            stored = self._collection_for(group_world).get(ids=ids, include=["documents", "metadatas"])
+            for chunk_id, document, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                chunks[chunk_id] = {"id": chunk_id, "content": document, "metadata": metadata}
+        return chunks
+    
+    def _lexical_results(self, 
+                         query: str, 
+                         world_id: str, 
+                         category: str, 
+                         n_results: int,
+                         exclude: set = frozenset()) -> List[Dict[str, Any]]:
+        """BM25 results in search_lore's format (distance is None, score is the BM25 score)"""
+        ranked = [(chunk_id, score) 
+                  for chunk_id, score in self.lexical_index.search(query, world_id, category, n_results + len(exclude))
+                  if chunk_id not in exclude][:n_results]
+        chunks = self._fetch_chunks([chunk_id for chunk_id, _ in ranked], world_id)
+        return [{**chunks[chunk_id], "distance": None, "score": score} 
+                for chunk_id, score in ranked if chunk_id in chunks]
+    
+    def _title_match_results(self, 
+                             query: str, 
+                             world_id: str, 
+                             category: str, 
+                             n_results: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Results for a query naming exactly one entry's title, or None
+        
+        The entry's chunks come first; the rest of the results are filled from
+        the BM25 index, so the query is never embedded.
+        """
+        parent_id = self.lexical_index.match_title(query, world_id, category)
+        if parent_id is None:
+            return None
+        
+        chunk_ids = self.index.get_chunk_ids(parent_id)[:n_results]
+        collection = self._collection_for_entry(parent_id)
+        if not chunk_ids or collection is None:
+            return None
+        stored = collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+        by_id = {chunk_id: (document, metadata) 
+                 for chunk_id, document, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])}
+        results = [{"id": chunk_id, "content": by_id[chunk_id][0], "metadata": by_id[chunk_id][1], 
+                    "distance": None, "score": None}
+                   for chunk_id in chunk_ids if chunk_id in by_id]
+        if not results:
+            return None
+        
+        if len(results) < n_results:
+            results += self._lexical_results(query, world_id, category, n_results - len(results), 
+                                             exclude=set(chunk_ids))
+        logger.info(f"Query '{query}' matched the title of lore entry {parent_id}; skipped embedding")
+        return results
+    
+    def _fuse(self, 
+              query: str, 
+              vector_results: List[Dict[str, Any]], 
+              world_id: str, 
+              category: str, 
+              n_results: int) -> List[Dict[str, Any]]:
+        """Merge vector results with BM25 results by reciprocal rank fusion"""
+        lexical = self.lexical_index.search(query, world_id, category, n_results * 2)
+        if not lexical:
+            return vector_results[:n_results]
+        
+        fused = reciprocal_rank_fusion([[r["id"] for r in vector_results], [chunk_id for chunk_id, _ in lexical]])
+        fused = fused[:n_results]
+        
+        by_id = {r["id"]: r for r in vector_results}
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+        by_id.update({chunk_id: {**chunk, "distance": None} 
+                      for chunk_id, chunk in self._fetch_chunks(missing, world_id).items()})
+        return [{**by_id[chunk_id], "score": score} for chunk_id, score in fused if chunk_id in by_id]
+    
+    def _format_results(self, results: Dict[str, Any], query_index: int) -> List[Dict[str, Any]]:
+        """Format one query's results from a backend response"""
         formatted_results = []
         if results and results["ids"] and results["documents"]:
-            for i, doc_id in enumerate(results["ids"][0]):
+            for i, doc_id in enumerate(results["ids"][query_index]):
                 entry = {
                     "id": doc_id,
-                    "content": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if "distances" in results else None
+                    "content": results["documents"][query_index][i],
+                    "metadata": results["metadatas"][query_index][i],
+                    "distance": results["distances"][query_index][i] if "distances" in results else None
                 }
                 formatted_results.append(entry)
-        
-        logger.info(f"Search for '{query}' returned {len(formatted_results)} results")
         return formatted_results
     
     def get_lore_by_id(self, entry_id: str) -> Optional[Dict[str, Any]]:
-        """Retrieve a specific lore entry by ID"""
-        results = self.collection.get(ids=[entry_id])
+        """Retrieve a specific lore entry by entry ID or chunk ID"""
+        parent_id, chunk_ids = self._resolve_entry(entry_id)
+        collection = self._collection_for_entry(parent_id)
+        if collection is None:
+            return None
+        results = collection.get(ids=chunk_ids)
         
         if not results["ids"]:
             return None
         
-        # If the entry has chunks, try to find all chunks
-        if "_" in entry_id and entry_id.split("_")[1].isdigit():
-            # This is a chunk, so find all related chunks
-            base_id = entry_id.split("_")[0]
-            all_chunks = self.collection.get(
-                where={"$contains": base_id}
-            )
+        rows = list(zip(results["ids"], results["documents"], results["metadatas"]))
+        return self._assemble_entry(parent_id, rows)
+    
+    def _join_chunks(self, chunks: List[Dict[str, Any]]) -> str:
+        """
+        Rebuild entry text from chunks with recorded offsets, dropping the overlap between them
+
+        The whitespace between non-overlapping chunks comes from chunk_gap; rows
+        stored before it was recorded get a newline there, so their text is
+        only approximately the original.
+        """
+        parts = []
+        covered = 0
+        for chunk in chunks:
+            start = chunk["metadata"]["chunk_start"]
+            if start > covered and parts:
+                parts.append(chunk["metadata"].get("chunk_gap", "\n"))
+            parts.append(chunk["content"][max(0, covered - start):])
+            covered = max(covered, chunk["metadata"]["chunk_end"])
+        return "".join(parts)
+    
+    def _assemble_entry(self, parent_id: str, rows: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Combine an entry's (id, document, metadata) rows into a single entry"""
+        # If the entry has chunks, combine them in chunk order
+        if len(rows) > 1 or rows[0][0] != parent_id:
+            chunks = []
+            for chunk_id, document, chunk_metadata in rows:
+                chunks.append({
+                    "id": chunk_id,
+                    "content": document,
+                    "metadata": chunk_metadata,
+                    "chunk_number": chunk_metadata.get("chunk_number", 0)
+                })
             
             # Sort chunks by number and combine content
-            if all_chunks["ids"]:
-                chunks = []
-                for i, chunk_id in enumerate(all_chunks["ids"]):
-                    chunks.append({
-                        "id": chunk_id,
-                        "content": all_chunks["documents"][i],
-                        "metadata": all_chunks["metadatas"][i],
-                        "chunk_number": all_chunks["metadatas"][i].get("chunk_number", 0)
-                    })
-                
-                # Sort chunks by number and combine content
-                chunks.sort(key=lambda x: x["chunk_number"])
+            chunks.sort(key=lambda x: x["chunk_number"])
+            if all("chunk_start" in c["metadata"] for c in chunks):
+                combined_content = self._join_chunks(chunks)
+            else:
                 combined_content = "\n".join([c["content"] for c in chunks])
-                
-                # Return combined entry
-                return {
-                    "id": base_id,
-                    "content": combined_content,
-                    "metadata": chunks[0]["metadata"],  # Use first chunk's metadata
-                    "chunks": chunks
-                }
+            
+            # Return combined entry
+            return {
+                "id": parent_id,
+                "content": combined_content,
+                "metadata": chunks[0]["metadata"],  # Use first chunk's metadata
+                "chunks": chunks
+            }
         
         # Return single entry
         return {
-            "id": results["ids"][0],
-            "content": results["documents"][0],
-            "metadata": results["metadatas"][0]
+            "id": rows[0][0],
+            "content": rows[0][1],
+            "metadata": rows[0][2]
         }
     
     def update_lore_entry(self, 
@@ -240,7 +977,11 @@ class CanonVDB:
                          content: str = None, 
                          metadata: Dict[str, Any] = None) -> bool:
         """
-        Update an existing lore entry
+        Update an existing lore entry in place
+        
+        New content is re-chunked and compared against the stored per-chunk
+        content hashes; only chunks whose text changed are re-embedded. The
+        entry keeps its original ID.
         
         Args:
             entry_id: ID of the entry to update
@@ -250,68 +991,131 @@ class CanonVDB:
         Returns:
             Success flag
         """
-        # First check if entry exists
-        entry = self.get_lore_by_id(entry_id)
-        if not entry:
+        if content is None and not metadata:
+            return False
+        
+        # Fetch the stored chunks in one call
+        parent_id, old_ids = self._resolve_entry(entry_id)
+        old_collection = self._collection_for_entry(parent_id)
+        existing = old_collection.get(ids=old_ids) if old_collection is not None else {"ids": []}
+        if not existing["ids"]:
             logger.error(f"Cannot update entry {entry_id}: not found")
             return False
         
-        # Handle updates for chunked entries
-        if "chunks" in entry:
-            # Delete all existing chunks
-            for chunk in entry["chunks"]:
-                self.collection.delete(ids=[chunk["id"]])
-            
-            # Re-add with new content and/or metadata
-            new_content = content if content is not None else entry["content"]
-            new_metadata = entry["metadata"].copy()
-            if metadata:
-                new_metadata.update(metadata)
-                
-            # Add updated entry
-            return self.add_lore_entry(
-                title=new_metadata.get("title", "Untitled"),
-                content=new_content,
-                category=new_metadata.get("category", "general"),
-                world_id=new_metadata.get("world_id", "default"),
-                metadata=new_metadata
-            ) is not None
-        
-        # Handle single entries (update in place)
-        update_data = {}
-        if content is not None:
-            update_data["documents"] = [content]
+        old_rows = {}
+        for i, chunk_id in enumerate(existing["ids"]):
+            chunk_metadata = existing["metadatas"][i] or {}
+            old_rows[chunk_id] = {
+                "document": existing["documents"][i],
+                "metadata": chunk_metadata,
+                "hash": chunk_metadata.get("content_hash") or content_hash(existing["documents"][i])
+            }
+        
+        # Entry-level metadata, without the per-chunk fields
+        first_id = min(old_rows, key=lambda cid: old_rows[cid]["metadata"].get("chunk_number", 0))
+        entry_metadata = {k: v for k, v in old_rows[first_id]["metadata"].items() 
+                          if k not in CHUNK_METADATA_KEYS}
         if metadata:
-            updated_metadata = entry["metadata"].copy()
-            updated_metadata.update(metadata)
-            update_data["metadatas"] = [updated_metadata]
-        
-        if update_data:
-            self.collection.update(
-                ids=[entry_id],
-                **update_data
+            # None means "leave unchanged"; Chroma can't store None values anyway
+            entry_metadata.update({k: v for k, v in metadata.items() if v is not None})
+        entry_metadata["parent_id"] = parent_id
+        
+        # A changed world_id moves the entry to another shard
+        collection = self._collection_for(entry_metadata.get("world_id"))
+        moving = collection is not old_collection
+        
+        # Metadata-only update: keep documents and vectors as they are
+        if content is None:
+            ordered_ids = sorted(old_rows, key=lambda cid: old_rows[cid]["metadata"].get("chunk_number", 0))
+            metadatas = []
+            for chunk_id in ordered_ids:
+                chunk_metadata = entry_metadata.copy()
+                for key in CHUNK_METADATA_KEYS:
+                    if key in old_rows[chunk_id]["metadata"]:
+                        chunk_metadata[key] = old_rows[chunk_id]["metadata"][key]
+                metadatas.append(chunk_metadata)
+            
+            if moving:
+                stored = old_collection.get(ids=ordered_ids, include=["documents", "embeddings"])
+                stored_rows = {cid: i for i, cid in enumerate(stored["ids"])}
+                collection.upsert(
+                    ids=ordered_ids,
+                    documents=[stored["documents"][stored_rows[cid]] for cid in ordered_ids],
+                    embeddings=[list(stored["embeddings"][stored_rows[cid]]) for cid in ordered_ids],
+                    metadatas=metadatas
+                )
+                old_collection.delete(ids=ordered_ids)
+            else:
+                collection.update(ids=ordered_ids, metadatas=metadatas)
+            self.index.update_entry(parent_id, entry_metadata)
+            self.lexical_index.replace_entry(
+                parent_id, ordered_ids, [old_rows[cid]["document"] for cid in ordered_ids], metadatas
             )
-            logger.info(f"Updated lore entry {entry_id}")
+            logger.info(f"Updated metadata of lore entry {parent_id}")
             return True
         
-        return False
+        # Re-chunk and diff against the stored chunk hashes
+        chunks = self._chunk_content(content)
+        new_ids, new_metadatas = self._chunk_rows(parent_id, chunks, entry_metadata, content)
+        
+        unchanged_ids, unchanged_metadatas = [], []
+        changed = []
+        reuse_ids = {}
+        old_by_hash = {row["hash"]: chunk_id for chunk_id, row in old_rows.items()}
+        for i, chunk_id in enumerate(new_ids):
+            chunk_hash = new_metadatas[i]["content_hash"]
+            old_row = old_rows.get(chunk_id)
+            if old_row and old_row["hash"] == chunk_hash and not moving:
+                unchanged_ids.append(chunk_id)
+                unchanged_metadatas.append(new_metadatas[i])
+            else:
+                changed.append(i)
+                if chunk_hash in old_by_hash:
+                    # Same text stored under another chunk ID; reuse its vector
+                    reuse_ids[i] = old_by_hash[chunk_hash]
+        
+        # Only chunks with new text go through the model
+        embeddings = {}
+        if reuse_ids:
+            reused = old_collection.get(ids=list(set(reuse_ids.values())), include=["embeddings"])
+            stored = {cid: emb for cid, emb in zip(reused["ids"], reused["embeddings"])}
+            for i, old_id in reuse_ids.items():
+                if old_id in stored:
+                    embeddings[i] = list(stored[old_id])
+        to_embed = [i for i in changed if i not in embeddings]
+        for i, vector in zip(to_embed, self._embed([chunks[i].text for i in to_embed])):
+            embeddings[i] = vector
+        
+        if changed:
+            collection.upsert(
+                ids=[new_ids[i] for i in changed],
+                documents=[chunks[i].text for i in changed],
+                embeddings=[embeddings[i] for i in changed],
+                metadatas=[new_metadatas[i] for i in changed]
+            )
+        if unchanged_ids:
+            collection.update(ids=unchanged_ids, metadatas=unchanged_metadatas)
+        
+        # Drop chunks that no longer exist (e.g. the entry got shorter or moved shard)
+        stale_ids = [chunk_id for chunk_id in old_rows if moving or chunk_id not in set(new_ids)]
+        if stale_ids:
+            old_collection.delete(ids=stale_ids)
+        
+        self.index.add_entry(parent_id, new_ids, entry_metadata)
+        self.lexical_index.replace_entry(parent_id, new_ids, [chunk.text for chunk in chunks], new_metadatas)
+        logger.info(f"Updated lore entry {parent_id}: re-embedded {len(to_embed)} of {len(chunks)} chunks")
+        return True
     
     def delete_lore_entry(self, entry_id: str) -> bool:
         """Delete a lore entry by ID"""
         try:
-            # Check if this is a chunked entry
-            if "_" in entry_id and entry_id.split("_")[1].isdigit():
-                # This is a chunk, delete all related chunks
-                base_id = entry_id.split("_")[0]
-                all_chunks = self.collection.get(
-                    where={"$contains": base_id}
-                )
-                
-                if all_chunks["ids"]:
-                    self.collection.delete(ids=all_chunks["ids"])
-            else:
-                # Delete single entry
-                self.collection.delete(ids=[entry_id])
+            # Delete the entry and all of its chunks in one call
+            parent_id, chunk_ids = self._resolve_entry(entry_id)
+            collection = self._collection_for_entry(parent_id)
+            if collection is not None:
+                collection.delete(ids=chunk_ids)
+            self.index.remove_entry(parent_id)
+            self.lexical_index.remove_entry(parent_id)
                 
             logger.info(f"Deleted lore entry {entry_id}")
             return True
@@ -323,54 +1127,36 @@ class CanonVDB:
                          world_id: str = None, 
                          category: str = None,
                          limit: int = 100,
-                         offset: int = 0) -> List[Dict[str, Any]]:
+                         offset: int = 0,
+                         after: str = None) -> List[Dict[str, Any]]:
         """
         List lore entries with optional filtering
         
+        Served from the lore catalog, so chunk rows and vectors are never touched.
+        
         Args:
             world_id: Filter by world ID
             category: Filter by category
             limit: Maximum number of entries to return
             offset: Number of entries to skip
+            after: Keyset cursor from next_cursor(); takes precedence over offset
             
         Returns:
             List of lore entry summaries
         """
-        # Prepare filter conditions
-        where_clause = {}
-        if world_id:
-            where_clause["world_id"] = world_id
-        if category:
-            where_clause["category"] = category
-        
-        # Execute query
-        results = self.collection.get(
-            where=where_clause if where_clause else None,
-            limit=limit
+        return self.index.list_entries(
+            world_id=world_id,
+            category=category,
+            limit=limit,
+            offset=offset,
+            after=after
         )
-        
-        # Format response
-        entries = []
-        if results["ids"]:
-            for i, doc_id in enumerate(results["ids"]):
-                # Skip chunks, only include main entries
-                if "_" in doc_id and doc_id.split("_")[1].isdigit():
-                    # This is a chunk, skip
-                    continue
-                
-                entries.append({
-                    "id": doc_id,
-                    "title": results["metadatas"][i].get("title", "Untitled"),
-                    "category": results["metadatas"][i].get("category", "general"),
-                    "world_id": results["metadatas"][i].get("world_id", "default"),
-                    "created_at": results["metadatas"][i].get("created_at")
-                })
-        
-        # Apply offset (since ChromaDB doesn't support it natively)
-        if offset > 0:
-            entries = entries[offset:offset+limit]
-        
-        return entries
+    
+    def next_cursor(self, entries: List[Dict[str, Any]], limit: int) -> Optional[str]:
+        """Return the cursor for the page after `entries`, or None on the last page"""
+        if not entries or len(entries) < limit:
+            return None
+        return encode_cursor(entries[-1])
     
     def get_or_create_world_context(self, world_id: str) -> str:
         """
@@ -386,10 +1172,12 @@ class CanonVDB:
             The world context content
         """
         # Try to find existing context
-        results = self.collection.get(
+        results = self._collection_for(world_id).get(
             where={
-                "world_id": world_id,
-                "category": "world_context"
+                "$and": [
+                    {"world_id": world_id},
+                    {"category": "world_context"}
+                ]
             }
         )
         
@@ -426,6 +1214,31 @@ class CanonVDB:
         Returns:
             Tuple of (context_string, source_entries)
         """
+        explorer_context = self.build_world_explorer_context(query, world_id, n_results=n_results)
+        return explorer_context["context"], explorer_context["sources"]
+    
+    def build_world_explorer_context(self, 
+                                     query: str, 
+                                     world_id: str,
+                                     n_results: int = 5,
+                                     token_budget: int = None,
+                                     query_embedding: List[float] = None) -> Dict[str, Any]:
+        """
+        Build the World Explorer context for a question within a token budget
+        
+        Retrieved chunks of the same entry are merged with their overlap removed,
+        entries are ranked by relevance and packed until the budget is reached.
+        
+        Args:
+            query: The user's question
+            world_id: The world ID to search in
+            n_results: Number of chunks to retrieve
+            token_budget: Override for the configured context token budget
+            query_embedding: The question's embedding, if the caller already computed it
+            
+        Returns:
+            Dict with the context string, the sources used and its estimated token count
+        """
         # Get the primary world context
         world_context = self.get_or_create_world_context(world_id)
         
@@ -433,37 +1246,32 @@ class CanonVDB:
         results = self.search_lore(
             query=query,
             world_id=world_id,
-            n_results=n_results
+            n_results=n_results,
+            query_embedding=query_embedding
         )
         
-        # Format context with all relevant information
-        context_parts = [
-            f"# World Context\n{world_context}\n"
-        ]
-        
-        # Add relevant entries
-        if results:
-            context_parts.append("\n# Relevant World Information\n")
-            for i, entry in enumerate(results):
-                # Add entry content with title
-                entry_title = entry["metadata"].get("title", f"Entry {i+1}")
-                context_parts.append(f"## {entry_title}\n{entry['content']}\n")
-        
-        # Combine all context
-        full_context = "\n".join(context_parts)
+        builder = self.context_builder
+        if token_budget is not None:
+            builder = ContextBuilder(token_budget=token_budget, max_overlap=builder.max_overlap)
+        context, sources, token_count = builder.build(world_context, results)
         
-        return full_context, results
+        logger.info(f"Built World Explorer context of ~{token_count} tokens from {len(sources)} of {len(results)} chunks")
+        return {
+            "context": context,
+            "sources": sources,
+            "token_count": token_count
+        }
     
-    def count_entries(self, world_id: str = None) -> int:
-        """Count the number of entries, optionally filtered by world_id"""
-        where_clause = {"world_id": world_id} if world_id else None
-        return self.collection.count(where=where_clause)
+    def count_entries(self, world_id: str = None, category: str = None) -> int:
+        """Count the number of entries, optionally filtered by world_id and category"""
+        return self.index.count_entries(world_id=world_id, category=category)
     
     def import_from_json(self, json_file: str) -> int:
         """
-        Import lore entries from a JSON file
+        Import lore entries from a JSON or NDJSON file
         
-        The JSON file should contain an array of objects with the following structure:
+        The file should contain an array of objects (or one object per line)
+        with the following structure:
         {
             "title": "Entry title",
             "content": "Entry content",
@@ -477,20 +1285,28 @@ class CanonVDB:
         """
         try:
             with open(json_file, 'r') as f:
-                entries = json.load(f)
-            
-            count = 0
-            for entry in entries:
-                if "title" in entry and "content" in entry:
-                    metadata = entry.get("metadata", {})
-                    self.add_lore_entry(
-                        title=entry["title"],
-                        content=entry["content"],
-                        category=entry.get("category", "general"),
-                        world_id=entry.get("world_id", "default"),
-                        metadata=metadata
-                    )
-                    count += 1
+                first_char = f.read(1)
+                while first_char and first_char.isspace():
+                    first_char = f.read(1)
+                f.seek(0)
+                
+                if first_char == '[':
+                    entries = json.load(f)
+                else:
+                    entries = (json.loads(line) for line in f if line.strip())
+                
+                count = 0
+                for entry in entries:
+                    if "title" in entry and "content" in entry:
+                        metadata = entry.get("metadata", {})
+                        self.add_lore_entry(
+                            title=entry["title"],
+                            content=entry["content"],
+                            category=entry.get("category", "general"),
+                            world_id=entry.get("world_id", "default"),
+                            metadata=metadata
+                        )
+                        count += 1
             
             logger.info(f"Imported {count} entries from {json_file}")
             return count
@@ -498,42 +1314,151 @@ class CanonVDB:
             logger.error(f"Error importing from JSON: {str(e)}")
             return 0
     
-    def export_to_json(self, json_file: str, world_id: str = None) -> int:
+    def iter_export_entries(self, world_id: str = None, batch_size: int = 200) -> Iterator[Dict[str, Any]]:
         """
-        Export lore entries to a JSON file
+        Yield every lore entry in export format, fetching in bounded batches
+        
+        Entries are paged from the catalog with a keyset cursor; each page's
+        chunks are fetched with one get() per collection and reassembled, so
+        memory use is bounded by batch_size regardless of world size.
         
         Args:
-            json_file: Path to output JSON file
             world_id: Optional filter by world_id
-            
-        Returns:
-            The number of exported entries
+            batch_size: Number of entries fetched per round trip
         """
-        entries = self.list_lore_entries(world_id=world_id, limit=1000)
-        
-        # Get full content for each entry
-        full_entries = []
-        for entry in entries:
-            full_entry = self.get_lore_by_id(entry["id"])
-            if full_entry:
-                export_entry = {
+        excluded_keys = {"title", "category", "world_id", "created_at", "parent_id", *CHUNK_METADATA_KEYS}
+        after = None
+        while True:
+            page = self.index.list_entries(world_id=world_id, limit=batch_size, after=after)
+            if not page:
+                break
+            
+            chunk_ids = self.index.get_chunk_ids_many([entry["id"] for entry in page])
+            
+            # One round trip per collection for the whole page
+            rows_by_id = {}
+            by_world: Dict[str, List[str]] = {}
+            for entry in page:
+                by_world.setdefault(entry["world_id"], []).extend(chunk_ids[entry["id"]] or [entry["id"]])
+            for page_world_id, ids in by_world.items():
+                results = self._collection_for(page_world_id).get(ids=ids)
+                for i, chunk_id in enumerate(results["ids"]):
+                    rows_by_id[chunk_id] = (chunk_id, results["documents"][i], results["metadatas"][i] or {})
+            
+            for entry in page:
+                rows = [rows_by_id[cid] for cid in (chunk_ids[entry["id"]] or [entry["id"]]) if cid in rows_by_id]
+                if not rows:
+                    continue
+                full_entry = self._assemble_entry(entry["id"], rows)
+                yield {
                     "title": entry["title"],
                     "content": full_entry["content"],
                     "category": entry["category"],
                     "world_id": entry["world_id"],
                     "created_at": entry["created_at"],
-                    "metadata": {k: v for k, v in full_entry["metadata"].items() 
-                               if k not in ["title", "category", "world_id", "created_at"]}
+                    "metadata": {k: v for k, v in full_entry["metadata"].items() if k not in excluded_keys}
                 }
-                full_entries.append(export_entry)
+            
+            if len(page) < batch_size:
+                break
+            after = encode_cursor(page[-1])
+    
+    def iter_export(self, 
+                    world_id: str = None, 
+                    fmt: str = "ndjson", 
+                    compress: bool = False,
+                    batch_size: int = 200) -> Iterator[bytes]:
+        """
+        Stream an export of lore entries as encoded chunks (e.g. for an HTTP response)
+        
+        Args:
+            world_id: Optional filter by world_id
+            fmt: "ndjson" (one entry per line) or "json" (a single array)
+            compress: gzip the stream
+            batch_size: Number of entries fetched per round trip
+        """
+        def pieces():
+            if fmt == "json":
+                yield "["
+                for i, entry in enumerate(self.iter_export_entries(world_id, batch_size)):
+                    yield ("," if i else "") + "\n" + json.dumps(entry)
+                yield "\n]\n"
+            else:
+                for entry in self.iter_export_entries(world_id, batch_size):
+                    yield json.dumps(entry) + "\n"
         
-        # Write to file
+        if not compress:
+            for piece in pieces():
+                yield piece.encode("utf-8")
+            return
+        
+        # wbits=31 produces a gzip container
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for piece in pieces():
+            data = compressor.compress(piece.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
+    
+    def snapshot(self, path: str, world_id: str = None) -> Dict[str, Any]:
+        """
+        Write lore with its vectors to a binary snapshot (see lore_snapshot)
+        
+        Unlike export_to_json, a snapshot keeps the embeddings, so restoring
+        it doesn't re-embed anything.
+        
+        Args:
+            path: Output file
+            world_id: Only snapshot this world (all lore if None)
+            
+        Returns:
+            The snapshot manifest
+        """
+        from lore_snapshot import write_snapshot
+        return write_snapshot(self, path, world_id=world_id)
+    
+    def restore_snapshot(self, path: str, verify: bool = True) -> int:
+        """
+        Bulk-load a binary snapshot, reusing its vectors
+        
+        Args:
+            path: Snapshot file
+            verify: Check the snapshot's checksums first
+            
+        Returns:
+            The number of restored chunks
+        """
+        from lore_snapshot import restore_snapshot
+        return restore_snapshot(self, path, verify=verify)
+    
+    def export_to_json(self, json_file: str, world_id: str = None) -> int:
+        """
+        Export lore entries to a JSON file (NDJSON if the file ends in .ndjson or .jsonl)
+        
+        Args:
+            json_file: Path to output JSON file
+            world_id: Optional filter by world_id
+            
+        Returns:
+            The number of exported entries
+        """
+        ndjson = json_file.endswith(('.ndjson', '.jsonl'))
+        count = 0
         try:
             with open(json_file, 'w') as f:
-                json.dump(full_entries, f, indent=2)
+                if not ndjson:
+                    f.write("[")
+                for entry in self.iter_export_entries(world_id=world_id):
+                    if ndjson:
+                        f.write(json.dumps(entry) + "\n")
+                    else:
+                        f.write(("," if count else "") + "\n" + json.dumps(entry))
+                    count += 1
+                if not ndjson:
+                    f.write("\n]\n")
             
-            logger.info(f"Exported {len(full_entries)} entries to {json_file}")
-            return len(full_entries)
+            logger.info(f"Exported {count} entries to {json_file}")
+            return count
         except Exception as e:
             logger.error(f"Error exporting to JSON: {str(e)}")
             return 0
@@ -0,0 +1,147 @@
+import re
+import logging
+from typing import List, Dict, Any, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Words, numbers and individual punctuation marks
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local estimate of the number of LLM tokens in a text
+
+    Counts words and punctuation marks, charging long words one extra token
+    per 6 characters, which tracks BPE tokenizers closely for English prose
+    without loading a tokenizer.
+    """
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def strip_overlap(previous: str, current: str, max_overlap: int = 200, min_overlap: int = 10) -> str:
+    """Remove the prefix of `current` that repeats the end of `previous`"""
+    limit = min(max_overlap, len(previous), len(current))
+    for size in range(limit, min_overlap - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:].lstrip()
+    return current
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, preferring a sentence or word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Binary search on character length using the estimator, leaving room for " ..."
+    limit = max(max_tokens - 3, 0)
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= limit:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+
+    sentence_end = max(cut.rfind(". "), cut.rfind("\n"))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1].rstrip()
+    word_end = cut.rfind(" ")
+    return (cut[:word_end] if word_end > 0 else cut).rstrip() + " ..."
+
+
+class ContextBuilder:
+    """
+    Builds the World Explorer prompt context from search results
+
+    - merges chunks of the same entry, removing the text neighbouring chunks
+      share because of the splitter's chunk_overlap (using the chunks' offsets
+      into the entry where stored)
+    - orders entries by their best-ranked chunk in the search results
+    - packs the world context and entries into a token budget
+    """
+
+    def __init__(self, token_budget: int = 1500, max_overlap: int = 200):
+        """
+        Args:
+            token_budget: Maximum estimated tokens of the produced context
+            max_overlap: Longest repeated text looked for between adjacent chunks
+        """
+        self.token_budget = token_budget
+        self.max_overlap = max_overlap
+
+    def _merge_group(self, chunks: List[Dict[str, Any]]) -> str:
+        """Merge the retrieved chunks of one entry in chunk order"""
+        chunks = sorted(chunks, key=lambda c: (c["metadata"] or {}).get("chunk_number", 0))
+        text = chunks[0]["content"]
+        previous = chunks[0]["metadata"] or {}
+        for chunk in chunks[1:]:
+            metadata = chunk["metadata"] or {}
+            if metadata.get("chunk_number", 0) != previous.get("chunk_number", 0) + 1:
+                text += "\n...\n" + chunk["content"]
+            elif "chunk_end" in previous and "chunk_start" in metadata:
+                # Adjacent chunks with offsets into the entry: drop exactly the shared text
+                overlap = previous["chunk_end"] - metadata["chunk_start"]
+                text += chunk["content"][overlap:] if overlap > 0 else metadata.get("chunk_gap", " ") + chunk["content"]
+            else:
+                # Entries stored without offsets: find the overlap by matching text
+                text += " " + strip_overlap(text, chunk["content"], self.max_overlap)
+            previous = metadata
+        return text
+
+    def build(self, world_context: str, results: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]], int]:
+        """
+        Assemble the context string
+
+        Args:
+            world_context: The world's primary context text
+            results: Search results (id, content, metadata, distance)
+
+        Returns:
+            Tuple of (context_string, results that made it into the context, estimated token count)
+        """
+        header = "# World Context\n"
+        world_section = _truncate_to_tokens(world_context, max(self.token_budget - estimate_tokens(header), 0))
+        parts = [f"{header}{world_section}\n"]
+        used_tokens = estimate_tokens(parts[0])
+
+        # Group chunks by the entry they belong to, skipping the world context itself
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for result in results:
+            metadata = result["metadata"] or {}
+            if metadata.get("category") == "world_context":
+                continue
+            groups.setdefault(metadata.get("parent_id", result["id"]), []).append(result)
+
+        # Results arrive best first (by distance, or by fused rank in hybrid search),
+        # so groups are already in the order of their best chunk
+        ordered = list(groups.values())
+
+        sources = []
+        if ordered:
+            section_header = "\n# Relevant World Information\n"
+            used_tokens += estimate_tokens(section_header)
+            parts.append(section_header)
+
+        for i, group in enumerate(ordered):
+            title = (group[0]["metadata"] or {}).get("title", f"Entry {i + 1}")
+            section = f"## {title}\n{self._merge_group(group)}\n"
+            section_tokens = estimate_tokens(section)
+
+            remaining = self.token_budget - used_tokens
+            if section_tokens > remaining:
+                # Use what's left for a truncated section if it's worth it, then stop
+                if remaining >= 50:
+                    section = _truncate_to_tokens(section, remaining)
+                    parts.append(section)
+                    used_tokens += estimate_tokens(section)
+                    sources.extend(group)
+                break
+
+            parts.append(section)
+            used_tokens += section_tokens
+            sources.extend(group)
+
+        return "\n".join(parts), sources, estimate_tokens("\n".join(parts))
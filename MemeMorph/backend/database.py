@@ -1,4 +1,7 @@
 import os
+import uuid
+import base64
+from bson import json_util
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import logging
@@ -9,10 +12,44 @@ load_dotenv()
 # MongoDB connection details
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/mememorph')
 
+# Fields of a prompt document
+PROMPT_FIELDS = {"name": 1, "content": 1, "description": 1, "category": 1, "created_at": 1, "updated_at": 1}
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def encode_page_cursor(doc, field):
+    """Build an opaque keyset cursor pointing just after doc in a (field, _id) listing"""
+    raw = json_util.dumps([doc.get(field), doc["_id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_page_cursor(cursor):
+    """Decode a cursor produced by encode_page_cursor() into (value, _id)"""
+    try:
+        value, doc_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, doc_id
+    except Exception:
+        raise ValueError(f"Invalid pagination cursor: {cursor}")
+
+def next_page_cursor(docs, limit, field):
+    """Return the cursor for the page after `docs`, or None on the last page"""
+    if not docs or len(docs) < limit:
+        return None
+    return encode_page_cursor(docs[-1], field)
+
+def keyset_query(query, field, after=None):
+    """
+    Filter for the page after a cursor of a listing sorted newest first by (field, _id)
+
+    The compound indexes from init_db.create_indexes ((owner, field, _id) and
+    the like) serve this as a range scan, so deep pages cost the same as the first.
+    """
+    if not after:
+        return query
+    value, doc_id = decode_page_cursor(after)
+    return {**query, "$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": doc_id}}]}
+
 class Database:
     _instance = None
     
@@ -69,9 +106,19 @@ class Database:
         """Get meme by ID"""
         return self.db.memes.find_one({"_id": meme_id})
     
-    def get_memes_by_owner(self, owner_id, limit=20, skip=0):
-        """Get memes by owner ID"""
-        return list(self.db.memes.find({"owner_id": owner_id}).sort([("created_at", -1)]).skip(skip).limit(limit))
+    def get_memes_by_owner(self, owner_id, limit=20, skip=0, after=None):
+        """
+        Get memes by owner ID, newest first
+        
+        Pass the `after` cursor from next_page_cursor(memes, limit, "created_at")
+        to get the next page (skip is ignored then); skipping gets slower the
+        deeper the page.
+        """
+        query = keyset_query({"owner_id": owner_id}, "created_at", after)
+        cursor = self.db.memes.find(query).sort([("created_at", -1), ("_id", -1)])
+        if not after:
+            cursor = cursor.skip(skip)
+        return list(cursor.limit(limit))
     
     def create_meme(self, meme_data):
         """Create a new meme"""
@@ -103,6 +150,16 @@ class Database:
         """Get NFT by meme ID"""
         return self.db.nfts.find_one({"meme_id": meme_id})
     
+    def get_nfts_by_owner(self, owner_address, limit=20, after=None):
+        """
+        Get NFTs by owner address, newest first
+        
+        Pass the `after` cursor from next_page_cursor(nfts, limit, "created_at")
+        to get the next page.
+        """
+        query = keyset_query({"owner_address": owner_address}, "created_at", after)
+        return list(self.db.nfts.find(query).sort([("created_at", -1), ("_id", -1)]).limit(limit))
+    
     def create_nft(self, nft_data):
         """Create a new NFT record"""
         return self.db.nfts.insert_one(nft_data)
@@ -123,9 +180,60 @@ class Database:
         """Record an NFT transaction"""
         return self.db.transactions.insert_one(transaction_data)
     
-    def get_transactions_by_token(self, token_id, limit=10):
-        """Get transaction history for a token"""
-        return list(self.db.transactions.find({"token_id": token_id}).sort([("timestamp", -1)]).limit(limit))
+    def get_transactions_by_token(self, token_id, limit=10, after=None):
+        """
+        Get transaction history for a token, newest first
+        
+        Pass the `after` cursor from next_page_cursor(transactions, limit, "timestamp")
+        to get the next page.
+        """
+        query = keyset_query({"token_id": token_id}, "timestamp", after)
+        return list(self.db.transactions.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit))
+    
+    # Prompt operations
+    def get_all_prompts(self, projection=None, category=None, limit=0, skip=0):
+        """Get prompts sorted by name, optionally projected, filtered by category and paginated"""
+        query = {"category": category} if category else {}
+        return list(self.db.prompts.find(query, projection).sort([("name", 1)]).skip(skip).limit(limit))
+    
+    def get_prompt_by_id(self, prompt_id, projection=None):
+        """Get prompt by ID"""
+        return self.db.prompts.find_one({"_id": prompt_id}, projection)
+    
+    def get_prompt_by_name(self, name, projection=None):
+        """Get prompt by name"""
+        return self.db.prompts.find_one({"name": name}, projection)
+    
+    def create_prompt(self, prompt_data):
+        """Create a new prompt (with a string ID, like users and templates)"""
+        prompt_data.setdefault("_id", str(uuid.uuid4()))
+        result = self.db.prompts.insert_one(prompt_data)
+        self._bump_prompts_version()
+        return result
+    
+    def update_prompt(self, prompt_id, update_data):
+        """Update a prompt"""
+        result = self.db.prompts.update_one({"_id": prompt_id}, {"$set": update_data})
+        self._bump_prompts_version()
+        return result
+    
+    def delete_prompt(self, prompt_id):
+        """Delete a prompt"""
+        result = self.db.prompts.delete_one({"_id": prompt_id})
+        self._bump_prompts_version()
+        return result
+    
+    def get_prompts_version(self):
+        """Counter bumped by every prompt write, so cached copies can tell they are stale"""
+        doc = self.db.cache_versions.find_one({"_id": "prompts"})
+        return doc["version"] if doc else 0
+    
+    def _bump_prompts_version(self):
+        self.db.cache_versions.update_one({"_id": "prompts"}, {"$inc": {"version": 1}}, upsert=True)
+    
+    def watch_prompts(self):
+        """Change stream of the prompts collection (fails on a standalone server, which has none)"""
+        return self.db.prompts.watch()
     
     # Platform settings
     def get_platform_settings(self):
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import random
+import argparse
+import logging
+from typing import List, Dict, Any
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("sentence-transformers", "onnx", "torch-int8")
+
+class SentenceTransformerEmbedder:
+    """Reference embedder: the PyTorch sentence-transformers model"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        # Imported here so workers using another backend never load torch
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model_version = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix"""
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+
+class TorchInt8Embedder(SentenceTransformerEmbedder):
+    """sentence-transformers model with dynamic int8 quantization of its Linear layers"""
+
+    name = "torch-int8"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model_version = f"{model_name}+int8"
+
+
+class OnnxEmbedder:
+    """
+    Embedder running an exported MiniLM through ONNX Runtime on CPU
+
+    The model directory must contain model.onnx (and optionally
+    model_quantized.onnx) plus tokenizer.json, as written by export_onnx().
+    Pooling and normalization match the sentence-transformers pipeline
+    (mean pooling over the attention mask, then L2 normalization).
+    """
+
+    name = "onnx"
+
+    def __init__(self,
+                 model_dir: str,
+                 model_name: str,
+                 quantized: bool = True,
+                 max_length: int = 256,
+                 batch_size: int = 32):
+        """
+        Args:
+            model_dir: Directory with the exported model and tokenizer
+            model_name: Name of the model the export was made from
+            quantized: Prefer model_quantized.onnx when present
+            max_length: Maximum tokens per text (matches sentence-transformers' max_seq_length)
+            batch_size: Texts per forward pass
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        quantized_path = os.path.join(model_dir, 'model_quantized.onnx')
+        self.quantized = quantized and os.path.exists(quantized_path)
+        model_path = quantized_path if self.quantized else os.path.join(model_dir, 'model.onnx')
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        self.model_name = model_name
+        self.model_version = f"{model_name}+int8" if self.quantized else model_name
+        self.batch_size = batch_size
+        logger.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix"""
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+            # Mean pooling over real tokens, then L2 normalization
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            outputs.append(pooled.astype(np.float32))
+
+        return np.vstack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+
+
+def get_embedder(model_name: str, backend: str = None, model_dir: str = None):
+    """
+    Create the configured embedder
+
+    Args:
+        model_name: Sentence-transformer model name
+        backend: One of EMBEDDING_BACKENDS (defaults to CANON_VDB_EMBEDDING_BACKEND or "sentence-transformers")
+        model_dir: Exported ONNX model directory (defaults to CANON_VDB_ONNX_MODEL_DIR)
+    """
+    backend = backend or os.getenv('CANON_VDB_EMBEDDING_BACKEND', 'sentence-transformers')
+    if backend == "onnx":
+        model_dir = model_dir or os.getenv('CANON_VDB_ONNX_MODEL_DIR')
+        if not model_dir:
+            raise ValueError("CANON_VDB_ONNX_MODEL_DIR must point to an exported model for the onnx backend")
+        return OnnxEmbedder(
+            model_dir,
+            model_name,
+            quantized=os.getenv('CANON_VDB_ONNX_QUANTIZED', '1') != '0'
+        )
+    if backend == "torch-int8":
+        return TorchInt8Embedder(model_name)
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(model_name)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def embedder_version(model_name: str, backend: str = None, model_dir: str = None) -> str:
+    """
+    Model version get_embedder() would produce, without loading the model
+
+    Used by clients of the embedding service to check that the server's vectors
+    are interchangeable with their own.
+    """
+    backend = backend or os.getenv('CANON_VDB_EMBEDDING_BACKEND', 'sentence-transformers')
+    if backend == "torch-int8":
+        return f"{model_name}+int8"
+    if backend == "onnx":
+        model_dir = model_dir or os.getenv('CANON_VDB_ONNX_MODEL_DIR') or ""
+        quantized = os.getenv('CANON_VDB_ONNX_QUANTIZED', '1') != '0' and \
+            os.path.exists(os.path.join(model_dir, 'model_quantized.onnx'))
+        return f"{model_name}+int8" if quantized else model_name
+    return model_name
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export a sentence-transformers model to ONNX (plus a dynamic int8 copy)
+
+    Returns:
+        The output directory
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model
+    tokenizer = model.tokenizer
+    transformer.eval()
+
+    dummy = tokenizer(["MemeMorph lore export"], return_tensors="pt")
+    model_path = os.path.join(output_dir, 'model.onnx')
+    torch.onnx.export(
+        transformer,
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        model_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "token_type_ids": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=14
+    )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(model_path, os.path.join(output_dir, 'model_quantized.onnx'), weight_type=QuantType.QInt8)
+
+    with open(os.path.join(output_dir, 'export.json'), 'w') as f:
+        json.dump({"model_name": model_name, "quantized": quantize}, f, indent=2)
+
+    logger.info(f"Exported {model_name} to {output_dir}")
+    return output_dir
+
+
+def compare_embedders(reference, candidate, texts: List[str], k: int = 10, n_queries: int = 50) -> Dict[str, Any]:
+    """
+    Compare a candidate embedder against the reference on latency and recall
+
+    Reports per-text latency of both, cosine agreement between their vectors
+    for the same text, and recall@k of the candidate's nearest neighbours
+    against the reference's (first n_queries texts used as queries).
+    """
+    def timed(embedder):
+        embedder.encode(texts[:8])  # warm-up
+        start = time.perf_counter()
+        vectors = embedder.encode(texts)
+        return vectors, (time.perf_counter() - start) * 1000.0 / len(texts)
+
+    ref_vectors, ref_ms = timed(reference)
+    cand_vectors, cand_ms = timed(candidate)
+
+    def unit(v):
+        return v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+
+    ref_unit, cand_unit = unit(ref_vectors), unit(cand_vectors)
+    agreement = (ref_unit * cand_unit).sum(axis=1)
+
+    n_queries = min(n_queries, len(texts))
+    k = min(k, len(texts) - 1)
+    hits = 0
+    for qi in range(n_queries):
+        ref_top = set(np.argsort(-(ref_unit @ ref_unit[qi]))[1:k + 1].tolist())
+        cand_top = set(np.argsort(-(cand_unit @ cand_unit[qi]))[1:k + 1].tolist())
+        hits += len(ref_top & cand_top)
+
+    return {
+        "texts": len(texts),
+        "reference": {"backend": reference.name, "model_version": reference.model_version, "ms_per_text": ref_ms},
+        "candidate": {"backend": candidate.name, "model_version": candidate.model_version, "ms_per_text": cand_ms},
+        "speedup": ref_ms / max(cand_ms, 1e-9),
+        "cosine_mean": float(agreement.mean()),
+        "cosine_min": float(agreement.min()),
+        "recall_at_k": hits / float(max(n_queries * k, 1)),
+        "k": k
+    }
+
+
+def _sample_texts(n: int) -> List[str]:
+    """Synthetic lore-like sentences for comparisons when no world is given"""
+    rng = random.Random(7)
+    subjects = ["The kingdom of Altaris", "Silverhold", "The Free Cities", "The Grand Library", "A wandering knight",
+                "The Treaty of Elmswood", "Mount Argent", "The steam guild", "An ancient dragon", "The royal family"]
+    verbs = ["guards", "was founded after", "trades with", "remembers", "fell during", "rebuilt", "betrayed", "honours"]
+    objects = ["the silver spires", "the hundred-year war", "the western border", "a forgotten heir",
+               "the pneumatic tube network", "the first age", "the merchant council", "a sealed vault"]
+    return [f"{rng.choice(subjects)} {rng.choice(verbs)} {rng.choice(objects)}. " * rng.randint(1, 6) for _ in range(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CanonVDB embedding backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export the model to ONNX")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    export_parser.add_argument("--no-quantize", action="store_true")
+
+    compare_parser = subparsers.add_parser("compare", help="Latency/recall comparison against sentence-transformers")
+    compare_parser.add_argument("--backend", default="onnx", choices=EMBEDDING_BACKENDS)
+    compare_parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    compare_parser.add_argument("--model-dir", help="Exported ONNX model directory")
+    compare_parser.add_argument("--texts", type=int, default=500)
+    compare_parser.add_argument("--k", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx(args.model, args.output_dir, quantize=not args.no_quantize)
+    else:
+        report = compare_embedders(
+            SentenceTransformerEmbedder(args.model),
+            get_embedder(args.model, backend=args.backend, model_dir=args.model_dir),
+            _sample_texts(args.texts),
+            k=args.k
+        )
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Callable, Optional
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    EmbeddingCache - Persistent, content-addressed store of embedding vectors
+
+    Vectors are appended to a flat float32 file that is read back through a
+    NumPy memory map; a small SQLite index maps chunk content hashes to rows.
+    Each model gets its own namespace directory so vectors from different
+    models (or model versions) are never mixed.
+    """
+
+    def __init__(self, directory: str, model_name: str, model_version: str = None):
+        """
+        Open (and create if needed) the cache namespace for a model
+
+        Args:
+            directory: Root directory of the embedding cache
+            model_name: Name of the embedding model
+            model_version: Optional version tag, e.g. when a model is re-exported
+        """
+        self.model_name = model_name
+        self.model_version = model_version
+        namespace = model_name if not model_version else f"{model_name}@{model_version}"
+        self.directory = os.path.join(directory, re.sub(r'[^A-Za-z0-9._@-]+', '_', namespace))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.vectors_path = os.path.join(self.directory, 'vectors.f32')
+        self.meta_path = os.path.join(self.directory, 'meta.json')
+        self.lock_path = os.path.join(self.directory, 'vectors.lock')
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+            )
+
+        self.dim = self._load_dim()
+        self._mmap = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load_dim(self) -> Optional[int]:
+        """Read the vector dimension recorded for this namespace"""
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, 'r') as f:
+            return json.load(f).get("dim")
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock across threads and (where supported) worker processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _vectors(self, min_rows: int) -> np.ndarray:
+        """Return a memory map of the vector file covering at least min_rows rows"""
+        if self._mmap is None or self._mmap.shape[0] < min_rows:
+            n_rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(n_rows, self.dim))
+        return self._mmap
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors for the given content hashes (missing ones are omitted)"""
+        if not hashes or self.dim is None:
+            return {}
+
+        rows = {}
+        unique = list(set(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for content_hash, row in self._conn.execute(
+                    f"SELECT hash, row FROM vectors WHERE hash IN ({placeholders})", batch
+                ):
+                    rows[content_hash] = row
+            if not rows:
+                return {}
+            vectors = self._vectors(max(rows.values()) + 1)
+
+        return {content_hash: np.array(vectors[row]) for content_hash, row in rows.items()}
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Append vectors for content hashes that aren't cached yet"""
+        if not items:
+            return
+
+        with self._file_lock():
+            if self.dim is None:
+                # Another process may have initialised the namespace meanwhile
+                self.dim = self._load_dim() or len(next(iter(items.values())))
+                with open(self.meta_path, 'w') as f:
+                    json.dump({"model_name": self.model_name, "model_version": self.model_version, "dim": self.dim}, f)
+
+            hashes = list(items)
+            known = set()
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                known.update(row[0] for row in self._conn.execute(
+                    f"SELECT hash FROM vectors WHERE hash IN ({placeholders})", batch
+                ))
+            new_items = [(h, v) for h, v in items.items() if h not in known]
+            if not new_items:
+                return
+
+            matrix = np.asarray([v for _, v in new_items], dtype=np.float32).reshape(len(new_items), self.dim)
+            size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            first_row = size // (self.dim * 4)
+            with open(self.vectors_path, 'ab') as f:
+                # Truncate any torn write left behind by a crashed process
+                f.truncate(first_row * self.dim * 4)
+                f.write(matrix.tobytes())
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO vectors (hash, row) VALUES (?, ?)",
+                    [(h, first_row + i) for i, (h, _) in enumerate(new_items)]
+                )
+
+    def embed(self,
+              texts: List[str],
+              hashes: List[str],
+              embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Embed texts, serving known content from the cache
+
+        Args:
+            texts: Texts to embed
+            hashes: Content hash for each text
+            embed_fn: Model call used for texts that aren't cached
+
+        Returns:
+            One vector per text, in input order
+        """
+        cached = self.get_many(hashes)
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            # Embed each distinct missing text once
+            unique_missing = list(dict.fromkeys(hashes[i] for i in missing))
+            first_index = {}
+            for i in missing:
+                first_index.setdefault(hashes[i], i)
+            vectors = embed_fn([texts[first_index[h]] for h in unique_missing])
+            fresh = dict(zip(unique_missing, vectors))
+            self.put_many(fresh)
+            cached.update({h: np.asarray(v, dtype=np.float32) for h, v in fresh.items()})
+
+        return [np.asarray(cached[h], dtype=np.float32).tolist() for h in hashes]
+
+    def close(self):
+        """Close the index connection and drop the memory map"""
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
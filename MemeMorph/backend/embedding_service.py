@@ -0,0 +1,390 @@
+import os
+import json
+import errno
+import time
+import queue
+import socket
+import struct
+import argparse
+import logging
+import threading
+import socketserver
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/mememorph-embeddings.sock"
+
+# Every message is: header length, payload length (network order), JSON header, raw payload
+_FRAME = struct.Struct("!II")
+
+# Connection attempts (with doubling backoff from 10 ms) while the service's
+# listen backlog is full or it is restarting
+_CONNECT_ATTEMPTS = 5
+
+class EmbeddingServiceError(Exception):
+    """The embedding service could not be reached or failed a request"""
+    pass
+
+class EmbeddingServiceUnavailable(EmbeddingServiceError):
+    """The embedding service is not running (no socket, or nobody listening on it)"""
+    pass
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly size bytes, or None if the peer closed the connection first"""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b""):
+    """Send one framed message"""
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(_FRAME.pack(len(encoded), len(payload)) + encoded + payload)
+
+def recv_message(sock: socket.socket) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Receive one framed message, or None at end of stream"""
+    frame = _recv_exact(sock, _FRAME.size)
+    if frame is None:
+        return None
+    header_size, payload_size = _FRAME.unpack(frame)
+    header = _recv_exact(sock, header_size)
+    payload = _recv_exact(sock, payload_size) if payload_size else b""
+    if header is None or payload is None:
+        return None
+    return json.loads(header.decode("utf-8")), payload
+
+
+class _Job:
+    """Texts from one request waiting for their slice of a batch"""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.vectors = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent embedding requests into batched forward passes
+
+    The first waiting request opens a batch; requests arriving within
+    max_wait_ms join it until max_batch texts are collected. One encode call
+    then serves all of them.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch: int = 64, max_wait_ms: float = 5.0):
+        """
+        Args:
+            encode: Batched embedding call
+            max_batch: Texts per forward pass before a batch is closed early
+            max_wait_ms: How long a batch stays open for more requests
+        """
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str], timeout: float = 60.0) -> np.ndarray:
+        """Embed texts as part of the next batch"""
+        job = _Job(texts)
+        self._queue.put(job)
+        if not job.done.wait(timeout):
+            raise EmbeddingServiceError("Timed out waiting for the embedding batch")
+        if job.error is not None:
+            raise job.error
+        return job.vectors
+
+    def _collect(self) -> List[_Job]:
+        """Block for the first job, then gather more until the batch is full or the wait expires"""
+        jobs = [self._queue.get()]
+        n_texts = len(jobs[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while n_texts < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            n_texts += len(job.texts)
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            texts = [text for job in jobs for text in job.texts]
+            try:
+                vectors = np.asarray(self.encode(texts), dtype=np.float32) if texts else np.zeros((0, 0), np.float32)
+                start = 0
+                for job in jobs:
+                    job.vectors = vectors[start:start + len(job.texts)]
+                    start += len(job.texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {str(e)}")
+                for job in jobs:
+                    job.error = EmbeddingServiceError(str(e))
+            self.batches += 1
+            self.texts += len(texts)
+            for job in jobs:
+                job.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / float(self.batches) if self.batches else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serves requests on one client connection until it closes"""
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping embedding client connection: {str(e)}")
+                return
+            if message is None:
+                return
+            header, _ = message
+
+            try:
+                if header.get("op") == "info":
+                    send_message(self.request, {
+                        "model_version": server.embedder.model_version,
+                        "backend": server.embedder.name,
+                        **server.batcher.stats()
+                    })
+                    continue
+
+                vectors = server.batcher.submit(list(header.get("texts", [])))
+                send_message(
+                    self.request,
+                    {"n": int(vectors.shape[0]), "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+                     "model_version": server.embedder.model_version},
+                    np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+                )
+            except OSError:
+                return
+            except Exception as e:
+                try:
+                    send_message(self.request, {"error": str(e)})
+                except OSError:
+                    return
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived embedding process shared by every worker on the host
+
+    One thread per client connection hands requests to a MicroBatcher, which
+    runs the model. Start with `python embedding_service.py`.
+    """
+
+    daemon_threads = True
+    # Every worker thread connects at once after a deploy; the default backlog is 5
+    request_queue_size = 1024
+
+    def __init__(self, socket_path: str, embedder, max_batch: int = 64, max_wait_ms: float = 5.0):
+        """
+        Args:
+            socket_path: Unix socket to listen on (a stale socket file is replaced)
+            embedder: Embedder from embedding_backends.get_embedder
+            max_batch: Texts per forward pass before a batch is closed early
+            max_wait_ms: How long a batch stays open for more requests
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.embedder = embedder
+        self.batcher = MicroBatcher(embedder.encode, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+        logger.info(f"Embedding service for {embedder.model_version} listening on {socket_path}")
+
+
+class EmbeddingClient:
+    """
+    Client for the embedding service
+
+    Connections are kept per thread and per process, so a client created
+    before a fork is safe to use in the workers.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None and getattr(self._local, "pid", None) == os.getpid():
+            return sock
+        delay = 0.01
+        for attempt in range(_CONNECT_ATTEMPTS):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                sock.close()
+                if e.errno == errno.ENOENT:
+                    raise EmbeddingServiceUnavailable(f"No embedding service socket at {self.socket_path}")
+                if e.errno not in (errno.EAGAIN, errno.ECONNREFUSED):
+                    raise EmbeddingServiceError(f"Cannot connect to {self.socket_path}: {str(e)}")
+                if attempt == _CONNECT_ATTEMPTS - 1:
+                    if e.errno == errno.ECONNREFUSED:
+                        raise EmbeddingServiceUnavailable(f"Nothing is listening on {self.socket_path}")
+                    raise EmbeddingServiceError(f"Cannot connect to {self.socket_path}: {str(e)}")
+                time.sleep(delay)
+                delay *= 2
+                continue
+            self._local.sock, self._local.pid = sock, os.getpid()
+            return sock
+            return sock
+
+    def _reset(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def request(self, header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        """Send a request and wait for the reply, reconnecting once if the connection went stale"""
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                send_message(sock, header)
+                message = recv_message(sock)
+                if message is None:
+                    raise OSError("Connection closed by the embedding service")
+            except OSError as e:
+                self._reset()
+                if attempt:
+                    raise EmbeddingServiceError(str(e))
+                continue
+
+            reply, payload = message
+            if "error" in reply:
+                raise EmbeddingServiceError(reply["error"])
+            return reply, payload
+
+    def info(self) -> Dict[str, Any]:
+        """Model version and batching statistics of the service"""
+        return self.request({"op": "info"})[0]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix"""
+        reply, payload = self.request({"op": "embed", "texts": list(texts)})
+        return np.frombuffer(payload, dtype=np.float32).reshape(reply["n"], reply["dim"])
+
+
+class RemoteEmbedder:
+    """
+    Embedder backed by the embedding service, with in-process fallback
+
+    If the service is down, or serves a different model version, texts are
+    embedded by a local model loaded on first need; the service is retried
+    every retry_interval seconds. A transient failure (e.g. a busy socket)
+    falls back for that request only.
+    """
+
+    name = "service"
+
+    def __init__(self,
+                 client: EmbeddingClient,
+                 model_version: str,
+                 load_fallback: Callable[[], Any],
+                 retry_interval: float = 30.0):
+        """
+        Args:
+            client: EmbeddingClient for the service socket
+            model_version: Version this process expects (see embedding_backends.embedder_version)
+            load_fallback: Loads the in-process embedder
+            retry_interval: Seconds before retrying the service after a failure
+        """
+        self.client = client
+        self.model_version = model_version
+        self.load_fallback = load_fallback
+        self.retry_interval = retry_interval
+        self._fallback = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self._verified_pid = None
+
+    def _fallback_embedder(self):
+        with self._lock:
+            if self._fallback is None:
+                logger.warning("Loading the embedding model in-process")
+                self._fallback = self.load_fallback()
+            return self._fallback
+
+    def _verify(self):
+        """Check once per process that the service runs the expected model version"""
+        if self._verified_pid == os.getpid():
+            return
+        served = self.client.info().get("model_version")
+        if served != self.model_version:
+            raise EmbeddingServiceUnavailable(f"Embedding service runs {served}, expected {self.model_version}")
+        self._verified_pid = os.getpid()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix"""
+        if time.monotonic() >= self._retry_at:
+            try:
+                self._verify()
+                return self.client.encode(texts)
+            except EmbeddingServiceUnavailable as e:
+                logger.warning(f"Embedding service unavailable, embedding in-process: {str(e)}")
+                self._retry_at = time.monotonic() + self.retry_interval
+            except EmbeddingServiceError as e:
+                logger.warning(f"Embedding service request failed, embedding in-process: {str(e)}")
+        return self._fallback_embedder().encode(texts)
+
+
+if __name__ == "__main__":
+    from embedding_backends import get_embedder, EMBEDDING_BACKENDS
+
+    parser = argparse.ArgumentParser(description="Shared embedding service for MemeMorph workers")
+    parser.add_argument("--socket", default=os.getenv('CANON_VDB_EMBEDDING_SOCKET', DEFAULT_SOCKET_PATH))
+    parser.add_argument("--model", default=os.getenv('CANON_VDB_EMBEDDING_MODEL', 'all-MiniLM-L6-v2'))
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, help="Defaults to CANON_VDB_EMBEDDING_BACKEND")
+    parser.add_argument("--max-batch", type=int, default=64, help="Texts per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="How long a batch waits for more requests")
+    args = parser.parse_args()
+
+    server = EmbeddingServer(
+        args.socket,
+        get_embedder(args.model, backend=args.backend),
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
@@ -0,0 +1,18 @@
+import os
+
+# Gunicorn reads this file from the working directory:
+#   gunicorn --bind 0.0.0.0:5000 wsgi:app
+#
+# MEMEMORPH_PRELOAD=1 loads the app and shared read-only state (libraries and
+# the embedding model) once in the master; forked workers then share those
+# pages through copy-on-write instead of each loading their own copy.
+
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+preload_app = os.getenv('MEMEMORPH_PRELOAD', '0') == '1'
+
+def when_ready(server):
+    """Runs in the master before the first workers are forked"""
+    if preload_app:
+        from startup import preload
+        preload()
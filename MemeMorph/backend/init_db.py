@@ -28,8 +28,9 @@ def create_indexes(db):
     db.users.create_index("wallet_address", unique=True)
     db.users.create_index("username", unique=True)
     
-    # Memes collection indexes
-    db.memes.create_index("owner_id")
+    # Memes collection indexes; per-owner listings are paged by (created_at, _id),
+    # newest first (the compound index also serves plain owner_id lookups)
+    db.memes.create_index([("owner_id", 1), ("created_at", -1), ("_id", -1)])
     db.memes.create_index("creator_id")
     db.memes.create_index("created_at")
     db.memes.create_index("token_id", sparse=True)
@@ -37,14 +38,18 @@ def create_indexes(db):
     # NFTs collection indexes
     db.nfts.create_index("token_id", unique=True)
     db.nfts.create_index("meme_id", unique=True)
-    db.nfts.create_index("owner_address")
+    db.nfts.create_index([("owner_address", 1), ("created_at", -1), ("_id", -1)])
     
-    # Transactions collection indexes
-    db.transactions.create_index("token_id")
+    # Transactions collection indexes; a token's history is paged by (timestamp, _id)
+    db.transactions.create_index([("token_id", 1), ("timestamp", -1), ("_id", -1)])
     db.transactions.create_index("from_address")
     db.transactions.create_index("to_address")
     db.transactions.create_index("timestamp")
     
+    # Prompts collection indexes (listed by name, looked up by name)
+    db.prompts.create_index("name", unique=True)
+    db.prompts.create_index("category")
+    
     logger.info("Indexes created successfully")
 
 def insert_initial_data(db):
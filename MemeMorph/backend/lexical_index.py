@@ -0,0 +1,320 @@
+import os
+import re
+import math
+import sqlite3
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Function words and question phrasing that carry no lore-specific meaning
+STOPWORDS = frozenset("""
+a about an and are as at be by can could describe did do does explain for from had has have how i in
+is it its me of on or say tell that the their there these this to was were what when where which who
+whom whose why will with would you
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of a text, without stopwords"""
+    return [token for token in _WORD_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def title_key(text: str) -> str:
+    """Normalized form of a title (or query) used for exact title matching"""
+    return " ".join(tokenize(text))
+
+
+class LexicalIndex:
+    """
+    LexicalIndex - per-world BM25 inverted index for CanonVDB
+
+    Kept in a SQLite file next to the lore index and maintained by the
+    CanonVDB write methods, one document per stored chunk (its text plus the
+    entry title):
+    - lexical_docs: chunk -> entry, world, category and token length
+    - lexical_postings: (world, term) -> chunk and term frequency
+    - lexical_stats: document count and total length per world, so BM25's
+      IDF and length normalization are computed within a world
+    - lexical_titles: normalized entry titles for the exact-title fast path
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            db_path: SQLite file (created if needed)
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+        """
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the index tables if they don't exist"""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_docs (
+                    chunk_id TEXT PRIMARY KEY,
+                    parent_id TEXT NOT NULL,
+                    world_id TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lexical_docs_parent ON lexical_docs (parent_id)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_postings (
+                    world_id TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (world_id, term, chunk_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lexical_postings_chunk ON lexical_postings (chunk_id)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_stats (
+                    world_id TEXT PRIMARY KEY,
+                    n_docs INTEGER NOT NULL DEFAULT 0,
+                    total_length INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_titles (
+                    title_key TEXT NOT NULL,
+                    world_id TEXT NOT NULL,
+                    parent_id TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    PRIMARY KEY (title_key, world_id, parent_id)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lexical_titles_parent ON lexical_titles (parent_id)"
+            )
+
+    def is_empty(self) -> bool:
+        """Return True if nothing has been indexed yet"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM lexical_docs LIMIT 1").fetchone()
+        return row is None
+
+    def _remove_chunks(self, chunk_ids: List[str]):
+        """Drop chunks and their postings, keeping world stats in step (caller holds the lock)"""
+        for chunk_id in chunk_ids:
+            row = self._conn.execute(
+                "SELECT world_id, length FROM lexical_docs WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM lexical_postings WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM lexical_docs WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute(
+                "UPDATE lexical_stats SET n_docs = n_docs - 1, total_length = total_length - ? WHERE world_id = ?",
+                (row[1], row[0])
+            )
+
+    def _add_rows(self, chunk_ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Index chunk rows, replacing any earlier version of them (caller holds the lock)"""
+        self._remove_chunks(chunk_ids)
+        for chunk_id, document, metadata in zip(chunk_ids, documents, metadatas):
+            metadata = metadata or {}
+            world_id = metadata.get("world_id", "default")
+            category = metadata.get("category", "general")
+            parent_id = metadata.get("parent_id") or chunk_id
+            title = metadata.get("title") or ""
+
+            terms = Counter(tokenize(f"{title}\n{document or ''}"))
+            length = sum(terms.values())
+            self._conn.execute(
+                "INSERT INTO lexical_docs (chunk_id, parent_id, world_id, category, length) VALUES (?, ?, ?, ?, ?)",
+                (chunk_id, parent_id, world_id, category, length)
+            )
+            self._conn.executemany(
+                "INSERT INTO lexical_postings (world_id, term, chunk_id, tf) VALUES (?, ?, ?, ?)",
+                [(world_id, term, chunk_id, tf) for term, tf in terms.items()]
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO lexical_stats (world_id, n_docs, total_length) VALUES (?, 0, 0)",
+                (world_id,)
+            )
+            self._conn.execute(
+                "UPDATE lexical_stats SET n_docs = n_docs + 1, total_length = total_length + ? WHERE world_id = ?",
+                (length, world_id)
+            )
+
+            key = title_key(title)
+            if key:
+                self._conn.execute("DELETE FROM lexical_titles WHERE parent_id = ?", (parent_id,))
+                self._conn.execute(
+                    "INSERT INTO lexical_titles (title_key, world_id, parent_id, category) VALUES (?, ?, ?, ?)",
+                    (key, world_id, parent_id, category)
+                )
+
+    def add_rows(self, chunk_ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """
+        Index stored chunk rows (used for new entries, backfills and restores)
+
+        Args:
+            chunk_ids: Collection IDs of the chunks
+            documents: Chunk texts
+            metadatas: Chunk metadata (title, category, world_id, parent_id)
+        """
+        with self._lock, self._conn:
+            self._add_rows(chunk_ids, documents, metadatas)
+
+    def replace_entry(self,
+                      parent_id: str,
+                      chunk_ids: List[str],
+                      documents: List[str],
+                      metadatas: List[Dict[str, Any]]):
+        """Re-index an entry after an update, in one transaction"""
+        with self._lock, self._conn:
+            self._remove_entry(parent_id)
+            self._add_rows(chunk_ids, documents, metadatas)
+
+    def _remove_entry(self, parent_id: str):
+        rows = self._conn.execute("SELECT chunk_id FROM lexical_docs WHERE parent_id = ?", (parent_id,)).fetchall()
+        self._remove_chunks([row[0] for row in rows])
+        self._conn.execute("DELETE FROM lexical_titles WHERE parent_id = ?", (parent_id,))
+
+    def remove_entry(self, parent_id: str):
+        """Remove an entry and all its chunks from the index"""
+        with self._lock, self._conn:
+            self._remove_entry(parent_id)
+
+    def get_worlds(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """Return the world of each indexed chunk"""
+        worlds = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                worlds.update(self._conn.execute(
+                    f"SELECT chunk_id, world_id FROM lexical_docs WHERE chunk_id IN ({placeholders})", batch
+                ).fetchall())
+        return worlds
+
+    def match_title(self, query: str, world_id: str = None, category: str = None) -> Optional[str]:
+        """
+        Return the entry whose normalized title equals the normalized query
+
+        Only an unambiguous match counts: if several entries share the title
+        (within the world, or across worlds when world_id is None), None is
+        returned.
+        """
+        key = title_key(query)
+        if not key:
+            return None
+
+        sql = "SELECT parent_id FROM lexical_titles WHERE title_key = ?"
+        params: List[Any] = [key]
+        if world_id:
+            sql += " AND world_id = ?"
+            params.append(world_id)
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        with self._lock:
+            rows = self._conn.execute(sql + " LIMIT 2", params).fetchall()
+        return rows[0][0] if len(rows) == 1 else None
+
+    def search(self,
+               query: str,
+               world_id: str = None,
+               category: str = None,
+               n_results: int = 5) -> List[Tuple[str, float]]:
+        """
+        Rank chunks against a query with BM25
+
+        Args:
+            query: The search query
+            world_id: Only search this world (all worlds if None)
+            category: Filter by category
+            n_results: Number of chunks to return
+
+        Returns:
+            (chunk_id, score) pairs, best first
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        placeholders = ",".join("?" * len(terms))
+        world_filter = "AND p.world_id = ?" if world_id else ""
+        world_params = [world_id] if world_id else []
+        with self._lock:
+            stats = {
+                row[0]: (row[1], row[2]) for row in self._conn.execute(
+                    "SELECT world_id, n_docs, total_length FROM lexical_stats" +
+                    (" WHERE world_id = ?" if world_id else ""),
+                    world_params
+                )
+            }
+            document_frequency = {
+                (row[0], row[1]): row[2] for row in self._conn.execute(
+                    f"SELECT p.world_id, p.term, COUNT(*) FROM lexical_postings p "
+                    f"WHERE p.term IN ({placeholders}) {world_filter} GROUP BY p.world_id, p.term",
+                    terms + world_params
+                )
+            }
+            postings = self._conn.execute(
+                f"SELECT p.world_id, p.term, p.chunk_id, p.tf, d.length FROM lexical_postings p "
+                f"JOIN lexical_docs d ON d.chunk_id = p.chunk_id "
+                f"WHERE p.term IN ({placeholders}) {world_filter}" +
+                (" AND d.category = ?" if category else ""),
+                terms + world_params + ([category] if category else [])
+            ).fetchall()
+
+        scores: Dict[str, float] = {}
+        for world, term, chunk_id, tf, length in postings:
+            n_docs, total_length = stats.get(world, (0, 0))
+            if n_docs <= 0:
+                continue
+            df = document_frequency.get((world, term), 0)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            average_length = total_length / float(n_docs) or 1.0
+            norm = tf + self.k1 * (1.0 - self.b + self.b * length / average_length)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1.0) / norm
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n_results]
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge several rankings of ids with reciprocal rank fusion
+
+    Each id scores sum(1 / (k + rank)) over the rankings it appears in, so
+    items ranked well by several retrievers rise to the top without having
+    to compare their raw scores.
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
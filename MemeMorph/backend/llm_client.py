@@ -0,0 +1,769 @@
+import os
+import json
+import time
+import asyncio
+import random
+import argparse
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# Upstream statuses worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+class LLMError(Exception):
+    """The LLM request failed"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LLMUnavailableError(LLMError):
+    """The request was not sent: the circuit is open or too many requests are in flight"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _stream_event(line: str):
+    """
+    Parse one line of a chat completions event stream
+
+    Returns:
+        (done, content): done at "data: [DONE]", content is the delta text (if any)
+    """
+    if not line or not line.startswith("data:"):
+        return False, None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return True, None
+    try:
+        delta = json.loads(data)["choices"][0].get("delta", {})
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        raise LLMError("LLM stream sent a malformed event")
+    return False, delta.get("content")
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        """Raise LLMUnavailableError unless a call may go through now"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise LLMUnavailableError("LLM circuit breaker is open", retry_after=max(remaining, 1.0))
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a call that neither succeeded nor failed (e.g. abandoned by the caller)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LLMClient:
+    """
+    Client for an OpenAI-compatible chat completions API
+
+    - one keep-alive connection pool per process (recreated after a fork)
+    - separate connect and read timeouts, so a hung upstream can't hold a worker
+    - bounded retries of connection errors, timeouts, 429 and 5xx responses
+      with full-jitter exponential backoff (honouring a short Retry-After)
+    - a deadline on the whole call (slot wait, attempts and backoff), kept
+      below the worker timeout so gunicorn never kills a worker mid-request
+    - a concurrency limit on requests in flight
+    - a circuit breaker that fails fast while the upstream is down
+
+    Point base_url at a local stand-in server (`python llm_client.py stub`)
+    for tests and load benchmarks.
+    """
+
+    def __init__(self,
+                 base_url: str = DEFAULT_BASE_URL,
+                 api_key: str = "",
+                 model: str = "gpt-4",
+                 connect_timeout: float = 3.05,
+                 read_timeout: float = 20.0,
+                 max_retries: int = 1,
+                 deadline: float = 25.0,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 max_concurrency: int = 8,
+                 acquire_timeout: float = 10.0,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        """
+        Args:
+            base_url: API root; requests go to <base_url>/chat/completions
+            api_key: Bearer token (may be empty for a local stand-in)
+            model: Default model name
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for response data
+            max_retries: Retries after the first attempt
+            deadline: Seconds a call may take in total, until the reply (or, when
+                streaming, its first byte) arrives; keep below GUNICORN_TIMEOUT
+            backoff_base: Backoff before the first retry (doubled for each further one)
+            backoff_max: Cap on a single backoff
+            max_concurrency: Requests in flight at once from this process
+            acquire_timeout: Seconds to wait for a concurrency slot
+            failure_threshold: Consecutive failed requests that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+        """
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+
+    @property
+    def configured(self) -> bool:
+        """True if there is a real upstream to call (an API key, or a custom base URL)"""
+        has_key = bool(self.api_key) and self.api_key != 'your_openai_api_key_here'
+        return has_key or self.base_url != DEFAULT_BASE_URL
+
+    def _get_session(self) -> requests.Session:
+        """The process's pooled session; sessions aren't shared across a fork"""
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if self.api_key:
+                    session.headers["Authorization"] = f"Bearer {self.api_key}"
+                session.headers["Content-Type"] = "application/json"
+                self._session, self._session_pid = session, os.getpid()
+            return self._session
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if it is short enough"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _read_timeout(self, give_up: float) -> float:
+        """Read timeout of an attempt, shortened so it ends by the call's deadline"""
+        return max(min(self.timeout[1], give_up - time.monotonic()), 0.1)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str], give_up: float) -> Optional[float]:
+        """Backoff before the next attempt, or None if there is no retry (or time) left for one"""
+        if attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt, retry_after)
+        # Not worth retrying unless the attempt gets at least a connect timeout's worth of time
+        if time.monotonic() + delay + self.timeout[0] >= give_up:
+            return None
+        return delay
+
+    def _post(self, path: str, payload: Dict[str, Any], stream: bool = False, give_up: float = None):
+        """
+        POST with retries; raises LLMError once retries (or the deadline) are exhausted
+
+        Returns the decoded body, or with stream=True the open response (only
+        establishing the stream is retried, never a partly relayed one).
+        """
+        url = f"{self.base_url}{path}"
+        session = self._get_session()
+        give_up = give_up or time.monotonic() + self.deadline
+        last_error: Optional[LLMError] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+            retry_after = None
+            try:
+                response = session.post(url, json=payload, stream=stream,
+                                        timeout=(self.timeout[0], self._read_timeout(give_up)))
+            except requests.RequestException as e:
+                last_error = LLMError(f"LLM request failed: {str(e)}")
+            else:
+                if response.status_code == 200 and stream:
+                    return response
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise LLMError("LLM returned invalid JSON", status_code=200)
+                last_error = LLMError(
+                    f"LLM API error {response.status_code}: {response.text[:500]}",
+                    status_code=response.status_code
+                )
+                if response.status_code not in RETRYABLE_STATUSES:
+                    raise last_error
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+
+            delay = self._retry_delay(attempt, retry_after, give_up)
+            if delay is None:
+                break
+            logger.warning(f"{last_error}; retrying in {delay:.2f}s ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+        raise last_error
+
+    def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a raw chat completions request
+
+        Args:
+            payload: Request body; "model" defaults to the client's model
+
+        Returns:
+            The decoded response body
+
+        Raises:
+            LLMUnavailableError: The circuit is open or no concurrency slot freed up in time
+            LLMError: The request failed after retries
+        """
+        give_up = time.monotonic() + self.deadline
+        self._acquire(give_up)
+        try:
+            result = self._post("/chat/completions", {"model": self.model, **payload}, give_up=give_up)
+        except LLMError as e:
+            self._record_failure(e)
+            raise
+        finally:
+            self._slots.release()
+        self.breaker.record_success()
+        return result
+
+    def _acquire(self, give_up: float):
+        """Take a concurrency slot and pass the circuit breaker, or raise LLMUnavailableError"""
+        if not self._slots.acquire(timeout=max(min(self.acquire_timeout, give_up - time.monotonic()), 0)):
+            self._count("rejected")
+            raise LLMUnavailableError(f"Too many LLM requests in flight ({self.max_concurrency})",
+                                      retry_after=1.0)
+        try:
+            self.breaker.before_call()
+        except LLMUnavailableError:
+            self._slots.release()
+            self._count("rejected")
+            raise
+        self._count("requests")
+
+    def _record_failure(self, error: LLMError):
+        # Client errors (bad request, auth) say nothing about upstream health
+        if error.status_code is None or error.status_code in RETRYABLE_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._count("failures")
+
+    def chat(self,
+             messages: List[Dict[str, str]],
+             model: str = None,
+             temperature: float = 0.7,
+             max_tokens: int = 500) -> str:
+        """
+        Run a chat completion and return the reply text
+
+        Args:
+            messages: Chat messages ({"role", "content"})
+            model: Model name (defaults to the client's model)
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in the reply
+
+        Returns:
+            The assistant message content
+        """
+        result = self.chat_completion({
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        })
+        try:
+            return result["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise LLMError("LLM response has no message content")
+
+    def chat_stream(self,
+                    messages: List[Dict[str, str]],
+                    model: str = None,
+                    temperature: float = 0.7,
+                    max_tokens: int = 500) -> Iterator[str]:
+        """
+        Run a streaming chat completion, yielding reply text as it arrives
+
+        The concurrency slot is held until the stream ends or the caller
+        closes the generator (e.g. because the browser disconnected).
+
+        Args:
+            messages: Chat messages ({"role", "content"})
+            model: Model name (defaults to the client's model)
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in the reply
+
+        Yields:
+            Content deltas of the assistant message
+        """
+        give_up = time.monotonic() + self.deadline
+        self._acquire(give_up)
+        response = None
+        error: Optional[LLMError] = None
+        completed = False
+        try:
+            response = self._post("/chat/completions", {
+                "model": model or self.model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            }, stream=True, give_up=give_up)
+
+            # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+            for line in response.iter_lines(decode_unicode=True):
+                done, content = _stream_event(line)
+                if done:
+                    break
+                if content:
+                    yield content
+            completed = True
+        except LLMError as e:
+            error = e
+            raise
+        except requests.RequestException as e:
+            error = LLMError(f"LLM stream interrupted: {str(e)}")
+            raise error
+        finally:
+            # A caller that stops reading (GeneratorExit) says nothing about the
+            # upstream, but must not leave a half-open trial in flight forever
+            if error is not None:
+                self._record_failure(error)
+            elif completed:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_trial()
+            if response is not None:
+                response.close()
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters and circuit breaker state"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+def get_llm_client() -> LLMClient:
+    """Process-wide LLM client configured from the environment (LLM_* and OPENAI_API_KEY)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                base_url=os.getenv('LLM_BASE_URL', DEFAULT_BASE_URL),
+                api_key=os.getenv('OPENAI_API_KEY', ''),
+                model=os.getenv('LLM_MODEL', 'gpt-4'),
+                connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT', 3.05)),
+                read_timeout=float(os.getenv('LLM_READ_TIMEOUT', 20)),
+                max_retries=int(os.getenv('LLM_MAX_RETRIES', 1)),
+                deadline=float(os.getenv('LLM_DEADLINE', 25)),
+                max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+                acquire_timeout=float(os.getenv('LLM_ACQUIRE_TIMEOUT', 10)),
+                failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('LLM_BREAKER_RESET', 30))
+            )
+        return _client
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    asyncio variant of LLMClient for the async serving path (asgi.py)
+
+    Same retries, backoff, circuit breaker and counters, but requests go
+    through an httpx.AsyncClient and wait on the event loop instead of
+    holding a thread, so max_concurrency can be in the hundreds.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_client = None
+        self._async_slots = None
+        self._loop = None
+
+    async def _bind_loop(self):
+        """Pool and slots belong to the running event loop; recreate them for a new one"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            previous = self._async_client
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency)
+            )
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            if previous is not None:
+                try:
+                    await previous.aclose()
+                except Exception as e:
+                    # Its loop is gone, and with it the connections
+                    logger.debug(f"Could not close the previous LLM connection pool: {str(e)}")
+        return self._async_client
+
+    async def _post(self, path: str, payload: Dict[str, Any], stream: bool = False,
+                    give_up: float = None) -> Dict[str, Any]:
+        """POST with retries; raises LLMError once retries (or the deadline) are exhausted"""
+        import httpx
+
+        url = f"{self.base_url}{path}"
+        client = await self._bind_loop()
+        give_up = give_up or time.monotonic() + self.deadline
+        last_error: Optional[LLMError] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+            retry_after = None
+            try:
+                response = await client.post(url, json=payload, timeout=httpx.Timeout(
+                    self._read_timeout(give_up), connect=self.timeout[0]))
+            except httpx.TransportError as e:
+                last_error = LLMError(f"LLM request failed: {str(e) or type(e).__name__}")
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise LLMError("LLM returned invalid JSON", status_code=200)
+                last_error = LLMError(
+                    f"LLM API error {response.status_code}: {response.text[:500]}",
+                    status_code=response.status_code
+                )
+                if response.status_code not in RETRYABLE_STATUSES:
+                    raise last_error
+                retry_after = response.headers.get("Retry-After")
+
+            delay = self._retry_delay(attempt, retry_after, give_up)
+            if delay is None:
+                break
+            logger.warning(f"{last_error}; retrying in {delay:.2f}s ({attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(delay)
+        raise last_error
+
+    async def _acquire(self, give_up: float):
+        """Take a concurrency slot and pass the circuit breaker, or raise LLMUnavailableError"""
+        await self._bind_loop()
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(),
+                                   timeout=max(min(self.acquire_timeout, give_up - time.monotonic()), 0))
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise LLMUnavailableError(f"Too many LLM requests in flight ({self.max_concurrency})",
+                                      retry_after=1.0)
+        try:
+            self.breaker.before_call()
+        except LLMUnavailableError:
+            self._async_slots.release()
+            self._count("rejected")
+            raise
+        self._count("requests")
+
+    async def chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a raw chat completions request; see LLMClient.chat_completion"""
+        give_up = time.monotonic() + self.deadline
+        await self._acquire(give_up)
+        try:
+            result = await self._post("/chat/completions", {"model": self.model, **payload}, give_up=give_up)
+        except LLMError as e:
+            self._record_failure(e)
+            raise
+        finally:
+            self._async_slots.release()
+        self.breaker.record_success()
+        return result
+
+    async def chat(self,
+                   messages: List[Dict[str, str]],
+                   model: str = None,
+                   temperature: float = 0.7,
+                   max_tokens: int = 500) -> str:
+        """Run a chat completion and return the reply text; see LLMClient.chat"""
+        result = await self.chat_completion({
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        })
+        try:
+            return result["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise LLMError("LLM response has no message content")
+
+    async def chat_stream(self,
+                          messages: List[Dict[str, str]],
+                          model: str = None,
+                          temperature: float = 0.7,
+                          max_tokens: int = 500) -> AsyncIterator[str]:
+        """
+        Run a streaming chat completion; see LLMClient.chat_stream
+
+        Establishing the stream is not retried. A caller that stops reading
+        (e.g. the browser disconnected) counts as neither success nor failure
+        of the upstream, but still ends a half-open trial.
+        """
+        import httpx
+
+        give_up = time.monotonic() + self.deadline
+        await self._acquire(give_up)
+        error: Optional[LLMError] = None
+        completed = False
+        try:
+            client = await self._bind_loop()
+            async with client.stream("POST", f"{self.base_url}/chat/completions", json={
+                "model": model or self.model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            }, timeout=httpx.Timeout(self._read_timeout(give_up), connect=self.timeout[0])) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise LLMError(f"LLM API error {response.status_code}: {body[:500]}",
+                                   status_code=response.status_code)
+                async for line in response.aiter_lines():
+                    done, content = _stream_event(line)
+                    if done:
+                        break
+                    if content:
+                        yield content
+            completed = True
+        except LLMError as e:
+            error = e
+            raise
+        except httpx.HTTPError as e:
+            error = LLMError(f"LLM stream interrupted: {str(e)}")
+            raise error
+        finally:
+            if error is not None:
+                self._record_failure(error)
+            elif completed:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_trial()
+            self._async_slots.release()
+
+
+_async_client: Optional[AsyncLLMClient] = None
+
+def get_async_llm_client() -> AsyncLLMClient:
+    """
+    Process-wide async LLM client, configured like get_llm_client but with
+    LLM_ASYNC_MAX_CONCURRENCY requests in flight
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncLLMClient(
+                base_url=os.getenv('LLM_BASE_URL', DEFAULT_BASE_URL),
+                api_key=os.getenv('OPENAI_API_KEY', ''),
+                model=os.getenv('LLM_MODEL', 'gpt-4'),
+                connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT', 3.05)),
+                read_timeout=float(os.getenv('LLM_READ_TIMEOUT', 20)),
+                max_retries=int(os.getenv('LLM_MAX_RETRIES', 1)),
+                deadline=float(os.getenv('LLM_DEADLINE', 25)),
+                max_concurrency=int(os.getenv('LLM_ASYNC_MAX_CONCURRENCY', 256)),
+                acquire_timeout=float(os.getenv('LLM_ACQUIRE_TIMEOUT', 10)),
+                failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('LLM_BREAKER_RESET', 30))
+            )
+        return _async_client
+
+
+def serve_stub(port: int = 8089, latency_ms: float = 200.0, error_rate: float = 0.0):
+    """
+    Run a local stand-in for the chat completions API
+
+    Replies after latency_ms with a canned answer (spread over the events
+    when the request asks for a stream); error_rate is the share of requests
+    answered with a 503, to exercise retries and the circuit breaker.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: Dict[str, Any]):
+            encoded = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def _stream(self, words: List[str]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            events = [{"choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}}]}
+                      for i, word in enumerate(words)]
+            for i, event in enumerate(events):
+                if i:
+                    time.sleep(latency_ms / 1000.0 / len(events))
+                self._chunk(f"data: {json.dumps(event)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text: str):
+            encoded = text.encode("utf-8")
+            self.wfile.write(f"{len(encoded):x}\r\n".encode("ascii") + encoded + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if random.random() < error_rate:
+                self._reply(503, {"error": {"message": "stub overloaded"}})
+                return
+            question = payload.get("messages", [{}])[-1].get("content", "")
+            if payload.get("stream"):
+                self._stream(f"Stub answer ({len(question)} prompt chars) streamed word by word".split(" "))
+                return
+            time.sleep(latency_ms / 1000.0)
+            self._reply(200, {
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant",
+                                                     "content": f"Stub answer ({len(question)} prompt chars)"}}]
+            })
+
+    class StubServer(ThreadingHTTPServer):
+        # Accept bursts of hundreds of connections (the default listen backlog is 5)
+        request_queue_size = 1024
+
+    server = StubServer(("127.0.0.1", port), StubHandler)
+    logger.info(f"Stub LLM listening on http://127.0.0.1:{port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def run_load(client: LLMClient, requests_total: int = 100, concurrency: int = 16) -> Dict[str, Any]:
+    """Fire concurrent chat requests through a client and report latency percentiles"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            client.chat([{"role": "user", "content": "ping"}], max_tokens=16)
+            ok = True
+        except LLMError:
+            ok = False
+        return ok, (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(requests_total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(ms for _, ms in outcomes)
+    return {
+        "requests": requests_total,
+        "succeeded": sum(1 for ok, _ in outcomes if ok),
+        "requests_per_s": requests_total / elapsed if elapsed else None,
+        "p50_ms": latencies[len(latencies) // 2] if latencies else None,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else None,
+        "client": client.stats()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM client tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stub = commands.add_parser("stub", help="Run a local stand-in chat completions server")
+    stub.add_argument("--port", type=int, default=8089)
+    stub.add_argument("--latency-ms", type=float, default=200.0)
+    stub.add_argument("--error-rate", type=float, default=0.0)
+
+    load = commands.add_parser("load", help="Load-test the configured LLM endpoint (LLM_BASE_URL)")
+    load.add_argument("--requests", type=int, default=100)
+    load.add_argument("--concurrency", type=int, default=16)
+
+    args = parser.parse_args()
+    if args.command == "stub":
+        serve_stub(args.port, args.latency_ms, args.error_rate)
+    else:
+        print(json.dumps(run_load(get_llm_client(), args.requests, args.concurrency), indent=2))
@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import logging
+import platform
+from typing import List, Dict, Any, Callable
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_SUBJECTS = ["The kingdom of Altaris", "Silverhold", "The Free Cities", "The Grand Library", "A wandering knight",
+             "The Treaty of Elmswood", "Mount Argent", "The steam guild", "An ancient dragon", "The royal family",
+             "The desert nomads", "The Order of the Lantern", "Queen Maren", "The iron fleet", "The sunken temple"]
+_VERBS = ["guards", "was founded after", "trades with", "remembers", "fell during", "rebuilt", "betrayed",
+          "honours", "fears", "negotiated with", "was cursed by", "explored", "sealed away", "celebrates"]
+_OBJECTS = ["the silver spires", "the hundred-year war", "the western border", "a forgotten heir",
+            "the pneumatic tube network", "the first age", "the merchant council", "a sealed vault",
+            "the northern glaciers", "the comet of ash", "the last harvest", "the twin moons", "the salt roads"]
+_DETAILS = ["Scholars still argue about the details.", "Few records survive from that time.",
+            "The event is commemorated every spring.", "Travellers report strange lights nearby.",
+            "Its consequences shaped the current borders.", "Bards tell the story differently in every city."]
+
+def _sentence(rng: random.Random) -> str:
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}. {rng.choice(_DETAILS)}"
+
+def category_weights(n_categories: int) -> List[float]:
+    """Zipf-like category distribution, so filters range from broad to selective"""
+    weights = [1.0 / (i + 1) for i in range(n_categories)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+def generate_corpus(n_entries: int,
+                    world_id: str,
+                    n_categories: int = 5,
+                    mean_chunks: float = 1.5,
+                    seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Generate synthetic lore entries
+
+    Entry lengths follow a geometric distribution around mean_chunks chunks of
+    ~500 characters (the splitter's chunk size), categories a Zipf-like one.
+
+    Args:
+        n_entries: Number of entries
+        world_id: World the entries belong to
+        n_categories: Number of distinct categories
+        mean_chunks: Average number of chunks per entry
+        seed: Random seed
+
+    Returns:
+        Entries in the import_from_json format
+    """
+    rng = random.Random(seed)
+    categories = [f"category-{i}" for i in range(n_categories)]
+    weights = category_weights(n_categories)
+    p = 1.0 / max(mean_chunks, 1.0)
+
+    entries = []
+    for i in range(n_entries):
+        n_chunks = 1
+        while rng.random() > p:
+            n_chunks += 1
+        # ~5 sentences of ~90 characters fill one 500-character chunk
+        content = " ".join(_sentence(rng) for _ in range(n_chunks * 5))
+        entries.append({
+            "title": f"{rng.choice(_SUBJECTS)} #{i}",
+            "content": content,
+            "category": rng.choices(categories, weights=weights)[0],
+            "world_id": world_id,
+            "metadata": {"source": "benchmark"}
+        })
+    return entries
+
+def generate_queries(n_queries: int, seed: int = 7) -> List[str]:
+    """Generate search queries in the same vocabulary as the corpus"""
+    rng = random.Random(seed)
+    return [f"What happened when {rng.choice(_SUBJECTS).lower()} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}?"
+            for _ in range(n_queries)]
+
+def latency_stats(samples_ms: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (milliseconds)"""
+    if not samples_ms:
+        return {"count": 0}
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "count": int(len(samples)),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max())
+    }
+
+def _timed(fn: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000.0
+
+def load_world_vectors(vdb, world_id: str) -> Dict[str, Any]:
+    """Read all of a world's stored chunk vectors for exact search"""
+    collection = vdb._collection_for(world_id)
+    data = collection.get(where={"world_id": world_id}, include=["embeddings", "metadatas"])
+    return {
+        "ids": data["ids"],
+        "vectors": np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1),
+        "categories": [(m or {}).get("category") for m in data["metadatas"]],
+        "space": (collection.metadata or {}).get("hnsw:space", "l2")
+    }
+
+def brute_force_ids(world: Dict[str, Any], query_embedding: List[float], k: int, category: str = None) -> List[str]:
+    """Exact top-k chunk ids for a query over vectors from load_world_vectors()"""
+    ids, vectors = world["ids"], world["vectors"]
+    if category:
+        keep = [i for i, c in enumerate(world["categories"]) if c == category]
+        ids = [ids[i] for i in keep]
+        vectors = vectors[keep]
+    if not ids:
+        return []
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    space = world["space"]
+    if space == "cosine":
+        norms = np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12)
+        distances = 1.0 - (vectors @ query) / norms
+    elif space == "ip":
+        distances = 1.0 - vectors @ query
+    else:
+        distances = ((vectors - query) ** 2).sum(axis=1)
+    return [ids[i] for i in np.argsort(distances, kind="stable")[:k]]
+
+def run_benchmark(world_sizes: List[int],
+                  n_queries: int = 100,
+                  k: int = 5,
+                  n_categories: int = 5,
+                  mean_chunks: float = 1.5,
+                  bulk_entries: int = None,
+                  persist_directory: str = None,
+                  seed: int = 42) -> Dict[str, Any]:
+    """
+    Run the lore benchmark against a fresh CanonVDB
+
+    Backend settings come from the usual CANON_VDB_* environment variables, so
+    runs under different settings can be compared on the same corpus.
+
+    Args:
+        world_sizes: Number of entries of each benchmarked world
+        n_queries: Queries per measurement
+        k: Results per query (and k of recall@k)
+        n_categories: Number of categories (filter selectivity follows a Zipf-like distribution)
+        mean_chunks: Average chunks per entry
+        bulk_entries: Entries ingested through import_from_json (defaults to the smallest world size)
+        persist_directory: Where to build the database (a temporary directory by default)
+        seed: Random seed for the corpus
+
+    Returns:
+        Machine-readable report
+    """
+    from canon_vdb import CanonVDB
+
+    owns_directory = persist_directory is None
+    persist_directory = persist_directory or tempfile.mkdtemp(prefix="lore_benchmark_")
+    try:
+        vdb = CanonVDB(persist_directory=persist_directory)
+        queries = generate_queries(n_queries, seed=seed + 1)
+
+        report = {
+            "config": {
+                "world_sizes": world_sizes,
+                "n_queries": n_queries,
+                "k": k,
+                "n_categories": n_categories,
+                "mean_chunks": mean_chunks,
+                "seed": seed
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "embedding_model": vdb.embedder.model_version,
+                "vector_backend": vdb.vector_backend,
+                "small_world_threshold": vdb.small_world_threshold,
+                "quantization": vdb.numpy_backend.quantization,
+                "sharding": vdb.sharding,
+                "search_mode": vdb.search_mode
+            },
+            "worlds": []
+        }
+
+        for size_index, size in enumerate(world_sizes):
+            world_id = f"bench-{size_index}-{size}"
+            entries = generate_corpus(size, world_id, n_categories, mean_chunks, seed=seed + size_index)
+            logger.warning(f"Ingesting {size} entries into {world_id}")
+
+            # Ingest one entry at a time through add_lore_entry
+            ingest_ms, entry_ids = [], []
+            start = time.perf_counter()
+            for entry in entries:
+                entry_id, ms = _timed(vdb.add_lore_entry, entry["title"], entry["content"],
+                                      category=entry["category"], world_id=world_id, metadata=entry["metadata"])
+                ingest_ms.append(ms)
+                entry_ids.append(entry_id)
+            elapsed = time.perf_counter() - start
+            n_chunks = vdb.index.count_world_chunks(world_id)
+
+            world_report = {
+                "world_id": world_id,
+                "entries": size,
+                "chunks": n_chunks,
+                "search_backend": vdb._backend_for(world_id).name,
+                "ingest": {
+                    "entries_per_s": size / elapsed if elapsed else None,
+                    "chunks_per_s": n_chunks / elapsed if elapsed else None,
+                    "add_lore_entry": latency_stats(ingest_ms)
+                }
+            }
+
+            # Search latency, unfiltered and at each filter selectivity (first query warms caches)
+            vdb.search_lore(queries[0], world_id=world_id, n_results=k)
+            search = {"unfiltered": latency_stats([_timed(vdb.search_lore, q, world_id=world_id, n_results=k)[1]
+                                                   for q in queries])}
+            search["filtered"] = []
+            for ci in range(n_categories):
+                category = f"category-{ci}"
+                samples = [_timed(vdb.search_lore, q, world_id=world_id, category=category, n_results=k)[1]
+                           for q in queries]
+                selectivity = vdb.count_entries(world_id=world_id, category=category) / float(size)
+                search["filtered"].append({"category": category, "selectivity": selectivity, **latency_stats(samples)})
+            world_report["search"] = search
+
+            # Recall@k of the vector search against exact search over the world's stored vectors
+            hits, expected, filtered_hits, filtered_expected = 0, 0, 0, 0
+            selective_category = f"category-{n_categories - 1}"
+            world_vectors = load_world_vectors(vdb, world_id)
+            for query in queries:
+                embedding = vdb._embed_queries([query])[0]
+                truth = brute_force_ids(world_vectors, embedding, k)
+                found = [r["id"] for r in vdb.search_lore(query, world_id=world_id, n_results=k, mode="vector")]
+                hits += len(set(truth) & set(found))
+                expected += len(truth)
+
+                truth = brute_force_ids(world_vectors, embedding, k, category=selective_category)
+                found = [r["id"] for r in vdb.search_lore(query, world_id=world_id, category=selective_category,
+                                                          n_results=k, mode="vector")]
+                filtered_hits += len(set(truth) & set(found))
+                filtered_expected += len(truth)
+            world_report["recall"] = {
+                "k": k,
+                "recall_at_k": hits / float(expected) if expected else None,
+                "filtered_category": selective_category,
+                "filtered_recall_at_k": filtered_hits / float(filtered_expected) if filtered_expected else None
+            }
+
+            # Point reads and catalog listing
+            rng = random.Random(seed)
+            sample_ids = [rng.choice(entry_ids) for _ in range(n_queries)]
+            world_report["get_lore_by_id"] = latency_stats([_timed(vdb.get_lore_by_id, i)[1] for i in sample_ids])
+
+            list_ms, page_ms, cursor = [], [], None
+            for _ in range(n_queries):
+                list_ms.append(_timed(vdb.list_lore_entries, world_id=world_id, limit=50)[1])
+                page, ms = _timed(vdb.list_lore_entries, world_id=world_id, limit=50, after=cursor)
+                page_ms.append(ms)
+                cursor = vdb.next_cursor(page, 50)
+            world_report["list_lore_entries"] = {
+                "first_page": latency_stats(list_ms),
+                "keyset_pages": latency_stats(page_ms)
+            }
+
+            report["worlds"].append(world_report)
+
+        # Bulk ingest through import_from_json (NDJSON)
+        bulk_entries = bulk_entries if bulk_entries is not None else min(world_sizes)
+        if bulk_entries:
+            entries = generate_corpus(bulk_entries, "bench-bulk", n_categories, mean_chunks, seed=seed + 99)
+            bulk_file = os.path.join(persist_directory, "bulk.ndjson")
+            with open(bulk_file, 'w') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+            logger.warning(f"Bulk importing {bulk_entries} entries")
+            count, ms = _timed(vdb.import_from_json, bulk_file)
+            report["bulk_ingest"] = {
+                "entries": count,
+                "chunks": vdb.index.count_world_chunks("bench-bulk"),
+                "seconds": ms / 1000.0,
+                "entries_per_s": count / (ms / 1000.0) if ms else None
+            }
+
+        report["embedding_cache"] = {"hits": vdb.embedding_cache.hits, "misses": vdb.embedding_cache.misses}
+        report["numpy_backend_bytes"] = vdb.numpy_backend.memory_usage()
+        vdb.index.close()
+        return report
+    finally:
+        if owns_directory:
+            shutil.rmtree(persist_directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CanonVDB benchmark and recall suite")
+    parser.add_argument("--world-sizes", default="100,1000", help="Comma-separated entries per world")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per measurement")
+    parser.add_argument("--k", type=int, default=5, help="Results per query / recall@k")
+    parser.add_argument("--categories", type=int, default=5, help="Number of categories")
+    parser.add_argument("--mean-chunks", type=float, default=1.5, help="Average chunks per entry")
+    parser.add_argument("--bulk-entries", type=int, help="Entries for the bulk import measurement (0 to skip)")
+    parser.add_argument("--persist-directory", help="Build the database here instead of a temporary directory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    # Per-call INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+
+    result = run_benchmark(
+        [int(size) for size in args.world_sizes.split(",") if size.strip()],
+        n_queries=args.queries,
+        k=args.k,
+        n_categories=args.categories,
+        mean_chunks=args.mean_chunks,
+        bulk_entries=args.bulk_entries,
+        persist_directory=args.persist_directory,
+        seed=args.seed
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
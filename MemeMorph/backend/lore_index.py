@@ -0,0 +1,480 @@
+import os
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class LoreIndex:
+    """
+    LoreIndex - SQLite sidecar index for CanonVDB
+
+    Keeps two compact tables next to the ChromaDB collection:
+    - lore_chunks: parent -> chunk-id mapping, so a (possibly chunked) entry can be
+      fetched or deleted with a single `collection.get(ids=[...])`
+    - lore_catalog: one row per top-level entry (id, title, category, world_id,
+      created_at) for keyset pagination and sorted listing without touching vectors,
+      with per-world/category counts maintained by triggers in lore_counts
+    - lore_world_versions: a per-world counter bumped on every write, used to
+      invalidate caches built from a world's lore
+    - lore_meta / lore_collections: the active embedding model and the physical
+      collection serving each logical one, switched atomically by a re-index
+    - reindex_jobs / reindex_progress: state of background re-index jobs, so an
+      interrupted job can resume
+    """
+
+    def __init__(self, db_path: str):
+        """Open (and create if needed) the index database at db_path"""
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        # One shared connection guarded by a lock; Flask may call us from several threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the index tables if they don't exist"""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lore_chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    parent_id TEXT NOT NULL,
+                    chunk_number INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lore_chunks_parent "
+                "ON lore_chunks (parent_id, chunk_number)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lore_catalog (
+                    id TEXT PRIMARY KEY,
+                    title TEXT,
+                    category TEXT NOT NULL,
+                    world_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lore_catalog_world "
+                "ON lore_catalog (world_id, created_at, id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lore_catalog_world_category "
+                "ON lore_catalog (world_id, category, created_at, id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_lore_catalog_created "
+                "ON lore_catalog (created_at, id)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lore_counts (
+                    world_id TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    n INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (world_id, category)
+                )
+            """)
+            
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lore_world_versions (
+                    world_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lore_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lore_collections (
+                    logical TEXT PRIMARY KEY,
+                    physical TEXT NOT NULL,
+                    embedding_model TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reindex_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    target_model TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    total_chunks INTEGER NOT NULL DEFAULT 0,
+                    done_chunks INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    started_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS reindex_progress (
+                    job_id TEXT NOT NULL,
+                    logical TEXT NOT NULL,
+                    physical TEXT NOT NULL,
+                    next_offset INTEGER NOT NULL DEFAULT 0,
+                    copied INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (job_id, logical)
+                )
+            """)
+            
+            # Keep counts and world versions in step with the catalog
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_lore_catalog_insert AFTER INSERT ON lore_catalog
+                BEGIN
+                    INSERT OR IGNORE INTO lore_counts (world_id, category, n) VALUES (NEW.world_id, NEW.category, 0);
+                    UPDATE lore_counts SET n = n + 1 WHERE world_id = NEW.world_id AND category = NEW.category;
+                    INSERT OR IGNORE INTO lore_world_versions (world_id, version) VALUES (NEW.world_id, 0);
+                    UPDATE lore_world_versions SET version = version + 1 WHERE world_id = NEW.world_id;
+                END
+            """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_lore_catalog_delete AFTER DELETE ON lore_catalog
+                BEGIN
+                    UPDATE lore_counts SET n = n - 1 WHERE world_id = OLD.world_id AND category = OLD.category;
+                    UPDATE lore_world_versions SET version = version + 1 WHERE world_id = OLD.world_id;
+                END
+            """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_lore_catalog_touch AFTER UPDATE ON lore_catalog
+                BEGIN
+                    UPDATE lore_world_versions SET version = version + 1 WHERE world_id = OLD.world_id;
+                    INSERT OR IGNORE INTO lore_world_versions (world_id, version) VALUES (NEW.world_id, 0);
+                    UPDATE lore_world_versions SET version = version + 1 
+                        WHERE world_id = NEW.world_id AND NEW.world_id != OLD.world_id;
+                END
+            """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_lore_catalog_update
+                AFTER UPDATE OF world_id, category ON lore_catalog
+                BEGIN
+                    UPDATE lore_counts SET n = n - 1 WHERE world_id = OLD.world_id AND category = OLD.category;
+                    INSERT OR IGNORE INTO lore_counts (world_id, category, n) VALUES (NEW.world_id, NEW.category, 0);
+                    UPDATE lore_counts SET n = n + 1 WHERE world_id = NEW.world_id AND category = NEW.category;
+                END
+            """)
+
+    def is_empty(self) -> bool:
+        """Return True if no entries have been catalogued yet"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM lore_catalog LIMIT 1").fetchone()
+        return row is None
+
+    def add_entry(self, parent_id: str, chunk_ids: List[str], metadata: Dict[str, Any] = None):
+        """
+        Register an entry: its chunk ids (in chunk order) and its catalog row
+        
+        Args:
+            parent_id: ID of the top-level entry
+            chunk_ids: Collection IDs of the entry's chunks, in order
+            metadata: Entry metadata (title, category, world_id, created_at);
+                      if None only the chunk mapping is updated
+        """
+        rows = [(chunk_id, parent_id, i) for i, chunk_id in enumerate(chunk_ids)]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM lore_chunks WHERE parent_id = ?", (parent_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO lore_chunks (chunk_id, parent_id, chunk_number) VALUES (?, ?, ?)",
+                rows
+            )
+            if metadata is not None:
+                self._upsert_catalog(parent_id, metadata)
+
+    def _upsert_catalog(self, parent_id: str, metadata: Dict[str, Any]):
+        """Insert or refresh the catalog row for an entry (caller holds the lock)"""
+        existing = self._conn.execute(
+            "SELECT 1 FROM lore_catalog WHERE id = ?", (parent_id,)
+        ).fetchone()
+        values = (
+            metadata.get("title", "Untitled"),
+            metadata.get("category", "general"),
+            metadata.get("world_id", "default"),
+            metadata.get("created_at") or "",
+        )
+        if existing:
+            self._conn.execute(
+                "UPDATE lore_catalog SET title = ?, category = ?, world_id = ?, created_at = ? WHERE id = ?",
+                values + (parent_id,)
+            )
+        else:
+            self._conn.execute(
+                "INSERT INTO lore_catalog (title, category, world_id, created_at, id) VALUES (?, ?, ?, ?, ?)",
+                values + (parent_id,)
+            )
+
+    def update_entry(self, parent_id: str, metadata: Dict[str, Any]):
+        """Refresh the catalog row of an entry after a metadata update"""
+        with self._lock, self._conn:
+            self._upsert_catalog(parent_id, metadata)
+
+    def add_chunk(self, parent_id: str, chunk_id: str, chunk_number: int):
+        """Register a single chunk (used when backfilling from existing metadata)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lore_chunks (chunk_id, parent_id, chunk_number) VALUES (?, ?, ?)",
+                (chunk_id, parent_id, chunk_number)
+            )
+
+    def get_parent_id(self, chunk_id: str) -> Optional[str]:
+        """Return the parent entry id for a chunk id (or entry id), if indexed"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT parent_id FROM lore_chunks WHERE chunk_id = ?", (chunk_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_chunk_ids(self, parent_id: str) -> List[str]:
+        """Return all chunk ids for an entry, ordered by chunk number"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM lore_chunks WHERE parent_id = ? ORDER BY chunk_number",
+                (parent_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_chunk_ids_many(self, parent_ids: List[str]) -> Dict[str, List[str]]:
+        """Return the ordered chunk ids of several entries in one query"""
+        chunk_ids: Dict[str, List[str]] = {parent_id: [] for parent_id in parent_ids}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(parent_ids), 500):
+                batch = parent_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for parent_id, chunk_id in self._conn.execute(
+                    f"SELECT parent_id, chunk_id FROM lore_chunks WHERE parent_id IN ({placeholders}) "
+                    "ORDER BY parent_id, chunk_number",
+                    batch
+                ):
+                    chunk_ids[parent_id].append(chunk_id)
+        return chunk_ids
+
+    def remove_entry(self, parent_id: str):
+        """Remove an entry and all its chunks from the index"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM lore_chunks WHERE parent_id = ?", (parent_id,))
+            self._conn.execute("DELETE FROM lore_catalog WHERE id = ?", (parent_id,))
+
+    def list_entries(self,
+                     world_id: str = None,
+                     category: str = None,
+                     limit: int = 100,
+                     offset: int = 0,
+                     after: str = None,
+                     descending: bool = False) -> List[Dict[str, Any]]:
+        """
+        List top-level entries ordered by (created_at, id)
+        
+        Args:
+            world_id: Filter by world ID
+            category: Filter by category
+            limit: Maximum number of entries to return
+            offset: Number of entries to skip (ignored when `after` is given)
+            after: Opaque cursor from encode_cursor() for keyset pagination
+            descending: Newest entries first
+            
+        Returns:
+            List of catalog rows
+        """
+        clauses = []
+        params: List[Any] = []
+        if world_id:
+            clauses.append("world_id = ?")
+            params.append(world_id)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        if after:
+            created_at, entry_id = decode_cursor(after)
+            clauses.append(f"(created_at, id) {'<' if descending else '>'} (?, ?)")
+            params.extend([created_at, entry_id])
+        
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT id, title, category, world_id, created_at FROM lore_catalog"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY created_at {direction}, id {direction} LIMIT ?"
+        params.append(limit)
+        if offset and not after:
+            sql += " OFFSET ?"
+            params.append(offset)
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "title": row[1],
+                "category": row[2],
+                "world_id": row[3],
+                "created_at": row[4] or None
+            }
+            for row in rows
+        ]
+
+    def get_entry(self, parent_id: str) -> Optional[Dict[str, Any]]:
+        """Return the catalog row for an entry, if present"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, title, category, world_id, created_at FROM lore_catalog WHERE id = ?",
+                (parent_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "title": row[1], "category": row[2], "world_id": row[3], "created_at": row[4] or None}
+
+    def get_world_version(self, world_id: str) -> int:
+        """Return the write counter of a world (0 if it has never been written)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM lore_world_versions WHERE world_id = ?", (world_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def count_world_chunks(self, world_id: str, cap: int = None) -> int:
+        """Count the chunks stored for a world, stopping early once `cap` is exceeded"""
+        sql = ("SELECT 1 FROM lore_chunks c JOIN lore_catalog e ON e.id = c.parent_id "
+               "WHERE e.world_id = ?")
+        params: List[Any] = [world_id]
+        if cap is not None:
+            sql += " LIMIT ?"
+            params.append(cap + 1)
+        with self._lock:
+            row = self._conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()
+        return int(row[0])
+
+    def count_entries(self, world_id: str = None, category: str = None) -> int:
+        """Count top-level entries from the maintained counts table"""
+        clauses = []
+        params: List[Any] = []
+        if world_id:
+            clauses.append("world_id = ?")
+            params.append(world_id)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        
+        sql = "SELECT COALESCE(SUM(n), 0) FROM lore_counts"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return int(row[0])
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Return a value from the metadata table"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM lore_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_collection_epoch(self) -> int:
+        """Counter bumped by every collection cutover"""
+        return int(self.get_meta("collection_epoch") or 0)
+
+    def get_physical_collection(self, logical: str) -> Optional[str]:
+        """Return the collection currently serving a logical collection, if it was ever switched"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT physical FROM lore_collections WHERE logical = ?", (logical,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def cutover(self, physical_by_logical: Dict[str, str], embedding_model: str):
+        """
+        Switch logical collections to new physical ones and record the new model
+
+        Runs as one transaction, so readers see either the old or the new
+        mapping; the epoch bump tells other processes to reopen their handles.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO lore_collections (logical, physical, embedding_model) VALUES (?, ?, ?) "
+                "ON CONFLICT(logical) DO UPDATE SET physical = excluded.physical, "
+                "embedding_model = excluded.embedding_model",
+                [(logical, physical, embedding_model) for logical, physical in physical_by_logical.items()]
+            )
+            self._conn.execute(
+                "INSERT INTO lore_meta (key, value) VALUES ('embedding_model', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (embedding_model,)
+            )
+            self._conn.execute(
+                "INSERT INTO lore_meta (key, value) VALUES ('collection_epoch', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+
+    def save_reindex_job(self, job: Dict[str, Any]):
+        """Insert or update a re-index job row"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO reindex_jobs (job_id, target_model, status, total_chunks, done_chunks, error, "
+                "started_at, updated_at) VALUES (:job_id, :target_model, :status, :total_chunks, :done_chunks, "
+                ":error, :started_at, :updated_at) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, total_chunks = excluded.total_chunks, "
+                "done_chunks = excluded.done_chunks, error = excluded.error, updated_at = excluded.updated_at",
+                {key: job.get(key) for key in ("job_id", "target_model", "status", "total_chunks",
+                                                "done_chunks", "error", "started_at", "updated_at")}
+            )
+
+    def get_reindex_job(self, job_id: str = None) -> Optional[Dict[str, Any]]:
+        """Return a re-index job (the most recently started one if job_id is None)"""
+        sql = ("SELECT job_id, target_model, status, total_chunks, done_chunks, error, started_at, updated_at "
+               "FROM reindex_jobs")
+        params: List[Any] = []
+        if job_id:
+            sql += " WHERE job_id = ?"
+            params.append(job_id)
+        sql += " ORDER BY started_at DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        if not row:
+            return None
+        keys = ("job_id", "target_model", "status", "total_chunks", "done_chunks", "error", "started_at", "updated_at")
+        return dict(zip(keys, row))
+
+    def get_reindex_progress(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """Per-logical-collection progress of a re-index job"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT logical, physical, next_offset, copied FROM reindex_progress WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {row[0]: {"physical": row[1], "next_offset": row[2], "copied": row[3]} for row in rows}
+
+    def save_reindex_progress(self, job_id: str, logical: str, physical: str, next_offset: int, copied: int):
+        """Record how far a re-index job got in one logical collection"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO reindex_progress (job_id, logical, physical, next_offset, copied) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id, logical) DO UPDATE SET physical = excluded.physical, "
+                "next_offset = excluded.next_offset, copied = excluded.copied",
+                (job_id, logical, physical, next_offset, copied)
+            )
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def encode_cursor(entry: Dict[str, Any]) -> str:
+    """Build an opaque keyset cursor pointing just after the given catalog row"""
+    raw = json.dumps([entry.get("created_at") or "", entry["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by encode_cursor() into (created_at, id)"""
+    try:
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return created_at, entry_id
+    except Exception:
+        raise ValueError(f"Invalid pagination cursor: {cursor}")
@@ -0,0 +1,375 @@
+import os
+import json
+import struct
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import List, Dict, Any, Iterator, Tuple
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"LORESNAP"
+SNAPSHOT_VERSION = 1
+
+# Sections start on 64-byte boundaries so columns can be memory-mapped directly
+_ALIGNMENT = 64
+
+# Footer: manifest offset, manifest length, magic
+_FOOTER = struct.Struct("<QQ8s")
+
+class SnapshotError(ValueError):
+    """A snapshot file is malformed, corrupted or incompatible"""
+    pass
+
+class _SectionWriter:
+    """Appends aligned, checksummed sections to a snapshot file"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sections: Dict[str, Dict[str, Any]] = {}
+
+    def _align(self):
+        padding = (-self.f.tell()) % _ALIGNMENT
+        if padding:
+            self.f.write(b"\0" * padding)
+
+    def begin(self, name: str, dtype: str, shape: Tuple[int, ...] = None):
+        self._align()
+        self.sections[name] = {"offset": self.f.tell(), "length": 0, "dtype": dtype, "shape": list(shape or []),
+                               "_sha": hashlib.sha256()}
+
+    def write(self, name: str, data: bytes):
+        section = self.sections[name]
+        self.f.write(data)
+        section["length"] += len(data)
+        section["_sha"].update(data)
+
+    def end(self, name: str, shape: Tuple[int, ...] = None):
+        section = self.sections[name]
+        section["sha256"] = section.pop("_sha").hexdigest()
+        if shape is not None:
+            section["shape"] = list(shape)
+
+    def copy_from(self, name: str, dtype: str, source, shape: Tuple[int, ...] = None):
+        """Add a section with the contents of a spooled file object"""
+        self.begin(name, dtype, shape)
+        source.seek(0)
+        while True:
+            block = source.read(1 << 20)
+            if not block:
+                break
+            self.write(name, block)
+        self.end(name)
+
+
+class _StringColumn:
+    """Variable-length UTF-8 column spooled to a temporary file: blob plus row offsets"""
+
+    def __init__(self, directory: str):
+        self.blob = tempfile.TemporaryFile(dir=directory)
+        self.offsets = [0]
+
+    def append(self, value: str):
+        encoded = value.encode("utf-8")
+        self.blob.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+    def close(self):
+        self.blob.close()
+
+
+def _collection_space(collection) -> str:
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+def _snapshot_collections(vdb, world_id: str = None) -> List[Any]:
+    """Collections holding one world, or all lore"""
+    if world_id:
+        return [vdb._collection_for(world_id)]
+    return [collection for _, collection in vdb._all_collections()]
+
+def iter_snapshot_rows(vdb, world_id: str = None, batch_size: int = 1000) -> Iterator[Dict[str, List[Any]]]:
+    """Yield batches of stored rows (ids, documents, metadatas, embeddings) of one world or all lore"""
+    for collection in _snapshot_collections(vdb, world_id):
+        offset = 0
+        where = {"world_id": world_id} if world_id else None
+        while True:
+            batch = collection.get(
+                where=where,
+                limit=batch_size,
+                offset=offset,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            if not batch["ids"]:
+                break
+            offset += len(batch["ids"])
+            yield batch
+
+
+def write_snapshot(vdb, path: str, world_id: str = None, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Write lore, including its vectors, to a binary snapshot file
+
+    Layout: magic and version, then aligned sections (float32 vectors; ids,
+    documents and JSON metadata as UTF-8 blobs with uint64 row offsets), then
+    the JSON manifest describing each section with its SHA-256, then a
+    fixed-size footer pointing at the manifest.
+
+    Args:
+        vdb: CanonVDB to snapshot
+        path: Output file
+        world_id: Only snapshot this world (all lore if None)
+        batch_size: Rows read from the collection per request
+
+    Returns:
+        The manifest
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    columns = {name: _StringColumn(directory) for name in ("ids", "documents", "metadatas")}
+    rows = 0
+    dim = None
+    worlds = set()
+
+    # Distance space of the collections being snapshotted (not the legacy collection)
+    spaces = {_collection_space(collection) for collection in _snapshot_collections(vdb, world_id)}
+    if len(spaces) > 1:
+        raise SnapshotError(f"Collections use different distance spaces ({', '.join(sorted(spaces))})")
+    space = spaces.pop() if spaces else "l2"
+
+    try:
+        with open(path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack("<I", SNAPSHOT_VERSION))
+            writer = _SectionWriter(f)
+            writer.begin("vectors", "float32")
+
+            # Vectors go straight into the file; string columns are spooled and appended after
+            for batch in iter_snapshot_rows(vdb, world_id, batch_size):
+                vectors = np.ascontiguousarray(np.asarray(batch["embeddings"], dtype=np.float32))
+                if dim is None:
+                    dim = int(vectors.shape[1])
+                elif vectors.shape[1] != dim:
+                    raise SnapshotError(f"Mixed vector dimensions ({dim} and {vectors.shape[1]})")
+                writer.write("vectors", vectors.tobytes())
+
+                for chunk_id, document, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                    columns["ids"].append(chunk_id)
+                    columns["documents"].append(document or "")
+                    columns["metadatas"].append(json.dumps(metadata or {}, separators=(",", ":")))
+                    worlds.add((metadata or {}).get("world_id", "default"))
+                rows += len(batch["ids"])
+            writer.end("vectors", shape=(rows, dim or 0))
+
+            for name, column in columns.items():
+                writer.copy_from(f"{name}.data", "utf-8", column.blob)
+                offsets = np.asarray(column.offsets, dtype=np.uint64)
+                writer.begin(f"{name}.offsets", "uint64", offsets.shape)
+                writer.write(f"{name}.offsets", offsets.tobytes())
+                writer.end(f"{name}.offsets")
+
+            manifest = {
+                "format": "mememorph-lore-snapshot",
+                "version": SNAPSHOT_VERSION,
+                "created_at": datetime.now().isoformat(),
+                "world_id": world_id,
+                "worlds": sorted(worlds),
+                "rows": rows,
+                "dim": dim or 0,
+                "embedding_model": vdb.embedder.model_version,
+                "space": space,
+                "sections": writer.sections
+            }
+            encoded = json.dumps(manifest, indent=2).encode("utf-8")
+            manifest_offset = f.tell()
+            f.write(encoded)
+            f.write(_FOOTER.pack(manifest_offset, len(encoded), SNAPSHOT_MAGIC))
+    except Exception:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    finally:
+        for column in columns.values():
+            column.close()
+
+    logger.info(f"Wrote snapshot of {rows} chunks to {path}")
+    return manifest
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            header = f.read(len(SNAPSHOT_MAGIC) + 4)
+            if size < len(header) + _FOOTER.size or header[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise SnapshotError("Not a lore snapshot")
+            version = struct.unpack("<I", header[len(SNAPSHOT_MAGIC):])[0]
+            if version > SNAPSHOT_VERSION:
+                raise SnapshotError(f"Unsupported snapshot version {version}")
+
+            f.seek(size - _FOOTER.size)
+            manifest_offset, manifest_length, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != SNAPSHOT_MAGIC or manifest_offset + manifest_length > size:
+                raise SnapshotError("Snapshot is truncated")
+            f.seek(manifest_offset)
+            self.manifest = json.loads(f.read(manifest_length).decode("utf-8"))
+
+        self.rows = int(self.manifest["rows"])
+        self.dim = int(self.manifest["dim"])
+        self._offsets = {name: self._array(f"{name}.offsets", np.uint64) for name in ("ids", "documents", "metadatas")}
+        self.vectors = self._array("vectors", np.float32).reshape(self.rows, self.dim) if self.rows else \
+            np.zeros((0, self.dim), dtype=np.float32)
+
+    def _section(self, name: str) -> Dict[str, Any]:
+        try:
+            return self.manifest["sections"][name]
+        except KeyError:
+            raise SnapshotError(f"Snapshot has no {name} section")
+
+    def _array(self, name: str, dtype) -> np.ndarray:
+        section = self._section(name)
+        count = section["length"] // np.dtype(dtype).itemsize
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=section["offset"], shape=(count,))
+
+    def verify(self):
+        """Check every section against its SHA-256 from the manifest"""
+        with open(self.path, "rb") as f:
+            for name, section in self.manifest["sections"].items():
+                f.seek(section["offset"])
+                digest = hashlib.sha256()
+                remaining = section["length"]
+                while remaining:
+                    block = f.read(min(remaining, 1 << 20))
+                    if not block:
+                        raise SnapshotError(f"Section {name} is truncated")
+                    digest.update(block)
+                    remaining -= len(block)
+                if digest.hexdigest() != section["sha256"]:
+                    raise SnapshotError(f"Checksum mismatch in section {name}")
+
+    def strings(self, column: str, start: int, stop: int) -> List[str]:
+        """Decode rows start..stop of a string column"""
+        offsets = self._offsets[column]
+        section = self._section(f"{column}.data")
+        begin, end = int(offsets[start]), int(offsets[stop])
+        with open(self.path, "rb") as f:
+            f.seek(section["offset"] + begin)
+            blob = f.read(end - begin)
+        return [blob[int(offsets[i]) - begin:int(offsets[i + 1]) - begin].decode("utf-8") for i in range(start, stop)]
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield batches of rows in the collection's upsert shape"""
+        for start in range(0, self.rows, batch_size):
+            stop = min(start + batch_size, self.rows)
+            yield {
+                "ids": self.strings("ids", start, stop),
+                "documents": self.strings("documents", start, stop),
+                "metadatas": [json.loads(m) for m in self.strings("metadatas", start, stop)],
+                "embeddings": np.asarray(self.vectors[start:stop])
+            }
+
+
+def _clear_restored_entries(vdb, snapshot: Snapshot, batch_size: int):
+    """
+    Drop the chunk rows of entries the snapshot restores, so chunks an entry
+    no longer has (or has in another world) don't linger next to the restored ones
+    """
+    from canon_vdb import chunk_parent_id
+
+    restored: Dict[str, Tuple[str, set]] = {}
+    for start in range(0, snapshot.rows, batch_size):
+        stop = min(start + batch_size, snapshot.rows)
+        ids = snapshot.strings("ids", start, stop)
+        metadatas = [json.loads(m) for m in snapshot.strings("metadatas", start, stop)]
+        for chunk_id, metadata in zip(ids, metadatas):
+            world_id, chunk_ids = restored.setdefault(
+                chunk_parent_id(chunk_id, metadata), (metadata.get("world_id", "default"), set())
+            )
+            chunk_ids.add(chunk_id)
+
+    existing = vdb.index.get_chunk_ids_many(list(restored))
+    for parent_id, old_ids in existing.items():
+        if not old_ids:
+            continue
+        world_id, new_ids = restored[parent_id]
+        entry = vdb.index.get_entry(parent_id)
+        moving = vdb.sharding == "world" and entry is not None and entry["world_id"] != world_id
+        stale_ids = [chunk_id for chunk_id in old_ids if moving or chunk_id not in new_ids]
+        collection = vdb._collection_for_entry(parent_id)
+        if stale_ids and collection is not None:
+            collection.delete(ids=stale_ids)
+        if moving:
+            vdb.numpy_backend.invalidate(entry["world_id"])
+        vdb.index.remove_entry(parent_id)
+        vdb.lexical_index.remove_entry(parent_id)
+
+
+def restore_snapshot(vdb, path: str, verify: bool = True, batch_size: int = 1000) -> int:
+    """
+    Bulk-load a snapshot into a CanonVDB, using the stored vectors as-is
+
+    Args:
+        vdb: CanonVDB to restore into
+        path: Snapshot file
+        verify: Check section checksums before loading
+        batch_size: Rows written per upsert
+
+    Returns:
+        The number of restored chunks
+    """
+    from canon_vdb import content_hash
+
+    snapshot = Snapshot(path)
+    if verify:
+        snapshot.verify()
+
+    model = snapshot.manifest.get("embedding_model")
+    if model != vdb.embedder.model_version:
+        raise SnapshotError(
+            f"Snapshot was embedded with {model}, but this store uses {vdb.embedder.model_version}"
+        )
+
+    for world_id in snapshot.manifest.get("worlds", []):
+        space = _collection_space(vdb._collection_for(world_id))
+        if snapshot.manifest.get("space", "l2") != space:
+            logger.warning(f"Snapshot was taken from a {snapshot.manifest.get('space')} index; "
+                           f"restoring world {world_id} into {space}")
+
+    _clear_restored_entries(vdb, snapshot, batch_size)
+
+    restored = 0
+    for batch in snapshot.iter_batches(batch_size):
+        # Group by world so each shard gets one bulk upsert
+        by_world: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(batch["metadatas"]):
+            by_world.setdefault(metadata.get("world_id", "default"), []).append(i)
+
+        for world_id, rows in by_world.items():
+            vdb._collection_for(world_id).upsert(
+                ids=[batch["ids"][i] for i in rows],
+                documents=[batch["documents"][i] for i in rows],
+                embeddings=batch["embeddings"][rows].tolist(),
+                metadatas=[batch["metadatas"][i] for i in rows]
+            )
+        vdb._index_rows(batch["ids"], batch["metadatas"])
+        vdb.lexical_index.add_rows(batch["ids"], batch["documents"], batch["metadatas"])
+
+        # Seed the embedding cache so later edits and reranking don't re-embed restored text
+        vdb.embedding_cache.put_many({
+            content_hash(document): vector
+            for document, vector in zip(batch["documents"], batch["embeddings"].tolist())
+            if document
+        })
+
+        restored += len(batch["ids"])
+        logger.info(f"Restored {restored}/{snapshot.rows} chunks from {path}")
+
+    for world_id in snapshot.manifest.get("worlds", []):
+        vdb.numpy_backend.invalidate(world_id)
+    return restored
@@ -0,0 +1,170 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from database import Database, PROMPT_FIELDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PromptCache:
+    """
+    PromptCache - read-through, in-memory copy of the prompts collection
+
+    Prompts are few and read on every page load, so the whole collection is
+    held in memory, together with the serialized /api/prompts body and its
+    ETag. The copy is reloaded when it goes stale:
+
+    - where MongoDB offers change streams (replica sets), a watcher thread
+      marks the copy stale as soon as any writer changes a prompt
+    - otherwise (or while the stream is down) the prompts version counter,
+      which Database bumps on every prompt write, is polled at most every
+      poll_interval seconds
+
+    If a reload fails the previous copy keeps being served.
+    """
+
+    def __init__(self, repository=None, poll_interval: float = 5.0, use_change_stream: bool = True):
+        """
+        Args:
+            repository: Prompt repository (defaults to the Database singleton)
+            poll_interval: Seconds between version checks when no change stream is running
+            use_change_stream: Watch the prompts collection for changes if the server supports it
+        """
+        self._repository = repository
+        self.poll_interval = poll_interval
+        self.use_change_stream = use_change_stream
+
+        self._lock = threading.Lock()
+        self._prompts: Optional[List[Dict[str, Any]]] = None
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._body = b""
+        self._etag = ""
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._watching = False
+        self._watcher_pid = None
+        self._stats = {"hits": 0, "reloads": 0, "reload_errors": 0}
+
+    @property
+    def repository(self):
+        if self._repository is None:
+            self._repository = Database()
+        return self._repository
+
+    def _start_watcher(self):
+        # Threads don't survive a fork; each worker runs its own watcher
+        if not self.use_change_stream or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch_changes, name="prompt-change-stream", daemon=True).start()
+
+    def _watch_changes(self):
+        try:
+            with self.repository.watch_prompts() as stream:
+                self._watching = True
+                # Changes made before the stream opened are not in it
+                self._stale = True
+                for _ in stream:
+                    self._stale = True
+        except Exception as e:
+            logger.info(f"No prompt change stream ({str(e)}); polling the prompts version every "
+                        f"{self.poll_interval}s")
+        finally:
+            if self._watching:
+                # The stream broke after working; open a new one on the next read
+                self._watcher_pid = None
+            self._watching = False
+            self._stale = True
+
+    def _ensure_fresh(self):
+        """Reload the prompts if they changed (called with the lock held)"""
+        self._start_watcher()
+        now = time.monotonic()
+        if not self._stale and (self._watching or now - self._checked_at < self.poll_interval):
+            self._stats["hits"] += 1
+            return
+
+        # Clear the flag first, so a change during the reload triggers another one
+        changed, self._stale = self._stale, False
+        try:
+            version = self.repository.get_prompts_version()
+            if changed or self._prompts is None or version != self._version:
+                self._load(self.repository.get_all_prompts(projection=PROMPT_FIELDS), version)
+            self._checked_at = now
+        except Exception as e:
+            self._stale = True
+            self._stats["reload_errors"] += 1
+            if self._prompts is None:
+                raise
+            logger.warning(f"Could not reload prompts, serving the cached copy: {str(e)}")
+
+    def _load(self, prompts: List[Dict[str, Any]], version):
+        self._prompts = prompts
+        self._by_id = {prompt["_id"]: prompt for prompt in prompts}
+        self._by_name = {prompt.get("name"): prompt for prompt in prompts}
+        public = [{**{k: v for k, v in prompt.items() if k != "_id"}, "id": prompt["_id"]} for prompt in prompts]
+        self._body = json.dumps({"prompts": public}, default=str).encode("utf-8")
+        self._etag = hashlib.sha256(self._body).hexdigest()[:32]
+        self._version = version
+        self._stats["reloads"] += 1
+        logger.info(f"Loaded {len(prompts)} prompts (version {version})")
+
+    def public_response(self) -> Tuple[bytes, str]:
+        """The /api/prompts JSON body and its ETag"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._body, self._etag
+
+    def get_all(self) -> List[Dict[str, Any]]:
+        """All prompts sorted by name (copies the caller may modify)"""
+        with self._lock:
+            self._ensure_fresh()
+            return copy.deepcopy(self._prompts)
+
+    def get_by_id(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """A prompt by ID, or None"""
+        with self._lock:
+            self._ensure_fresh()
+            return copy.deepcopy(self._by_id.get(prompt_id))
+
+    def get_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """A prompt by name, or None"""
+        with self._lock:
+            self._ensure_fresh()
+            return copy.deepcopy(self._by_name.get(name))
+
+    def invalidate(self):
+        """Reload on the next read (call after writing prompts in this process)"""
+        self._stale = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and reload counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["prompts"] = len(self._prompts) if self._prompts is not None else None
+            stats["version"] = self._version
+            stats["change_stream"] = self._watching
+        return stats
+
+
+_cache: Optional[PromptCache] = None
+_cache_lock = threading.Lock()
+
+def get_prompt_cache() -> PromptCache:
+    """Process-wide prompt cache configured from PROMPT_CACHE_POLL and PROMPT_CACHE_CHANGE_STREAM"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PromptCache(
+                poll_interval=float(os.getenv('PROMPT_CACHE_POLL', 5)),
+                use_change_stream=os.getenv('PROMPT_CACHE_CHANGE_STREAM', '1') != '0'
+            )
+        return _cache
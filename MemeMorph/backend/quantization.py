@@ -0,0 +1,139 @@
+import json
+import argparse
+import logging
+from typing import List, Dict, Any
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+class QuantizedMatrix:
+    """
+    Compact copy of a matrix of unit vectors used for candidate scoring
+
+    - float16: half-precision copy (2 bytes per dimension)
+    - int8: per-vector scaled int8 (1 byte per dimension + one float32 scale per row)
+
+    Scores are approximate cosine similarities; callers rerank the best
+    candidates against the float32 vectors.
+    """
+
+    def __init__(self, unit_vectors: np.ndarray, mode: str):
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.mode = mode
+        unit_vectors = np.asarray(unit_vectors, dtype=np.float32)
+
+        if mode == "float16":
+            self.data = np.ascontiguousarray(unit_vectors.astype(np.float16))
+            self.scales = None
+        else:
+            max_abs = np.abs(unit_vectors).max(axis=1) if len(unit_vectors) else np.zeros(0, dtype=np.float32)
+            self.scales = (np.maximum(max_abs, 1e-12) / 127.0).astype(np.float32)
+            self.data = np.ascontiguousarray(
+                np.clip(np.rint(unit_vectors / self.scales[:, None]), -127, 127).astype(np.int8)
+            )
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the quantized representation"""
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, unit_query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Approximate cosine similarity of the query to the given rows (all rows if None)"""
+        data = self.data if rows is None else self.data[rows]
+        if self.mode == "float16":
+            return data.astype(np.float32) @ unit_query.astype(np.float32)
+        scales = self.scales if rows is None else self.scales[rows]
+        return (data.astype(np.float32) @ unit_query.astype(np.float32)) * scales
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def recall_report(vectors: np.ndarray,
+                  queries: np.ndarray,
+                  k: int = 5,
+                  modes: List[str] = ("float16", "int8"),
+                  rerank_factors: List[int] = (1, 2, 4, 8)) -> Dict[str, Any]:
+    """
+    Measure recall@k and memory of quantized scoring against exact float32 search
+
+    Args:
+        vectors: Document vectors (n x d)
+        queries: Query vectors (q x d)
+        k: Number of results per query
+        modes: Quantization modes to evaluate
+        rerank_factors: Candidate pool sizes (as multiples of k) reranked in float32
+
+    Returns:
+        Report dict with one row per (mode, rerank_factor)
+    """
+    unit = _unit(vectors)
+    unit_queries = _unit(queries)
+    k = min(k, len(unit))
+
+    exact = np.argsort(-(unit_queries @ unit.T), axis=1)[:, :k]
+    report = {
+        "n_vectors": int(len(unit)),
+        "dim": int(unit.shape[1]) if unit.ndim == 2 else 0,
+        "n_queries": int(len(unit_queries)),
+        "k": int(k),
+        "float32_bytes": int(unit.nbytes),
+        "results": []
+    }
+
+    for mode in modes:
+        matrix = QuantizedMatrix(unit, mode)
+        for factor in rerank_factors:
+            pool = min(len(unit), k * factor)
+            hits = 0
+            for qi, query in enumerate(unit_queries):
+                approx = matrix.scores(query)
+                candidates = np.argpartition(-approx, pool - 1)[:pool]
+                # Rerank the candidate pool with the float32 vectors
+                exact_scores = unit[candidates] @ query
+                top = candidates[np.argsort(-exact_scores)[:k]]
+                hits += len(set(top.tolist()) & set(exact[qi].tolist()))
+            report["results"].append({
+                "mode": mode,
+                "rerank_factor": factor,
+                "recall_at_k": hits / float(len(unit_queries) * k) if len(unit_queries) else 1.0,
+                "bytes": int(matrix.nbytes),
+                "compression": unit.nbytes / float(max(matrix.nbytes, 1))
+            })
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs memory report for quantized CanonVDB vectors")
+    parser.add_argument("--world-id", help="Evaluate on the stored vectors of this world")
+    parser.add_argument("--synthetic", type=int, default=2000, help="Number of random vectors if no world is given")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.world_id:
+        from canon_vdb import CanonVDB
+        vdb = CanonVDB()
+        data = vdb._collection_for(args.world_id).get(where={"world_id": args.world_id}, include=["embeddings"])
+        doc_vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        # Use perturbed stored vectors as queries
+        picks = rng.choice(len(doc_vectors), size=min(args.queries, len(doc_vectors)), replace=False)
+        query_vectors = doc_vectors[picks] + rng.normal(scale=0.05, size=(len(picks), doc_vectors.shape[1]))
+    else:
+        doc_vectors = rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+        query_vectors = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    print(json.dumps(recall_report(doc_vectors, query_vectors, k=args.k), indent=2))
@@ -0,0 +1,284 @@
+import time
+import hashlib
+import argparse
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from embedding_cache import EmbeddingCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# One job per process; re-index jobs are keyed by their target model
+_running_jobs: Dict[str, "ReindexJob"] = {}
+_running_lock = threading.Lock()
+
+def shadow_collection_name(logical: str, model_version: str) -> str:
+    """Physical collection holding a logical collection's lore embedded with model_version"""
+    digest = hashlib.sha1(model_version.encode("utf-8")).hexdigest()[:8]
+    return f"{logical}-{digest}"
+
+class ReindexJob:
+    """
+    Re-embeds all lore with another model without interrupting reads
+
+    1. copy: every logical collection is re-embedded into a shadow collection
+       in throttled batches; progress is saved after each batch, so a job
+       started again for the same model resumes where it stopped
+    2. sync: writes made while copying are caught up by diffing the live
+       collections against their shadows until a pass finds nothing to do
+    3. cutover: the lore index switches every logical collection and the
+       active model in one transaction; CanonVDB instances (in any process)
+       reopen their collections and model within a second
+    4. catch-up: after a grace period, rows written to the old collections by
+       processes that had not switched yet are copied over
+
+    Searches are served from the old collections until the cutover. The old
+    collections are kept afterwards and can be deleted once no longer needed.
+    """
+
+    def __init__(self,
+                 vdb,
+                 target_model: str,
+                 batch_size: int = 100,
+                 max_rate: float = 0.0,
+                 max_sync_passes: int = 3,
+                 grace_seconds: float = 2.0):
+        """
+        Args:
+            vdb: The CanonVDB to re-index
+            target_model: Sentence-transformer model to switch to
+            batch_size: Chunks embedded and written per batch
+            max_rate: Maximum chunks per second (0 for no throttling)
+            max_sync_passes: Catch-up passes before cutting over regardless
+            grace_seconds: Wait after cutover before copying late writes
+        """
+        from canon_vdb import get_shared_embedder
+
+        self.vdb = vdb
+        self.target_model = target_model
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.max_sync_passes = max_sync_passes
+        self.grace_seconds = grace_seconds
+
+        self.embedder = get_shared_embedder(target_model)
+        self.embedding_cache = EmbeddingCache(vdb.embedding_cache_dir, model_name=self.embedder.model_version)
+        self.job_id = f"reindex-{shadow_collection_name('', self.embedder.model_version)[1:]}"
+
+        self.physical_by_logical: Dict[str, str] = {}
+        self.previous: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        existing = vdb.index.get_reindex_job(self.job_id)
+        resumable = existing and existing["status"] not in ("completed",)
+        now = datetime.now().isoformat()
+        self.state = {
+            "job_id": self.job_id,
+            "target_model": target_model,
+            "status": "pending",
+            "total_chunks": existing["total_chunks"] if resumable else 0,
+            "done_chunks": existing["done_chunks"] if resumable else 0,
+            "error": None,
+            "started_at": existing["started_at"] if resumable else now,
+            "updated_at": now
+        }
+        if resumable:
+            logger.info(f"Resuming re-index job {self.job_id} at {self.state['done_chunks']} chunks")
+
+    def _save(self, **changes):
+        self.state.update(changes, updated_at=datetime.now().isoformat())
+        self.vdb.index.save_reindex_job(self.state)
+
+    def _logicals(self) -> List[Tuple[str, Optional[str], Any]]:
+        """(logical name, world_id, live collection) of every collection not yet on the target model"""
+        from canon_vdb import LEGACY_COLLECTION_NAME, shard_collection_name
+
+        collections = []
+        for world_id, collection in self.vdb._all_collections():
+            logical = shard_collection_name(world_id) if world_id else LEGACY_COLLECTION_NAME
+            if (collection.metadata or {}).get("embedding_model") == self.embedder.model_version:
+                continue
+            collections.append((logical, world_id, collection))
+        return collections
+
+    def _shadow(self, logical: str, source):
+        """Open (or create) the shadow collection for a logical collection"""
+        from canon_vdb import EmbedderFunction
+
+        physical = shadow_collection_name(logical, self.embedder.model_version)
+        self.physical_by_logical[logical] = physical
+        self.previous.setdefault(logical, source.name)
+        return self.vdb.client.get_or_create_collection(
+            name=physical,
+            embedding_function=EmbedderFunction(self.embedder),
+            metadata={**(source.metadata or {}), "embedding_model": self.embedder.model_version}
+        )
+
+    def _write(self, shadow, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Embed rows with the target model and upsert them into the shadow collection"""
+        from canon_vdb import content_hash
+
+        started = time.monotonic()
+        embeddings = self.embedding_cache.embed(
+            documents,
+            [content_hash(document) for document in documents],
+            lambda texts: self.embedder.encode(texts).tolist()
+        )
+        shadow.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+        if self.max_rate > 0:
+            time.sleep(max(0.0, len(ids) / self.max_rate - (time.monotonic() - started)))
+
+    def _copy(self, logical: str, source):
+        """Copy phase for one logical collection, resuming from saved progress"""
+        shadow = self._shadow(logical, source)
+        progress = self.vdb.index.get_reindex_progress(self.job_id).get(logical, {})
+        offset, copied = progress.get("next_offset", 0), progress.get("copied", 0)
+
+        while not self._stop.is_set():
+            batch = source.get(limit=self.batch_size, offset=offset, include=["documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            self._write(shadow, batch["ids"], batch["documents"], batch["metadatas"])
+            offset += len(batch["ids"])
+            copied += len(batch["ids"])
+            self.vdb.index.save_reindex_progress(self.job_id, logical, shadow.name, offset, copied)
+            self._save(done_chunks=self.state["done_chunks"] + len(batch["ids"]))
+
+    def _sync(self, logical: str, source) -> int:
+        """Bring a shadow up to date with its live collection; returns the number of rows fixed"""
+        shadow = self._shadow(logical, source)
+        fixed = 0
+        live_ids = set()
+        offset = 0
+        while not self._stop.is_set():
+            batch = source.get(limit=self.batch_size * 10, offset=offset, include=["documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            offset += len(batch["ids"])
+            live_ids.update(batch["ids"])
+
+            existing = shadow.get(ids=batch["ids"], include=["documents", "metadatas"])
+            have = {i: (d, m) for i, d, m in zip(existing["ids"], existing["documents"], existing["metadatas"])}
+            stale = [n for n, chunk_id in enumerate(batch["ids"])
+                     if have.get(chunk_id) != (batch["documents"][n], batch["metadatas"][n])]
+            for start in range(0, len(stale), self.batch_size):
+                rows = stale[start:start + self.batch_size]
+                self._write(shadow, [batch["ids"][n] for n in rows], [batch["documents"][n] for n in rows],
+                            [batch["metadatas"][n] for n in rows])
+            fixed += len(stale)
+
+        if not self._stop.is_set():
+            removed = [chunk_id for chunk_id in shadow.get(include=[])["ids"] if chunk_id not in live_ids]
+            if removed:
+                shadow.delete(ids=removed)
+            fixed += len(removed)
+        return fixed
+
+    def _catch_up(self):
+        """Copy rows that reached the old collections after the cutover"""
+        for logical, old_name in self.previous.items():
+            old = self.vdb.client.get_collection(name=old_name)
+            new = self.vdb.client.get_collection(name=self.physical_by_logical[logical])
+            old_ids = set(old.get(include=[])["ids"])
+            new_ids = set(new.get(include=[])["ids"])
+
+            missing = sorted(old_ids - new_ids)
+            for start in range(0, len(missing), self.batch_size):
+                rows = old.get(ids=missing[start:start + self.batch_size], include=["documents", "metadatas"])
+                self._write(new, rows["ids"], rows["documents"], rows["metadatas"])
+
+            # Deleted through the old collection after the cutover
+            gone = [chunk_id for chunk_id in new_ids - old_ids if self.vdb.index.get_parent_id(chunk_id) is None]
+            if gone:
+                new.delete(ids=gone)
+
+    def run(self) -> Dict[str, Any]:
+        """Run the job to completion (or until stop() is called)"""
+        if self.vdb.embedder.model_version == self.embedder.model_version:
+            raise ValueError(f"Lore is already embedded with {self.embedder.model_version}")
+
+        try:
+            collections = self._logicals()
+            if not self.state["total_chunks"]:
+                self.state["total_chunks"] = sum(collection.count() for _, _, collection in collections)
+            self._save(status="copying")
+            for logical, _, collection in collections:
+                self._copy(logical, collection)
+
+            self._save(status="syncing")
+            for sync_pass in range(self.max_sync_passes):
+                fixed = sum(self._sync(logical, collection) for logical, _, collection in self._logicals())
+                logger.info(f"Re-index sync pass {sync_pass + 1}: {fixed} rows caught up")
+                if fixed == 0 or self._stop.is_set():
+                    break
+
+            if self._stop.is_set():
+                self._save(status="stopped")
+                return self.state
+
+            self._save(status="cutover")
+            self.vdb.index.cutover(self.physical_by_logical, self.target_model)
+            self.vdb._epoch_checked_at = 0.0
+            self.vdb._refresh_after_cutover()
+            logger.info(f"Cut over {len(self.physical_by_logical)} collections to {self.embedder.model_version}")
+
+            time.sleep(self.grace_seconds)
+            self._catch_up()
+            self._save(status="completed", done_chunks=max(self.state["done_chunks"], self.state["total_chunks"]))
+        except Exception as e:
+            logger.error(f"Re-index job {self.job_id} failed: {str(e)}")
+            self._save(status="failed", error=str(e))
+            raise
+        return self.state
+
+    def start(self) -> "ReindexJob":
+        """Run the job in a background thread"""
+        with _running_lock:
+            running = _running_jobs.get(self.job_id)
+            if running is not None and running._thread is not None and running._thread.is_alive():
+                return running
+            _running_jobs[self.job_id] = self
+
+        def target():
+            try:
+                self.run()
+            except Exception:
+                pass  # recorded in the job row
+            finally:
+                with _running_lock:
+                    _running_jobs.pop(self.job_id, None)
+
+        self._save(status="pending")
+        self._thread = threading.Thread(target=target, name=self.job_id, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Ask the job to stop after the current batch; it can be resumed later"""
+        self._stop.set()
+
+def stop_running_jobs():
+    """Stop every re-index job running in this process"""
+    with _running_lock:
+        for job in _running_jobs.values():
+            job.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed CanonVDB lore with another model")
+    parser.add_argument("model", help="Sentence-transformer model to switch to")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-rate", type=float, default=0.0, help="Maximum chunks per second (0 = unthrottled)")
+    args = parser.parse_args()
+
+    from canon_vdb import CanonVDB
+    job = ReindexJob(CanonVDB(), args.model, batch_size=args.batch_size, max_rate=args.max_rate)
+    try:
+        print(job.run())
+    except KeyboardInterrupt:
+        job.stop()
+        print("Stopped; run the same command again to resume")
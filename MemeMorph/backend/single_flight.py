@@ -0,0 +1,276 @@
+import os
+import json
+import copy
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within the process
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Lock and result files older than this are removed when results are written
+_RESULT_MAX_AGE = 60.0
+
+def request_key(namespace: str, **params) -> str:
+    """
+    Canonical hash of a request: identical parameters give the same key
+    regardless of argument order
+    """
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{namespace}:{encoded}".encode("utf-8")).hexdigest()
+
+def canonical_text(text: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of free text used in request keys"""
+    return " ".join((text or "").split()).casefold()
+
+
+class _Call:
+    """One in-flight execution that other threads can wait on"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    SingleFlight - share one execution between identical concurrent calls
+
+    The first call for a key runs the function; calls for the same key that
+    arrive while it runs wait for it and get a copy of its result (or its
+    exception). Nothing is kept once the call finishes, so this coalesces
+    in-flight work only and never serves stale results.
+
+    With a lock directory, workers on the same host coalesce too: the
+    worker holding a key's lock file runs the call and leaves its
+    (JSON-serializable) result in a result file, which workers that were
+    waiting on the lock pick up instead of running the call again. Each
+    key has its own lock file, so unrelated calls never wait on each other
+    (and a call may start a nested one while holding its own lock).
+    """
+
+    def __init__(self, lock_dir: str = None, wait_timeout: float = 60.0):
+        """
+        Args:
+            lock_dir: Directory for cross-worker lock and result files (None to coalesce within the process only)
+            wait_timeout: Seconds to wait for another execution before running the call independently
+        """
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.wait_timeout = wait_timeout
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._writes = 0
+        self._stats = {"calls": 0, "executions": 0, "shared": 0, "shared_across_workers": 0, "timeouts": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn, or wait for an identical in-flight call and return its result
+
+        Args:
+            key: Canonical request key (see request_key)
+            fn: Function computing the result
+
+        Returns:
+            The result of fn; waiting callers get their own deep copy
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                logger.warning(f"Timed out waiting for in-flight call {key[:12]}; running it independently")
+                self._count("timeouts")
+                return self._execute(key, fn)
+            if call.error is not None:
+                raise call.error
+            self._count("shared")
+            return copy.deepcopy(call.result)
+
+        try:
+            result = self._execute(key, fn)
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            # Waiters copy from a snapshot so the leader's caller can mutate its result freely
+            call.result = copy.deepcopy(result) if waiters else None
+            return result
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.error = e
+            raise
+        finally:
+            call.done.set()
+
+    def _execute(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.lock_dir:
+            self._count("executions")
+            return fn()
+        return self._execute_shared(key, fn)
+
+    def _execute_shared(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn under the key's lock file, or take the result of the worker holding it"""
+        result_path = os.path.join(self.lock_dir, f"{key}.json")
+        lock_path = os.path.join(self.lock_dir, f"{key}.lock")
+        arrived = time.time()
+
+        fd, locked, waited = self._lock_file(lock_path)
+        try:
+            if waited:
+                if locked:
+                    # Another worker ran this while we waited
+                    found, result = self._read_result(result_path, arrived)
+                    if found:
+                        self._count("shared_across_workers")
+                        return result
+                else:
+                    logger.warning(f"Timed out waiting for call {key[:12]} in another worker; running it independently")
+                    self._count("timeouts")
+
+            self._count("executions")
+            result = fn()
+            if locked:
+                self._write_result(result_path, result)
+            return result
+        finally:
+            if locked:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _lock_file(self, lock_path: str):
+        """
+        Open and lock a key's lock file
+
+        Returns:
+            (fd, locked, waited): waited is True if another worker held the lock
+        """
+        waited = False
+        while True:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+            locked = self._try_lock(fd)
+            if not locked:
+                waited = True
+                locked = self._wait_lock(fd)
+            if not locked:
+                return fd, False, waited
+            # The file may have been pruned while we waited; lock the current one instead
+            try:
+                if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                    return fd, True, waited
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @staticmethod
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _wait_lock(self, fd: int) -> bool:
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            if self._try_lock(fd):
+                return True
+            delay = min(delay * 2, 0.1)
+        return False
+
+    @staticmethod
+    def _read_result(path: str, arrived: float):
+        """A result written after `arrived`, i.e. by a call that was in flight when we arrived"""
+        try:
+            if os.stat(path).st_mtime < arrived:
+                return False, None
+            with open(path, "r", encoding="utf-8") as f:
+                return True, json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            return False, None
+
+    def _write_result(self, path: str, result: Any):
+        try:
+            encoded = json.dumps({"result": result})
+        except (TypeError, ValueError):
+            logger.debug(f"Result for {os.path.basename(path)} is not JSON-serializable; not sharing it")
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._prune_results()
+
+    def _prune_results(self):
+        """Remove result files no waiter can still be interested in, and idle lock files"""
+        cutoff = time.time() - max(_RESULT_MAX_AGE, self.wait_timeout)
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if entry.name.endswith(".json"):
+                    os.unlink(entry.path)
+                elif entry.name.endswith(".lock"):
+                    # Only unlink a lock nobody holds; late openers notice and retry (see _lock_file)
+                    fd = os.open(entry.path, os.O_RDWR)
+                    try:
+                        if self._try_lock(fd):
+                            os.unlink(entry.path)
+                            fcntl.flock(fd, fcntl.LOCK_UN)
+                    finally:
+                        os.close(fd)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Execution and sharing counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["cross_worker"] = bool(self.lock_dir)
+        return stats
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide SingleFlight configured from SINGLE_FLIGHT_DIR and SINGLE_FLIGHT_TIMEOUT"""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight(
+                lock_dir=os.getenv('SINGLE_FLIGHT_DIR') or None,
+                wait_timeout=float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 60))
+            )
+        return _single_flight
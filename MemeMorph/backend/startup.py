@@ -0,0 +1,128 @@
+import os
+import re
+import gc
+import sys
+import json
+import argparse
+import logging
+import subprocess
+from typing import List, Dict, Any
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Line format of `python -X importtime`: "import time: <self us> | <cumulative us> | <indented module>"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Modules imported ahead of forking in preload mode: read-only after import,
+# so workers share their pages with the master
+PRELOAD_MODULES = ("numpy", "PIL.Image", "requests", "web3_config", "canon_vdb")
+
+def import_time_report(module: str = "app", top: int = 20) -> Dict[str, Any]:
+    """
+    Profile the imports triggered by importing a module
+
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+    aggregates the timings.
+
+    Args:
+        module: Module to import (e.g. "app" or "canon_vdb")
+        top: Number of slowest entries to report
+
+    Returns:
+        Report with the module's import time, the slowest top-level packages
+        (cumulative) and the slowest individual modules (self time), in ms
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+
+    modules = []
+    packages: Dict[str, int] = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules.append({"module": name, "self_ms": self_us / 1000.0, "cumulative_ms": cumulative_us / 1000.0})
+
+        # Top-level imports (one space of indentation) carry the whole subtree;
+        # the interpreter's own startup imports (site, encodings) are listed too
+        if len(indent) == 1:
+            if name == module:
+                total_us = cumulative_us
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + cumulative_us
+
+    report = {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "total_ms": total_us / 1000.0,
+        "packages": [
+            {"package": name, "cumulative_ms": us / 1000.0}
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+        "slowest_modules": sorted(modules, key=lambda m: -m["self_ms"])[:top]
+    }
+    if proc.returncode != 0:
+        report["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+    return report
+
+def preload():
+    """
+    Load shared, read-only state in the gunicorn master before workers fork
+
+    Imports the heavy subsystems and loads the embedding model (see
+    canon_vdb.preload), then freezes the garbage collector so the collector in
+    each worker does not touch, and thereby copy, the preloaded objects.
+    Anything holding sockets, connections or threads is left to the workers.
+    """
+    import importlib
+
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Could not preload {name}: {str(e)}")
+
+    try:
+        import canon_vdb
+        canon_vdb.preload()
+    except Exception as e:
+        logger.warning(f"Could not preload the embedding model: {str(e)}")
+
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    logger.info(f"Preloaded shared state in process {os.getpid()}")
+
+def _print_report(report: Dict[str, Any]):
+    """Print an import-time report as a table"""
+    print(f"Importing {report['module']}: {report['total_ms']:.1f} ms" + ("" if report["ok"] else f" (failed: {report['error']})"))
+    print("\nPackages (cumulative):")
+    for row in report["packages"]:
+        print(f"  {row['cumulative_ms']:10.1f} ms  {row['package']}")
+    print("\nModules (self):")
+    for row in report["slowest_modules"]:
+        print(f"  {row['self_ms']:10.1f} ms  {row['module']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MemeMorph backend startup profiling")
+    parser.add_argument("modules", nargs="*", default=["app"], help="Modules to profile (default: app)")
+    parser.add_argument("--top", type=int, default=20, help="Number of entries to list")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    reports: List[Dict[str, Any]] = [import_time_report(m, top=args.top) for m in args.modules]
+    if args.json:
+        print(json.dumps(reports if len(reports) > 1 else reports[0], indent=2))
+    else:
+        for i, report in enumerate(reports):
+            if i:
+                print()
+            _print_report(report)
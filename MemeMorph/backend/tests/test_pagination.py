@@ -0,0 +1,131 @@
+"""
+Keyset pagination of memes, NFTs and transactions
+
+Run from MemeMorph/backend with `python -m pytest tests` (needs pytest and
+mongomock; no MongoDB server is used).
+"""
+import datetime
+import uuid
+import pytest
+from bson import ObjectId
+
+mongomock = pytest.importorskip("mongomock")
+
+import database
+from database import (
+    Database,
+    encode_page_cursor,
+    decode_page_cursor,
+    next_page_cursor,
+    keyset_query
+)
+from init_db import create_indexes
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(database, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(Database, "_instance", None)
+    instance = Database()
+    yield instance
+    monkeypatch.setattr(Database, "_instance", None)
+
+
+def _at(minutes):
+    return datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=minutes)
+
+
+def _pages(fetch, field, limit):
+    """Follow next_page_cursor until the last page"""
+    pages, after = [], None
+    while True:
+        page = fetch(after)
+        pages.append(page)
+        after = next_page_cursor(page, limit, field)
+        if after is None:
+            return pages
+
+
+def test_cursor_round_trip_keeps_types():
+    doc = {"_id": ObjectId(), "created_at": _at(5)}
+    assert decode_page_cursor(encode_page_cursor(doc, "created_at")) == (doc["created_at"], doc["_id"])
+
+    doc = {"_id": str(uuid.uuid4()), "timestamp": _at(7)}
+    assert decode_page_cursor(encode_page_cursor(doc, "timestamp")) == (doc["timestamp"], doc["_id"])
+
+
+def test_cursor_is_opaque_and_url_safe():
+    cursor = encode_page_cursor({"_id": "a/b+c", "created_at": _at(1)}, "created_at")
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+
+def test_invalid_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_page_cursor("not a cursor")
+
+
+def test_next_page_cursor_stops_on_short_page():
+    docs = [{"_id": i, "created_at": _at(i)} for i in range(3)]
+    assert next_page_cursor(docs, 5, "created_at") is None
+    assert next_page_cursor([], 5, "created_at") is None
+    assert decode_page_cursor(next_page_cursor(docs, 3, "created_at")) == (_at(2), 2)
+
+
+def test_keyset_query_breaks_ties_on_id():
+    cursor = encode_page_cursor({"_id": "m2", "created_at": _at(1)}, "created_at")
+    assert keyset_query({"owner_id": "u1"}, "created_at", cursor) == {
+        "owner_id": "u1",
+        "$or": [{"created_at": {"$lt": _at(1)}}, {"created_at": _at(1), "_id": {"$lt": "m2"}}]
+    }
+    assert keyset_query({"owner_id": "u1"}, "created_at") == {"owner_id": "u1"}
+
+
+def test_memes_pages_cover_each_meme_once(db):
+    # Several memes share a created_at, so the _id tie-break matters
+    memes = [{"_id": f"m{i:02d}", "owner_id": "u1", "created_at": _at(i // 3)} for i in range(20)]
+    db.db.memes.insert_many(memes + [{"_id": "other", "owner_id": "u2", "created_at": _at(1)}])
+
+    pages = _pages(lambda after: db.get_memes_by_owner("u1", limit=6, after=after), "created_at", 6)
+    ids = [meme["_id"] for page in pages for meme in page]
+
+    assert [len(page) for page in pages] == [6, 6, 6, 2]
+    expected = sorted(memes, key=lambda m: (m["created_at"], m["_id"]), reverse=True)
+    assert ids == [meme["_id"] for meme in expected]
+
+
+def test_memes_first_page_matches_skip_listing(db):
+    db.db.memes.insert_many([{"_id": f"m{i}", "owner_id": "u1", "created_at": _at(i)} for i in range(10)])
+    first = db.get_memes_by_owner("u1", limit=4)
+    cursor = next_page_cursor(first, 4, "created_at")
+    assert db.get_memes_by_owner("u1", limit=4, after=cursor) == db.get_memes_by_owner("u1", limit=4, skip=4)
+
+
+def test_nfts_pages_by_owner(db):
+    db.db.nfts.insert_many([
+        {"_id": ObjectId(), "token_id": str(i), "owner_address": "0xa" if i % 2 else "0xb", "created_at": _at(i)}
+        for i in range(9)
+    ])
+    pages = _pages(lambda after: db.get_nfts_by_owner("0xa", limit=2, after=after), "created_at", 2)
+    tokens = [nft["token_id"] for page in pages for nft in page]
+    assert tokens == ["7", "5", "3", "1"]
+
+
+def test_transactions_pages_by_timestamp(db):
+    db.db.transactions.insert_many([
+        {"_id": f"t{i}", "token_id": "42", "timestamp": _at(i % 4)} for i in range(8)
+    ] + [{"_id": "x", "token_id": "7", "timestamp": _at(9)}])
+
+    pages = _pages(lambda after: db.get_transactions_by_token("42", limit=3, after=after), "timestamp", 3)
+    ids = [tx["_id"] for page in pages for tx in page]
+    assert ids == ["t7", "t3", "t6", "t2", "t5", "t1", "t4", "t0"]
+
+
+def test_create_indexes_adds_compound_keyset_indexes(db):
+    create_indexes(db.db)
+    keys = {
+        name: [tuple(key) for index in getattr(db.db, name).index_information().values() for key in [index["key"]]]
+        for name in ("memes", "nfts", "transactions")
+    }
+    assert (("owner_id", 1), ("created_at", -1), ("_id", -1)) in keys["memes"]
+    assert (("owner_address", 1), ("created_at", -1), ("_id", -1)) in keys["nfts"]
+    assert (("token_id", 1), ("timestamp", -1), ("_id", -1)) in keys["transactions"]
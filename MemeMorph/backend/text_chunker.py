@@ -0,0 +1,206 @@
+import time
+import random
+import argparse
+import logging
+from collections import deque
+from typing import List, Tuple, Sequence, NamedTuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ", "")
+
+class Chunk(NamedTuple):
+    """A chunk of text and its [start, end) character offsets in the source"""
+    text: str
+    start: int
+    end: int
+
+
+class TextChunker:
+    """
+    Recursive character chunker, boundary-for-boundary compatible with
+    langchain's RecursiveCharacterTextSplitter (keep_separator=True,
+    strip_whitespace=True, length_function=len)
+
+    Works on (start, end) spans of the source text instead of substrings:
+    each level scans its span once to pick a separator and once to split on
+    it, and windows are merged with a deque, so no intermediate strings are
+    built and each chunk's offsets come for free.
+    """
+
+    def __init__(self,
+                 chunk_size: int = 500,
+                 chunk_overlap: int = 100,
+                 separators: Sequence[str] = DEFAULT_SEPARATORS):
+        """
+        Args:
+            chunk_size: Maximum chunk length in characters
+            chunk_overlap: Maximum characters shared by neighbouring chunks
+            separators: Separators tried in order; "" splits into characters
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks"""
+        return [text[start:end] for start, end in self._split(text, 0, len(text), 0)]
+
+    def split_with_offsets(self, text: str) -> List[Chunk]:
+        """Split text into chunks together with their offsets in text"""
+        return [Chunk(text[start:end], start, end) for start, end in self._split(text, 0, len(text), 0)]
+
+    def _pieces(self, text: str, start: int, end: int, separator: str) -> List[Tuple[int, int]]:
+        """Split a span before each occurrence of separator (kept at the start of the next piece)"""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+
+        pieces = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _strip(self, text: str, start: int, end: int) -> Tuple[int, int]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int]], chunks: List[Tuple[int, int]]):
+        """Pack adjacent pieces into windows of at most chunk_size, keeping up to chunk_overlap"""
+        window: deque = deque()
+        total = 0
+        for piece in pieces:
+            length = piece[1] - piece[0]
+            if total + length > self.chunk_size and window:
+                self._emit(text, window[0][0], window[-1][1], chunks)
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    first = window.popleft()
+                    total -= first[1] - first[0]
+            window.append(piece)
+            total += length
+        if window:
+            self._emit(text, window[0][0], window[-1][1], chunks)
+
+    def _emit(self, text: str, start: int, end: int, chunks: List[Tuple[int, int]]):
+        start, end = self._strip(text, start, end)
+        if end > start:
+            chunks.append((start, end))
+
+    def _split(self, text: str, start: int, end: int, level: int) -> List[Tuple[int, int]]:
+        """Chunk spans of text[start:end] using separators from `level` on"""
+        separator = self.separators[-1]
+        next_level = len(self.separators)
+        for i in range(level, len(self.separators)):
+            candidate = self.separators[i]
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                next_level = i + 1
+                break
+
+        chunks: List[Tuple[int, int]] = []
+        small: List[Tuple[int, int]] = []
+        for piece in self._pieces(text, start, end, separator):
+            if piece[1] - piece[0] < self.chunk_size:
+                small.append(piece)
+                continue
+            if small:
+                self._merge(text, small, chunks)
+                small = []
+            if next_level >= len(self.separators):
+                chunks.append(piece)
+            else:
+                chunks.extend(self._split(text, piece[0], piece[1], next_level))
+        if small:
+            self._merge(text, small, chunks)
+        return chunks
+
+
+def _sample_document(n_chars: int, seed: int = 0) -> str:
+    """Lore-like text with paragraphs, lines, sentences and the odd very long token"""
+    rng = random.Random(seed)
+    words = ["Silverhold", "kingdom", "the", "of", "war", "treaty", "river", "ancient", "guild", "dragon",
+             "silver", "spires", "library", "merchant", "council", "border", "heir", "vault", "age", "moon"]
+    parts = []
+    size = 0
+    while size < n_chars:
+        roll = rng.random()
+        if roll < 0.02:
+            token = "\n\n"
+        elif roll < 0.05:
+            token = "\n"
+        elif roll < 0.15:
+            token = ". "
+        elif roll < 0.151:
+            token = "x" * rng.randint(300, 1200) + " "
+        else:
+            token = rng.choice(words) + " "
+        parts.append(token)
+        size += len(token)
+    return "".join(parts)
+
+
+def benchmark(n_docs: int = 20, doc_chars: int = 200000, chunk_size: int = 500, chunk_overlap: int = 100) -> dict:
+    """
+    Compare TextChunker with langchain's splitter on synthetic lore documents
+
+    Returns timings for both and whether every chunk matched (langchain
+    figures are omitted when it isn't installed).
+    """
+    documents = [_sample_document(doc_chars, seed=i) for i in range(n_docs)]
+    chunker = TextChunker(chunk_size, chunk_overlap)
+
+    start = time.perf_counter()
+    native = [chunker.split_text(doc) for doc in documents]
+    native_s = time.perf_counter() - start
+
+    report = {
+        "documents": n_docs,
+        "chars_per_document": doc_chars,
+        "chunks": sum(len(chunks) for chunks in native),
+        "native_s": native_s
+    }
+
+    try:
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        except ImportError:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        return report
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              separators=list(DEFAULT_SEPARATORS))
+    start = time.perf_counter()
+    reference = [splitter.split_text(doc) for doc in documents]
+    report["langchain_s"] = time.perf_counter() - start
+    report["speedup"] = report["langchain_s"] / max(native_s, 1e-9)
+    report["identical"] = native == reference
+    return report
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark the native chunker against langchain's splitter")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--chars", type=int, default=200000, help="Characters per document")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(json.dumps(benchmark(args.docs, args.chars), indent=2))
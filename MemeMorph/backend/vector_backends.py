@@ -0,0 +1,306 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+import numpy as np
+from quantization import QuantizedMatrix
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class VectorBackend:
+    """
+    Interface for the nearest-neighbour search behind CanonVDB.search_lore
+
+    Backends return results in ChromaDB's query() shape (lists of lists of
+    ids/documents/metadatas/distances, one inner list per query) so callers
+    don't need to know which backend answered.
+    """
+
+    name = "base"
+
+    def query(self,
+              query_embeddings: List[List[float]],
+              world_id: str = None,
+              category: str = None,
+              n_results: int = 5) -> Dict[str, List[List[Any]]]:
+        """Return the n_results nearest chunks for each query embedding"""
+        raise NotImplementedError
+
+    def invalidate(self, world_id: str = None):
+        """Drop any state cached for a world (or all worlds)"""
+        pass
+
+
+class ChromaBackend(VectorBackend):
+    """
+    Search through ChromaDB's HNSW indexes (used for large worlds)
+
+    With per-world shards, a world's query goes straight to its collection and
+    cross-world queries fan out over all shards in parallel, merging by distance.
+    """
+
+    name = "chroma"
+
+    def __init__(self, collection_for, shards=None, max_workers: int = 8):
+        """
+        Args:
+            collection_for: Callable mapping a world ID (or None) to its collection
+            shards: Callable listing (world_id, collection) pairs when lore is sharded
+                    per world, or None for a single shared collection
+            max_workers: Parallelism of cross-shard fan-out
+        """
+        self.collection_for = collection_for
+        self.shards = shards
+        self.max_workers = max_workers
+
+    def _query_collection(self, collection, query_embeddings, where_clause, n_results):
+        # Chroma wants an operator when filtering on more than one field
+        if len(where_clause) > 1:
+            where_clause = {"$and": [{k: v} for k, v in where_clause.items()]}
+
+        return collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where_clause if where_clause else None
+        )
+
+    def query(self, query_embeddings, world_id=None, category=None, n_results=5):
+        where_clause = {}
+        if category:
+            where_clause["category"] = category
+
+        if self.shards is None or world_id:
+            # A shard only holds its own world, so it needs no world filter
+            if world_id and self.shards is None:
+                where_clause["world_id"] = world_id
+            return self._query_collection(self.collection_for(world_id), query_embeddings, where_clause, n_results)
+
+        shards = self.shards()
+        if not shards:
+            return {key: [[] for _ in query_embeddings] for key in ("ids", "documents", "metadatas", "distances")}
+
+        def query_shard(shard):
+            return self._query_collection(shard[1], query_embeddings, dict(where_clause), n_results)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(shards))) as pool:
+            partials = list(pool.map(query_shard, shards))
+
+        # Merge per-shard results into a global top n per query
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for qi in range(len(query_embeddings)):
+            hits = []
+            for partial in partials:
+                for i, doc_id in enumerate(partial["ids"][qi]):
+                    hits.append((partial["distances"][qi][i], doc_id, partial["documents"][qi][i], partial["metadatas"][qi][i]))
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:n_results]
+            merged["distances"].append([hit[0] for hit in hits])
+            merged["ids"].append([hit[1] for hit in hits])
+            merged["documents"].append([hit[2] for hit in hits])
+            merged["metadatas"].append([hit[3] for hit in hits])
+        return merged
+
+
+class _WorldMatrix:
+    """Contiguous in-memory copy of one world's chunks"""
+
+    def __init__(self, world_id: str, version: int, ids, documents, metadatas, embeddings, quantization: str = "none"):
+        self.world_id = world_id
+        self.version = version
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.categories = np.array([(m or {}).get("category", "") for m in self.metadatas], dtype=object)
+
+        vectors = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32).reshape(len(self.ids), -1))
+        norms = np.linalg.norm(vectors, axis=1)
+        self.norms = norms.astype(np.float32)
+        # Unit rows so a single matrix-vector product gives cosine similarity
+        unit = np.ascontiguousarray(vectors / np.maximum(norms, 1e-12)[:, None])
+
+        # Quantized worlds keep only the compact copy resident; float32 rows are
+        # fetched on demand for reranking
+        if quantization in (None, "none"):
+            self.unit = unit
+            self.quantized = None
+        else:
+            self.unit = None
+            self.quantized = QuantizedMatrix(unit, quantization)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the vectors held for this world"""
+        vectors = self.unit.nbytes if self.unit is not None else self.quantized.nbytes
+        return vectors + self.norms.nbytes
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Exact in-process search for small worlds
+
+    Each world is held as a contiguous float32 matrix of normalized vectors;
+    a query is one matrix-vector product followed by an argpartition top-k.
+    Distances are reported in the collection's configured space (l2, cosine
+    or ip) so results match the ChromaDB backend.
+
+    With quantization set to "float16" or "int8" the matrix is held in that
+    form instead; the top rerank_factor * k candidates are then rescored with
+    float32 vectors read from the embedding cache (or the collection). This
+    only reduces this backend's resident memory: the collection itself keeps
+    storing float32 vectors.
+    """
+
+    name = "numpy"
+
+    def __init__(self, 
+                 collection_for, 
+                 index, 
+                 space: str = "l2", 
+                 max_worlds: int = 64,
+                 quantization: str = "none",
+                 rerank_factor: int = 4,
+                 embedding_cache=None):
+        """
+        Args:
+            collection_for: Callable mapping a world ID to the collection it is loaded from
+            index: LoreIndex providing per-world versions for invalidation
+            space: Distance function of the collection ("l2", "cosine" or "ip")
+            max_worlds: Maximum number of world matrices kept in memory
+            quantization: "none", "float16" or "int8"
+            rerank_factor: Candidates per result rescored in float32 when quantized
+            embedding_cache: Optional EmbeddingCache used to fetch float32 vectors for reranking
+        """
+        self.collection_for = collection_for
+        self.index = index
+        self.space = space
+        self.max_worlds = max_worlds
+        self.quantization = quantization or "none"
+        self.rerank_factor = max(1, rerank_factor)
+        self.embedding_cache = embedding_cache
+        self._worlds: "OrderedDict[str, _WorldMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load_world(self, world_id: str) -> _WorldMatrix:
+        """Return the cached matrix for a world, reloading it if the world changed"""
+        version = self.index.get_world_version(world_id)
+        with self._lock:
+            world = self._worlds.get(world_id)
+            if world is not None and world.version == version:
+                self._worlds.move_to_end(world_id)
+                return world
+
+        data = self.collection_for(world_id).get(
+            where={"world_id": world_id},
+            include=["embeddings", "documents", "metadatas"]
+        )
+        embeddings = data["embeddings"] if data["ids"] else np.zeros((0, 1), dtype=np.float32)
+        world = _WorldMatrix(world_id, version, data["ids"], data["documents"], data["metadatas"], embeddings,
+                             quantization=self.quantization)
+
+        with self._lock:
+            self._worlds[world_id] = world
+            self._worlds.move_to_end(world_id)
+            while len(self._worlds) > self.max_worlds:
+                self._worlds.popitem(last=False)
+
+        logger.info(f"Loaded {len(world.ids)} chunks for world {world_id} into the NumPy index")
+        return world
+
+    def _float32_rows(self, world: _WorldMatrix, rows: np.ndarray) -> np.ndarray:
+        """Fetch float32 unit vectors for rows of a quantized world"""
+        vectors = {}
+        if self.embedding_cache is not None:
+            hashes = [(world.metadatas[i] or {}).get("content_hash") for i in rows]
+            cached = self.embedding_cache.get_many([h for h in hashes if h])
+            for i, content_hash in zip(rows, hashes):
+                if content_hash in cached:
+                    vectors[i] = cached[content_hash]
+
+        missing = [i for i in rows if i not in vectors]
+        if missing:
+            data = self.collection_for(world.world_id).get(
+                ids=[world.ids[i] for i in missing], include=["embeddings"]
+            )
+            by_id = dict(zip(data["ids"], data["embeddings"]))
+            for i in missing:
+                vectors[i] = by_id[world.ids[i]]
+
+        matrix = np.asarray([vectors[i] for i in rows], dtype=np.float32).reshape(len(rows), -1)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1), 1e-12)[:, None]
+
+    def _cosine(self, world: _WorldMatrix, unit_query: np.ndarray, rows: np.ndarray, exact: bool) -> np.ndarray:
+        """Cosine similarity of the query to the given rows"""
+        if world.unit is not None:
+            return world.unit[rows] @ unit_query
+        if exact:
+            return self._float32_rows(world, rows) @ unit_query
+        return world.quantized.scores(unit_query, rows)
+
+    def _distances(self, world: _WorldMatrix, query: np.ndarray, rows: np.ndarray, exact: bool = True) -> np.ndarray:
+        """Convert cosine similarities of the given rows to the collection's distance space"""
+        query_norm = float(np.linalg.norm(query))
+        unit_query = query / max(query_norm, 1e-12)
+        cosine = self._cosine(world, unit_query, rows, exact)
+        if self.space == "cosine":
+            return 1.0 - cosine
+        if self.space == "ip":
+            return 1.0 - cosine * world.norms[rows] * query_norm
+        # Squared L2, as reported by ChromaDB
+        norms = world.norms[rows]
+        return norms * norms + query_norm * query_norm - 2.0 * cosine * norms * query_norm
+
+    def query(self, query_embeddings, world_id=None, category=None, n_results=5):
+        if not world_id:
+            raise ValueError("NumpyBackend only serves single-world queries")
+
+        world = self._load_world(world_id)
+        rows = np.arange(len(world.ids))
+        if category:
+            rows = rows[world.categories == category]
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in query_embeddings:
+            query = np.asarray(query, dtype=np.float32)
+            candidates = rows
+            k = min(n_results, len(rows))
+
+            if world.quantized is not None and len(rows):
+                # Shortlist with the quantized scores, then rerank in float32
+                approx = self._distances(world, query, rows, exact=False)
+                pool = min(len(rows), k * self.rerank_factor)
+                if pool < len(rows):
+                    candidates = rows[np.argpartition(approx, pool - 1)[:pool]]
+
+            if len(candidates):
+                distances = self._distances(world, query, candidates)
+            else:
+                distances = np.zeros(0, dtype=np.float32)
+
+            if k < len(candidates):
+                top = np.argpartition(distances, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(distances[top], kind="stable")]
+
+            picked = candidates[top]
+            results["ids"].append([world.ids[i] for i in picked])
+            results["documents"].append([world.documents[i] for i in picked])
+            results["metadatas"].append([world.metadatas[i] for i in picked])
+            results["distances"].append([float(d) for d in distances[top]])
+
+        return results
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Resident vector bytes per loaded world"""
+        with self._lock:
+            return {world_id: world.nbytes for world_id, world in self._worlds.items()}
+
+    def invalidate(self, world_id: str = None):
+        with self._lock:
+            if world_id is None:
+                self._worlds.clear()
+            else:
+                self._worlds.pop(world_id, None)
@@ -335,8 +335,14 @@ const WorldExplorer = () => {
     setQuestion('');
     setAskingQuestion(true);
     
+    // Stream the answer: sources arrive first, then the answer token by token
+    const messageId = Date.now();
+    const updateAnswer = (update) => setMessages(prev => prev.map(message =>
+      message.id === messageId ? { ...message, ...update(message) } : message
+    ));
+    
     try {
-      const response = await fetch(`${baseUrl}/api/world/question`, {
+      const response = await fetch(`${baseUrl}/api/world/question/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
@@ -347,21 +353,56 @@ const WorldExplorer = () => {
         })
       });
       
-      const data = await response.json();
-      
       if (!response.ok) {
+        const data = await response.json();
         throw new Error(data.error || 'Failed to get answer');
       }
       
       setMessages(prev => [...prev, {
+        id: messageId,
         sender: 'assistant',
-        content: data.answer,
+        content: '',
         isUser: false,
-        sources: data.sources || []
+        sources: []
       }]);
+      
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const rawEvent of events) {
+          let eventType = 'message';
+          let eventData = '';
+          for (const line of rawEvent.split('\n')) {
+            if (line.startsWith('event: ')) eventType = line.slice(7);
+            else if (line.startsWith('data: ')) eventData += line.slice(6);
+          }
+          if (!eventData) continue;
+          const data = JSON.parse(eventData);
+          
+          if (eventType === 'sources') {
+            updateAnswer(() => ({ sources: data.sources || [] }));
+          } else if (eventType === 'token') {
+            updateAnswer(message => ({ content: message.content + data.content }));
+          } else if (eventType === 'done') {
+            updateAnswer(() => ({ content: data.answer }));
+          } else if (eventType === 'error') {
+            throw new Error(data.error || 'Failed to get answer');
+          }
+        }
+      }
     } catch (error) {
       console.error('Error getting answer:', error);
-      setMessages(prev => [...prev, {
+      setMessages(prev => [...prev.filter(message => message.id !== messageId || message.content), {
         sender: 'system',
         content: `Error: ${error.message || 'Failed to get answer'}`,
         isUser: false